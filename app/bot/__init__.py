@@ -2,14 +2,48 @@
 Telegram bot package for quotation generation.
 """
 
+from typing import Optional
 from telegram.ext import Application
+from telegram.request import BaseRequest
 from app.config import Config
+from app.utils.file_cleanup import cleanup_manager
+from .constants import quotation_data
+from .persistence import SQLitePersistence
 from .quotation_bot import main
+from .reaper import idle_reaper
+from .update_processor import PerUserUpdateProcessor
 
-def create_application() -> Application:
-    """Create and configure the bot application."""
+async def post_init(application: Application) -> None:
+    """Run startup tasks that need the event loop."""
+    # Pick up temp files left pending by the previous process
+    cleanup_manager.restore(Config.TEMP_PATH)
+    # Expire abandoned quotations so sessions don't pile up over weeks of uptime
+    quotation_data.start_sweeper()
+    idle_reaper.start(application)
+
+def create_application(request: Optional[BaseRequest] = None, token: Optional[str] = None) -> Application:
+    """Create and configure the bot application.
+    
+    Args:
+        request: Backend for Bot API calls (the default HTTPX backend if None), e.g. a fake one for load tests
+        token: Bot token (uses BOT_TOKEN if None)
+    """
     # Create the application
-    application = Application.builder().token(Config.BOT_TOKEN).build()
+    builder = Application.builder().token(token or Config.BOT_TOKEN).post_init(post_init)
+    if Config.MAX_CONCURRENT_UPDATES > 1:
+        # Other users' chats keep moving while one waits on OpenAI or rendering
+        builder = builder.concurrent_updates(PerUserUpdateProcessor(Config.MAX_CONCURRENT_UPDATES))
+    if request is not None:
+        builder = builder.request(request)
+    if Config.PERSISTENCE_PATH:
+        persistence = SQLitePersistence(Config.PERSISTENCE_PATH, update_interval=Config.PERSISTENCE_INTERVAL)
+        builder = builder.persistence(persistence)
+        # In-memory drafts are written through to the same database (Redis keeps its own)
+        quotation_data.attach(persistence)
+    application = builder.build()
+    
+    # An expired session takes the user's conversation scratch data with it
+    quotation_data.on_evict = application.drop_user_data
     
     # Add handlers from quotation_bot
     main(application)
@@ -0,0 +1,208 @@
+"""
+Access control for the quotation bot.
+
+A single TypeHandler in AUTH_HANDLER_GROUP checks every update before any
+other handler sees it, so the handlers themselves no longer check. The
+allow lists are kept as frozensets and each (user, chat) decision is cached
+until the access mode or the lists change; only denials are logged, once per
+user and chat.
+
+Administrators can grant and revoke access at runtime. Those changes are
+kept in a small JSON file (ACCESS_LIST_PATH) as additions to and removals
+from the lists in the environment, and are applied again at startup.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Dict, FrozenSet, Optional, Set, Tuple
+
+from telegram import Chat, Update
+from telegram.error import TelegramError
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from app.config import Config
+from app.utils.artifacts import write_artifact
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DENIED_MESSAGE = (
+    "Sorry, you are not authorized to use this bot. "
+    "This bot is currently in private mode and only authorized users can access it. "
+    "Please contact the bot deployer for access privileges."
+)
+
+# Administrators can run these in any chat; the commands check for an administrator themselves
+ADMIN_COMMANDS = frozenset({
+    'setpublic', 'setprivate', 'checkmode',
+    'allowuser', 'removeuser', 'allowgroup', 'removegroup', 'listaccess'
+})
+
+# Keys of the access list file
+LIST_KINDS = ('users', 'groups')
+
+# Decisions are dropped wholesale past this many, so a flood of strangers can't grow the cache forever
+MAX_CACHED_DECISIONS = 10000
+
+
+class AccessControl:
+    """Decides whether a user may use the bot in a chat, caching each decision."""
+
+    def __init__(self, path: Optional[str] = None):
+        """Initialize the access control from the allow lists in Config and the access list file.
+
+        Args:
+            path: JSON file with the changes made at runtime (uses ACCESS_LIST_PATH if None, empty to keep them in memory only)
+        """
+        self.path = Config.ACCESS_LIST_PATH if path is None else path
+        self.admins: FrozenSet[int] = frozenset()
+        self.allowed_users: FrozenSet[int] = frozenset()
+        self.allowed_groups: FrozenSet[int] = frozenset()
+        # Runtime changes, per list kind: ids added to and removed from the environment's list
+        self._added: Dict[str, Set[int]] = {kind: set() for kind in LIST_KINDS}
+        self._removed: Dict[str, Set[int]] = {kind: set() for kind in LIST_KINDS}
+        self._decisions: Dict[Tuple[int, int], bool] = {}
+        self._public_mode: Optional[bool] = None
+        self.load()
+
+    def load(self) -> None:
+        """Read the runtime changes from the access list file and apply them."""
+        for kind in LIST_KINDS:
+            self._added[kind].clear()
+            self._removed[kind].clear()
+        if self.path and Path(self.path).exists():
+            try:
+                stored = json.loads(Path(self.path).read_text(encoding='utf-8'))
+                for kind in LIST_KINDS:
+                    self._added[kind].update(int(id) for id in stored.get(kind, {}).get('added', []))
+                    self._removed[kind].update(int(id) for id in stored.get(kind, {}).get('removed', []))
+                logger.info(f"Loaded access list changes from {self.path}")
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                logger.error(f"Could not read access list {self.path}, using the environment's lists: {str(e)}")
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Rebuild the allow lists and forget every cached decision.
+
+        Call this after changing PUBLIC_MODE, ALLOWED_USER_IDS or ALLOWED_GROUP_IDS.
+        """
+        # Users added at runtime may use the bot but not administer it
+        self.admins = frozenset(set(Config.ALLOWED_USER_IDS) - self._removed['users'])
+        self.allowed_users = self.admins | self._added['users']
+        self.allowed_groups = frozenset((set(Config.ALLOWED_GROUP_IDS) | self._added['groups']) - self._removed['groups'])
+        self._decisions.clear()
+        self._public_mode = Config.PUBLIC_MODE
+
+    def grant(self, kind: str, id: int) -> bool:
+        """Allow a user or group and save the change; False if it was already allowed.
+
+        Args:
+            kind: 'users' or 'groups'
+            id: Telegram user or chat ID
+        """
+        if id in self._allowed(kind):
+            return False
+        self._removed[kind].discard(id)
+        configured = Config.ALLOWED_USER_IDS if kind == 'users' else Config.ALLOWED_GROUP_IDS
+        if id not in configured:
+            self._added[kind].add(id)
+        self._save()
+        return True
+
+    def revoke(self, kind: str, id: int) -> bool:
+        """Disallow a user or group and save the change; False if it wasn't allowed.
+
+        Args:
+            kind: 'users' or 'groups'
+            id: Telegram user or chat ID
+        """
+        if id not in self._allowed(kind):
+            return False
+        self._added[kind].discard(id)
+        configured = Config.ALLOWED_USER_IDS if kind == 'users' else Config.ALLOWED_GROUP_IDS
+        if id in configured:
+            self._removed[kind].add(id)
+        self._save()
+        return True
+
+    def _allowed(self, kind: str) -> FrozenSet[int]:
+        if kind not in LIST_KINDS:
+            raise ValueError(f"Unknown access list: {kind}")
+        return self.allowed_users if kind == 'users' else self.allowed_groups
+
+    def _save(self) -> None:
+        """Apply the runtime changes and write them to the access list file."""
+        self.invalidate()
+        if not self.path:
+            return
+        stored = {
+            kind: {'added': sorted(self._added[kind]), 'removed': sorted(self._removed[kind])}
+            for kind in LIST_KINDS
+        }
+        path = Path(self.path)
+        write_artifact(path.parent, path.name, json.dumps(stored, indent=2).encode('utf-8'))
+
+    def is_admin(self, user_id: int) -> bool:
+        """Whether the user may change the access mode and lists (a user from ALLOWED_USER_IDS)."""
+        return user_id in self.admins
+
+    def is_allowed(self, user_id: int, chat_id: int, chat_type: str) -> bool:
+        """Whether the user may use the bot in the chat.
+
+        Args:
+            user_id: Telegram user ID
+            chat_id: Telegram chat ID
+            chat_type: Chat type, e.g. Chat.PRIVATE or Chat.GROUP
+        """
+        if self._public_mode != Config.PUBLIC_MODE:
+            # The mode was changed without going through the mode commands
+            self.invalidate()
+        key = (user_id, chat_id)
+        decision = self._decisions.get(key)
+        if decision is not None:
+            return decision
+
+        if Config.PUBLIC_MODE:
+            decision = True
+        elif chat_type == Chat.PRIVATE:
+            decision = user_id in self.allowed_users
+        elif chat_type in (Chat.GROUP, Chat.SUPERGROUP):
+            decision = chat_id in self.allowed_groups
+        else:
+            decision = False
+
+        if not decision:
+            logger.warning(f"Unauthorized access attempt - User ID: {user_id}, Chat ID: {chat_id}, Chat Type: {chat_type}")
+        if len(self._decisions) >= MAX_CACHED_DECISIONS:
+            self._decisions.clear()
+        self._decisions[key] = decision
+        return decision
+
+    async def gate(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Stop unauthorized updates before any other handler group runs; registered as a TypeHandler."""
+        user, chat = update.effective_user, update.effective_chat
+        if user is None or chat is None:
+            return
+        if self.is_allowed(user.id, chat.id, chat.type):
+            return
+
+        message = update.effective_message
+        if message is not None and message.text and self.is_admin(user.id):
+            command = message.text.split(maxsplit=1)[0].lstrip('/').split('@')[0].lower()
+            if message.text.startswith('/') and command in ADMIN_COMMANDS:
+                return
+
+        metrics.increment("auth.denied")
+        try:
+            if update.callback_query is not None:
+                await update.callback_query.answer(DENIED_MESSAGE, show_alert=True)
+            elif message is not None and message.text:
+                await message.reply_text(DENIED_MESSAGE)
+        except TelegramError as e:
+            logger.warning(f"Could not tell user {user.id} they are not authorized: {str(e)}")
+        raise ApplicationHandlerStop
+
+
+# Create a singleton instance for use throughout the application
+access_control = AccessControl()
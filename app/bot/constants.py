@@ -2,6 +2,8 @@
 Constants for the Telegram quotation bot.
 """
 
+from app.utils.session_store import create_session_store
+
 # Conversation states
 CUSTOMER_NAME = 0
 CUSTOMER_COMPANY = 1
@@ -23,6 +25,15 @@ AI_INPUT = 14     # Get freeform input from user
 AI_CLARIFICATION = 15  # Ask for clarification on missing/unclear data
 AI_SUMMARY = 16   # Show summary and get confirmation
 
-# Global dictionary to store quotation data for each user
+# Handler group of the access check, so unauthorized updates stop before any other handler
+AUTH_HANDLER_GROUP = -2
+
+# Handler group of the activity tracker, so it sees every update before the conversation does
+ACTIVITY_HANDLER_GROUP = -1
+
+# Per-user scratch keys in context.user_data that only live as long as a conversation
+CONVERSATION_KEYS = ('expect_private', 'original_chat_id', 'current_item', 'extracted_data', 'missing_fields')
+
+# Session store holding the quotation data of each user's conversation
 # Structure: {user_id: {customer_name, customer_company, items: [], ...}}
-quotation_data = {} 
\ No newline at end of file
+quotation_data = create_session_store()
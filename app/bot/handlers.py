@@ -6,7 +6,13 @@ from telegram import Update, Chat, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from app.utils.models import QuotationData, QuotationItem
 from app.utils.test_pdf import generate_quotation_html
+from app.utils.render_executor import render_executor, RenderQueueFullError
+from app.utils.pdf_generator import pdf_executor, render_quotation_pdf
+from app.utils.artifacts import store_artifact
+from app.config import Config
 from app.utils.gpt_quotation import GPTQuotationParser
+from app.utils.extraction_schema import NON_NUMERIC
+from app.bot.progress import ThrottledMessageEditor, field_progress
 from .constants import (
     CUSTOMER_NAME,
     CUSTOMER_COMPANY,
@@ -25,17 +31,71 @@ from .constants import (
     AI_INPUT,
     AI_CLARIFICATION,
     AI_SUMMARY,
+    CONVERSATION_KEYS,
     quotation_data
 )
 from typing import Dict, List, Tuple, Any, Optional
+import re
+import asyncio
 import logging
 import os
 from datetime import datetime
-from app.utils.file_cleanup import schedule_file_cleanup
 
 # Initialize GPT parser
 gpt_parser = GPTQuotationParser()
 
+DISCOUNT_PATTERN = re.compile(r'discount\s*(?:is|:)?\s*(\d+\.?\d*|\.\d+)?\s*%?')
+
+async def build_quotation_document(quotation: QuotationData) -> Tuple[str, bytes]:
+    """Render the quotation in the configured output format.
+    
+    Returns a tuple of (filename, document bytes) ready to pass to send_document.
+    """
+    logger = logging.getLogger(__name__)
+    
+    if Config.OUTPUT_FORMAT == 'pdf':
+        try:
+            content = await pdf_executor.submit(render_quotation_pdf, quotation)
+            return f"{quotation.filename}.pdf", content
+        except RenderQueueFullError:
+            raise
+        except Exception as e:
+            # Still deliver something the user can print if WeasyPrint is unavailable
+            logger.error(f"PDF generation failed, falling back to HTML: {str(e)}", exc_info=True)
+    
+    html = await render_executor.submit(generate_quotation_html, quotation)
+    return f"{quotation.filename}.html", html.encode('utf-8')
+
+async def store_quotation_document(filename: str, content: bytes) -> None:
+    """Keep a copy of the delivered quotation on disk when SAVE_TO_STORAGE is enabled."""
+    if not Config.SAVE_TO_STORAGE:
+        return
+    
+    try:
+        # Each render gets its own atomically written file, so concurrent quotes never clobber each other
+        await asyncio.to_thread(store_artifact, Config.STORAGE_PATH, filename, content)
+    except OSError as e:
+        # The user already has the document, so a storage failure is only logged
+        logging.getLogger(__name__).error(f"Could not save quotation {filename} to storage: {str(e)}")
+
+async def save_answer(user_id: int, field: str, value: Any) -> None:
+    """Store one step-by-step answer in the user's session."""
+    data = await quotation_data.get(user_id) or {'items': []}
+    data[field] = value
+    await quotation_data.set(user_id, data)
+
+async def end_session(context: ContextTypes.DEFAULT_TYPE, user_id: int) -> None:
+    """Drop the user's quotation session and the conversation's scratch data in user_data."""
+    await quotation_data.delete(user_id)
+    for key in CONVERSATION_KEYS:
+        context.user_data.pop(key, None)
+
+def document_caption(filename: str) -> str:
+    """Return the instructions shown with a delivered quotation file."""
+    if filename.endswith('.pdf'):
+        return "Here's your quotation! 📄"
+    return "Here's your quotation! 📄\nOpen it in a browser to view or save as PDF."
+
 async def handle_customer_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle customer name input."""
     user_id = update.effective_user.id
@@ -45,7 +105,7 @@ async def handle_customer_name(update: Update, context: ContextTypes.DEFAULT_TYP
     if chat_type != Chat.PRIVATE and context.user_data.get('expect_private'):
         return CUSTOMER_NAME
     
-    quotation_data[user_id]['customer_name'] = update.message.text
+    await save_answer(user_id, 'customer_name', update.message.text)
     
     await update.message.reply_text(
         "Great! Now, please enter the customer's company name:"
@@ -61,7 +121,7 @@ async def handle_customer_company(update: Update, context: ContextTypes.DEFAULT_
     if chat_type != Chat.PRIVATE and context.user_data.get('expect_private'):
         return CUSTOMER_COMPANY
         
-    quotation_data[user_id]['customer_company'] = update.message.text
+    await save_answer(user_id, 'customer_company', update.message.text)
     
     await update.message.reply_text(
         "Please enter the customer's address:"
@@ -77,7 +137,7 @@ async def handle_customer_address(update: Update, context: ContextTypes.DEFAULT_
     if chat_type != Chat.PRIVATE and context.user_data.get('expect_private'):
         return CUSTOMER_ADDRESS
     
-    quotation_data[user_id]['customer_address'] = update.message.text
+    await save_answer(user_id, 'customer_address', update.message.text)
     
     await update.message.reply_text(
         "Please enter the customer's phone number:"
@@ -93,7 +153,7 @@ async def handle_customer_phone(update: Update, context: ContextTypes.DEFAULT_TY
     if chat_type != Chat.PRIVATE and context.user_data.get('expect_private'):
         return CUSTOMER_PHONE
     
-    quotation_data[user_id]['customer_phone'] = update.message.text
+    await save_answer(user_id, 'customer_phone', update.message.text)
     
     await update.message.reply_text(
         "Please enter the customer's email address:"
@@ -109,7 +169,7 @@ async def handle_customer_email(update: Update, context: ContextTypes.DEFAULT_TY
     if chat_type != Chat.PRIVATE and context.user_data.get('expect_private'):
         return CUSTOMER_EMAIL
     
-    quotation_data[user_id]['customer_email'] = update.message.text
+    await save_answer(user_id, 'customer_email', update.message.text)
     
     await update.message.reply_text(
         "Now let's add items to the quotation.\n"
@@ -177,19 +237,22 @@ async def handle_item_price(update: Update, context: ContextTypes.DEFAULT_TYPE)
         current_item = context.user_data['current_item']
         current_item['price'] = price
         
+        data = await quotation_data.get(user_id) or {'items': []}
+        
         # Get the count of existing items to create the item number
-        item_count = len(quotation_data[user_id]['items']) + 1
+        item_count = len(data['items']) + 1
         item_number = f"{item_count:03d}"  # Format as 001, 002, etc.
         
-        # Add the item to the quotation
-        quotation_data[user_id]['items'].append(
+        # Add the item to the quotation (stored as a dict so the session stays JSON)
+        data['items'].append(
             QuotationItem(
                 item_no=item_number,
                 item_name=current_item['name'],
                 quantity=current_item['quantity'],
                 unit_price=current_item['price']
-            )
+            ).model_dump()
         )
+        await quotation_data.set(user_id, data)
         
         # Clear the current item
         context.user_data['current_item'] = None
@@ -245,7 +308,7 @@ async def handle_terms(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     if chat_type != Chat.PRIVATE and context.user_data.get('expect_private'):
         return TERMS
     
-    quotation_data[user_id]['terms'] = update.message.text
+    await save_answer(user_id, 'terms', update.message.text)
     
     await update.message.reply_text(
         "Please enter any additional notes (or send 'none' if none):"
@@ -262,7 +325,7 @@ async def handle_notes(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         return NOTES
     
     notes = update.message.text
-    quotation_data[user_id]['notes'] = notes if notes.lower() != 'none' else ''
+    await save_answer(user_id, 'notes', notes if notes.lower() != 'none' else '')
     
     await update.message.reply_text(
         "Please enter the name of the person issuing this quotation:"
@@ -278,7 +341,7 @@ async def handle_issued_by(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     if chat_type != Chat.PRIVATE and context.user_data.get('expect_private'):
         return ISSUED_BY
     
-    quotation_data[user_id]['issued_by'] = update.message.text
+    await save_answer(user_id, 'issued_by', update.message.text)
     
     await update.message.reply_text(
         "Finally, enter the discount amount (or send '0' for no discount):"
@@ -299,7 +362,14 @@ async def handle_discount(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         if discount < 0:
             raise ValueError("Discount cannot be negative")
         
-        data = quotation_data[user_id]
+        data = await quotation_data.get(user_id)
+        if data is None:
+            # The session expired while the user was away
+            await end_session(context, user_id)
+            await update.message.reply_text(
+                "This quotation has expired. Use /newquote to start again."
+            )
+            return ConversationHandler.END
         
         # Create QuotationData object
         quotation = QuotationData(
@@ -315,27 +385,20 @@ async def handle_discount(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             discount=discount
         )
         
-        # Generate HTML
-        html = generate_quotation_html(quotation)
-        
-        # Save HTML file
-        from pathlib import Path
-        output_dir = Path(__file__).resolve().parent.parent.parent / 'temp'
-        output_dir.mkdir(exist_ok=True)
-        html_file = output_dir / f"{quotation.filename}.html"
-        html_file.write_text(html, encoding='utf-8')
+        # Render in the worker pool so other chats aren't blocked, then send straight from memory
+        filename, content = await build_quotation_document(quotation)
         
         # Send the file to user
         await update.message.reply_document(
-            document=html_file,
-            filename=f"{quotation.filename}.html",
+            document=content,
+            filename=filename,
             caption=(
-                "Here's your quotation! 📄\n"
-                "Open this HTML file in your browser to view or save as PDF.\n\n"
+                f"{document_caption(filename)}\n\n"
                 f"Quotation Number: {quotation.quotation_number}\n"
                 f"Total Amount: RM {quotation.grand_total:,.2f}"
             )
         )
+        await store_quotation_document(filename, content)
         
         # If this conversation was started in a group, send a notification to the group
         if context.user_data.get('expect_private') and context.user_data.get('original_chat_id'):
@@ -349,7 +412,7 @@ async def handle_discount(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 print(f"Error sending group notification: {e}")
         
         # Clean up
-        del quotation_data[user_id]
+        await end_session(context, user_id)
         
         await update.message.reply_text(
             "Quotation generated successfully! 🎉\n"
@@ -358,6 +421,13 @@ async def handle_discount(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         
         return ConversationHandler.END
     
+    except RenderQueueFullError:
+        await update.message.reply_text(
+            "The quotation generator is busy right now. "
+            "Please send the discount again in a moment:"
+        )
+        return DISCOUNT
+    
     except ValueError:
         await update.message.reply_text(
             "Please enter a valid number for the discount:"
@@ -378,7 +448,7 @@ async def handle_mode_choice(update: Update, context: ContextTypes.DEFAULT_TYPE)
         
         if update.callback_query.data == "mode_step":
             # Initialize quotation data for step-by-step mode
-            quotation_data[user_id] = {'items': []}
+            await quotation_data.set(user_id, {'items': []})
             await context.bot.send_message(
                 chat_id=update.effective_chat.id,
                 text="Great! Let's create your quotation step by step.\n"
@@ -406,7 +476,7 @@ async def handle_mode_choice(update: Update, context: ContextTypes.DEFAULT_TYPE)
     elif update.message:
         if update.message.text.lower() == "step-by-step 🧱":
             # Initialize quotation data for step-by-step mode
-            quotation_data[user_id] = {'items': []}
+            await quotation_data.set(user_id, {'items': []})
             await update.message.reply_text(
                 "Great! Let's create your quotation step by step.\n"
                 "First, please enter the customer's name:"
@@ -442,6 +512,18 @@ async def handle_mode_choice(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     return CHOOSE_MODE
 
+def queue_notifier(processing_msg):
+    """Return a callback that tells the user their place in the OpenAI queue."""
+    async def notify(position: int) -> None:
+        try:
+            await processing_msg.edit_text(
+                f"Lots of quotations are being processed right now. "
+                f"You're #{position} in the queue, hang tight... ⏳"
+            )
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Could not update queue position message: {str(e)}")
+    return notify
+
 def create_clarification_message(extracted_data, missing_fields):
     """Create a user-friendly clarification message with context from extracted data."""
     logger = logging.getLogger(__name__)
@@ -509,14 +591,20 @@ async def handle_ai_input(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     processing_msg = await update.message.reply_text(
         "Processing your input... 🤔"
     )
+    progress = ThrottledMessageEditor(processing_msg)
     
     try:
         # Extract data using GPT
         logger.info(f"Processing AI input from user {user_id}: {update.message.text[:50]}...")
-        data, missing_fields = await gpt_parser.extract_quotation_data(update.message.text)
+        data, missing_fields = await gpt_parser.extract_quotation_data(
+            update.message.text,
+            on_queued=queue_notifier(processing_msg),
+            on_progress=field_progress(progress, "Processing your input... 🤔")
+        )
+        await progress.close()
         
         # Initialize quotation data
-        quotation_data[user_id] = data if data else {'items': []}
+        await quotation_data.set(user_id, data if data else {'items': []})
         
         if missing_fields:
             # Store the extracted data and missing fields
@@ -531,8 +619,9 @@ async def handle_ai_input(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await update.message.reply_text(clarification_msg)
             return AI_CLARIFICATION
         
-        # Validate the extracted data
+        # Validate the extracted data and keep the normalized values
         validation_issues = await gpt_parser.validate_quotation_data(data)
+        await quotation_data.set(user_id, data)
         logger.info(f"Validation issues for user {user_id}: {validation_issues}")
         
         if validation_issues:
@@ -546,7 +635,7 @@ async def handle_ai_input(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         
         # Generate summary
         logger.info(f"Generating summary for user {user_id}")
-        summary = await gpt_parser.generate_summary(data)
+        summary = await gpt_parser.generate_summary(data, on_queued=queue_notifier(processing_msg))
         
         # Show summary and ask for confirmation with a new message
         await update.message.reply_text(
@@ -561,8 +650,9 @@ async def handle_ai_input(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return AI_SUMMARY
         
     except Exception as e:
+        await progress.close()
         # Initialize empty data to avoid errors
-        quotation_data[user_id] = {'items': []}
+        await quotation_data.set(user_id, {'items': []})
         
         # Log the error with more details
         logger.error(f"Error in AI input processing for user {user_id}: {str(e)}", exc_info=True)
@@ -590,6 +680,7 @@ async def handle_ai_clarification(update: Update, context: ContextTypes.DEFAULT_
     processing_msg = await update.message.reply_text(
         "Processing your clarification... 🤔"
     )
+    progress = ThrottledMessageEditor(processing_msg)
     
     try:
         logger.info(f"Processing clarification from user {user_id}: {update.message.text[:50]}...")
@@ -601,58 +692,20 @@ async def handle_ai_clarification(update: Update, context: ContextTypes.DEFAULT_
         logger.info(f"Original data had fields: {list(original_data.keys())}")
         logger.info(f"Original missing fields: {original_missing_fields}")
         
-        # Create a combined message for better context
-        # This gives the AI more context by including both the original data and the new clarification
-        combined_msg = "Previous information:\n"
-        for key, value in original_data.items():
-            if key != 'items':  # Handle items separately
-                combined_msg += f"- {key}: {value}\n"
-        
-        # Add items if they exist
-        if 'items' in original_data and original_data['items']:
-            combined_msg += "- items:\n"
-            for item in original_data['items']:
-                combined_msg += f"  - {item.get('name', 'Unknown')}, {item.get('quantity', 0)} unit, {item.get('unit_price', 0)}/unit\n"
-        
-        # Add the new clarification
-        combined_msg += "\nAdditional information:\n" + update.message.text
-        
-        logger.info(f"Created combined context message: {combined_msg[:100]}...")
-        
-        # Extract data with full context
-        clarification_data, new_missing_fields = await gpt_parser.extract_quotation_data(combined_msg)
-        
-        # Smart merge of the data - we need to be careful with the items
-        merged_data = {}
-        
-        # First, copy all data from original
-        for key, value in original_data.items():
-            merged_data[key] = value
-        
-        # Then, update with clarification data, but handle items specially
-        for key, value in clarification_data.items():
-            if key == 'items' and 'items' in original_data and original_data['items']:
-                # Keep original items unless clarification specifically updates them
-                continue
-            merged_data[key] = value
+        # Only the new message is sent; the patch is merged into the stored data
+        merged_data, missing_fields = await gpt_parser.extract_quotation_delta(
+            update.message.text,
+            original_data,
+            on_queued=queue_notifier(processing_msg),
+            on_progress=field_progress(progress, "Processing your clarification... 🤔")
+        )
+        await progress.close()
         
         logger.info(f"Merged data has fields: {list(merged_data.keys())}")
-        
-        # Update missing fields - only keep fields that are still missing after clarification
-        missing_fields = []
-        for field in original_missing_fields:
-            if field not in clarification_data or not clarification_data[field]:
-                missing_fields.append(field)
-        
-        # Add any new missing fields discovered
-        for field in new_missing_fields:
-            if field not in missing_fields:
-                missing_fields.append(field)
-        
         logger.info(f"Updated missing fields: {missing_fields}")
         
         # Store updated data
-        quotation_data[user_id] = merged_data
+        await quotation_data.set(user_id, merged_data)
         
         if missing_fields:
             # Still have missing fields
@@ -666,8 +719,9 @@ async def handle_ai_clarification(update: Update, context: ContextTypes.DEFAULT_
             await update.message.reply_text(clarification_msg)
             return AI_CLARIFICATION
         
-        # Validate the merged data
+        # Validate the merged data and keep the normalized values
         validation_issues = await gpt_parser.validate_quotation_data(merged_data)
+        await quotation_data.set(user_id, merged_data)
         logger.info(f"Validation issues after clarification for user {user_id}: {validation_issues}")
         
         if validation_issues:
@@ -681,7 +735,7 @@ async def handle_ai_clarification(update: Update, context: ContextTypes.DEFAULT_
         
         # Generate summary
         logger.info(f"Generating summary for clarified data for user {user_id}")
-        summary = await gpt_parser.generate_summary(merged_data)
+        summary = await gpt_parser.generate_summary(merged_data, on_queued=queue_notifier(processing_msg))
         
         # Show summary and ask for confirmation with a new message
         await update.message.reply_text(
@@ -696,9 +750,10 @@ async def handle_ai_clarification(update: Update, context: ContextTypes.DEFAULT_
         return AI_SUMMARY
         
     except Exception as e:
+        await progress.close()
         # Ensure quotation_data is initialized
-        if user_id not in quotation_data:
-            quotation_data[user_id] = {'items': []}
+        if await quotation_data.get(user_id) is None:
+            await quotation_data.set(user_id, {'items': []})
             
         # Log the error with more details
         logger.error(f"Error in AI clarification processing for user {user_id}: {str(e)}", exc_info=True)
@@ -748,7 +803,7 @@ async def handle_ai_summary(update: Update, context: ContextTypes.DEFAULT_TYPE)
     elif update.callback_query.data == "confirm_yes":
         try:
             # Generate quotation
-            data = quotation_data.get(user_id, {})
+            data = await quotation_data.get(user_id)
             
             if not data:
                 logger.error(f"No data found for user {user_id} in quotation_data")
@@ -806,12 +861,12 @@ async def handle_ai_summary(update: Update, context: ContextTypes.DEFAULT_TYPE)
                         
                         # Convert to proper types if they're strings (should already be normalized by validator)
                         if isinstance(quantity, str):
-                            import re
-                            quantity = float(re.sub(r'[^0-9.]', '', quantity)) if re.sub(r'[^0-9.]', '', quantity) else 1
+                            numeric_part = NON_NUMERIC.sub('', quantity)
+                            quantity = float(numeric_part) if numeric_part else 1
                         
                         if isinstance(unit_price, str):
-                            import re
-                            unit_price = float(re.sub(r'[^0-9.]', '', unit_price)) if re.sub(r'[^0-9.]', '', unit_price) else 0
+                            numeric_part = NON_NUMERIC.sub('', unit_price)
+                            unit_price = float(numeric_part) if numeric_part else 0
                         
                         items.append(
                             QuotationItem(
@@ -839,8 +894,7 @@ async def handle_ai_summary(update: Update, context: ContextTypes.DEFAULT_TYPE)
                     if isinstance(data['discount'], (int, float)):
                         discount = data['discount']
                     elif isinstance(data['discount'], str) and data['discount'].strip():
-                        import re
-                        discount_str = re.sub(r'[^0-9.]', '', data['discount'])
+                        discount_str = NON_NUMERIC.sub('', data['discount'])
                         discount = float(discount_str) if discount_str else 0
                 except (ValueError, TypeError) as e:
                     logger.error(f"Error processing discount: {str(e)}")
@@ -864,40 +918,42 @@ async def handle_ai_summary(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 discount=discount
             )
             
-            # Generate HTML quotation
-            html_content = generate_quotation_html(quotation)
-            
-            # Save and send the quotation
             await context.bot.send_message(
                 chat_id=update.effective_chat.id,
                 text="Generating your quotation... 📄"
             )
             
-            # Make sure temp directory exists
-            os.makedirs("temp", exist_ok=True)
-            
-            # Save HTML file
-            html_path = f"temp/quotation_{user_id}.html"
-            with open(html_path, "w", encoding="utf-8") as f:
-                f.write(html_content)
+            # Render in the worker pool so other chats aren't blocked, then send straight from memory
+            filename, content = await build_quotation_document(quotation)
             
             # Send the file
             await context.bot.send_document(
                 chat_id=user_id,
-                document=open(html_path, "rb"),
-                filename="quotation.html",
-                caption="Here's your quotation! 📄\nOpen it in a browser to view or save as PDF."
+                document=content,
+                filename=filename,
+                caption=document_caption(filename)
             )
-            
-            # Schedule file cleanup (10 minutes = 600 seconds)
-            schedule_file_cleanup(html_path, 600)
+            await store_quotation_document(filename, content)
             
             # Clean up
-            if user_id in quotation_data:
-                del quotation_data[user_id]
+            await end_session(context, user_id)
             
             return ConversationHandler.END
             
+        except RenderQueueFullError:
+            logger.warning(f"Render queue full, asking user {user_id} to retry")
+            await context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text="The quotation generator is busy right now. Please press the button again in a moment.",
+                reply_markup=InlineKeyboardMarkup([
+                    [
+                        InlineKeyboardButton("Yes, generate quote ✅", callback_data="confirm_yes"),
+                        InlineKeyboardButton("No, try again 🔄", callback_data="confirm_no")
+                    ]
+                ])
+            )
+            return AI_SUMMARY
+            
         except Exception as e:
             logger.error(f"Error generating quotation for user {user_id}: {str(e)}", exc_info=True)
             await context.bot.send_message(
@@ -931,31 +987,23 @@ async def handle_ai_additional_input(update: Update, context: ContextTypes.DEFAU
     processing_msg = await update.message.reply_text(
         "Processing your additional information... 🤔"
     )
+    progress = ThrottledMessageEditor(processing_msg)
     
     try:
         # Get current data
-        current_data = quotation_data.get(user_id, {})
+        current_data = await quotation_data.get(user_id)
         if not current_data:
             current_data = {'items': []}
-            quotation_data[user_id] = current_data
-        
-        # Create a combined message with current data for context
-        combined_msg = "Previous information:\n"
-        for key, value in current_data.items():
-            if key != 'items':  # Handle items separately
-                combined_msg += f"- {key}: {value}\n"
-        
-        # Add items if they exist
-        if 'items' in current_data and current_data['items']:
-            combined_msg += "- items:\n"
-            for item in current_data['items']:
-                combined_msg += f"  - {item.get('name', 'Unknown')}, {item.get('quantity', 0)} unit, {item.get('unit_price', 0)}/unit\n"
-        
-        # Add the additional info
-        combined_msg += "\nAdditional information:\n" + additional_text
-        
-        # Extract data with the combined context
-        updated_data, missing_fields = await gpt_parser.extract_quotation_data(combined_msg)
+            await quotation_data.set(user_id, current_data)
+        
+        # Extract only what the new message adds and merge it into the current data
+        updated_data, missing_fields = await gpt_parser.extract_quotation_delta(
+            additional_text,
+            current_data,
+            on_queued=queue_notifier(processing_msg),
+            on_progress=field_progress(progress, "Processing your additional information... 🤔")
+        )
+        await progress.close()
         
         # Run the validator to normalize values
         await gpt_parser.validate_quotation_data(updated_data)
@@ -970,9 +1018,8 @@ async def handle_ai_additional_input(update: Update, context: ContextTypes.DEFAU
         
         # Check for "discount" specific input
         if any(word in additional_text.lower() for word in ['discount', 'discount:', 'discount is']):
-            import re
             # Try to extract discount value
-            discount_matches = re.search(r'discount\s*(?:is|:)?\s*(\d+\.?\d*|\.\d+)?\s*%?', additional_text.lower())
+            discount_matches = DISCOUNT_PATTERN.search(additional_text.lower())
             if discount_matches and discount_matches.group(1):
                 try:
                     updated_data['discount'] = float(discount_matches.group(1))
@@ -980,19 +1027,13 @@ async def handle_ai_additional_input(update: Update, context: ContextTypes.DEFAU
                 except (ValueError, TypeError):
                     pass
         
-        # Smart merge with priority to new data
-        for key, value in updated_data.items():
-            if key == 'items' and 'items' in current_data and current_data['items']:
-                # Don't overwrite existing items unless explicitly requested
-                continue
-            elif value:  # Only update if the value is not empty
-                current_data[key] = value
+        current_data = updated_data
         
         # Update the quotation data
-        quotation_data[user_id] = current_data
+        await quotation_data.set(user_id, current_data)
         
         # Generate an updated summary
-        summary = await gpt_parser.generate_summary(current_data)
+        summary = await gpt_parser.generate_summary(current_data, on_queued=queue_notifier(processing_msg))
         
         # Check if there are any missing required fields to prompt for
         required_fields = ["customer_name", "customer_company", "customer_address", 
@@ -1030,6 +1071,7 @@ async def handle_ai_additional_input(update: Update, context: ContextTypes.DEFAU
         return AI_SUMMARY
         
     except Exception as e:
+        await progress.close()
         logger.error(f"Error processing additional input: {str(e)}", exc_info=True)
         # Send a new message instead of editing the existing one
         await update.message.reply_text(
@@ -0,0 +1,211 @@
+"""
+SQLite persistence for conversation states, user_data and quotation drafts.
+
+The application hands changes over every update_interval seconds (see
+BasePersistence). They are only queued here; a background task writes the
+whole batch in one transaction from a worker thread, so no message waits
+on the disk. The database runs in WAL mode so those writes don't block
+readers, and a crash loses at most the last unflushed batch.
+"""
+
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+from telegram.ext._utils.types import CDCData, ConversationDict, ConversationKey
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# (table, key) -> serialized value, or None to delete the row
+PendingWrites = Dict[Tuple[str, str], Optional[Tuple[Any, ...]]]
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS conversations (name TEXT, key TEXT, state TEXT, PRIMARY KEY (name, key))",
+    "CREATE TABLE IF NOT EXISTS user_data (user_id TEXT PRIMARY KEY, data TEXT)",
+    "CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, expiry REAL, value TEXT)",
+)
+
+
+class SQLitePersistence(BasePersistence):
+    """Stores conversation states, user_data and session drafts in a SQLite file with batched writes."""
+
+    def __init__(self, path: str, update_interval: float = 5, flush_delay: Optional[float] = None):
+        """Initialize the persistence and create the tables.
+
+        Args:
+            path: SQLite database file
+            update_interval: Seconds between the application's hand-overs of changed data
+            flush_delay: Seconds queued writes wait for more to join their batch (update_interval if None)
+        """
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.path = path
+        self.flush_delay = update_interval if flush_delay is None else flush_delay
+        self._db_lock = threading.Lock()
+        self._pending_lock = threading.Lock()  # Never held while writing, so queueing doesn't wait on the disk
+        self._pending: PendingWrites = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only risks the last transactions on power loss, never corruption
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+        logger.info(f"SQLite persistence opened at {path}")
+
+    # Reads happen once, when the application starts
+
+    async def get_conversations(self, name: str) -> ConversationDict:
+        """Return the stored states of a persistent ConversationHandler."""
+        rows = await asyncio.to_thread(self._query, "SELECT key, state FROM conversations WHERE name = ?", (name,))
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        """Return the stored user_data of every user."""
+        rows = await asyncio.to_thread(self._query, "SELECT user_id, data FROM user_data", ())
+        return {int(user_id): json.loads(data) for user_id, data in rows}
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        """chat_data is not stored."""
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        """bot_data is not stored."""
+        return {}
+
+    async def get_callback_data(self) -> Optional[CDCData]:
+        """Arbitrary callback data is not used."""
+        return None
+
+    def load_sessions(self) -> Dict[Hashable, Tuple[float, str]]:
+        """Return the stored drafts that have not expired, as key -> (wall-clock expiry, JSON value)."""
+        rows = self._query("SELECT key, expiry, value FROM sessions WHERE expiry > ?", (time.time(),))
+        return {json.loads(key): (expiry, value) for key, expiry, value in rows}
+
+    def _query(self, sql: str, params: Tuple) -> list:
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # Writes are queued and flushed in batches
+
+    async def update_conversation(self, name: str, key: ConversationKey, new_state: Optional[object]) -> None:
+        """Queue a conversation state change; None means the conversation ended."""
+        row = None if new_state is None else (json.dumps(new_state),)
+        self._queue(('conversations', json.dumps([name, list(key)])), row)
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        """Queue a user's user_data, or its deletion once it is empty."""
+        self._queue(('user_data', str(user_id)), (json.dumps(data, default=str),) if data else None)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        """Queue the deletion of a user's user_data."""
+        self._queue(('user_data', str(user_id)), None)
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        """chat_data is not stored."""
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        """chat_data is not stored."""
+
+    async def update_bot_data(self, data: Dict) -> None:
+        """bot_data is not stored."""
+
+    async def update_callback_data(self, data: CDCData) -> None:
+        """Arbitrary callback data is not used."""
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        """The in-memory copy is authoritative, nothing to refresh."""
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        """chat_data is not stored."""
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        """bot_data is not stored."""
+
+    def save_session(self, key: Hashable, value: Optional[str], expiry: float) -> None:
+        """Queue a draft from the session store; value None deletes it.
+
+        Args:
+            key: Session key
+            value: JSON value of the session, None if it was removed
+            expiry: Wall-clock time the session expires at
+        """
+        self._queue(('sessions', json.dumps(key)), None if value is None else (expiry, value))
+
+    def _queue(self, target: Tuple[str, str], row: Optional[Tuple[Any, ...]]) -> None:
+        """Record a write, replacing any queued write to the same row, and make sure a flush is scheduled."""
+        with self._pending_lock:
+            self._pending[target] = row
+        if self._flush_task is None or self._flush_task.done():
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+            except RuntimeError:
+                # No event loop; the next flush() picks the write up
+                pass
+
+    async def _flush_later(self) -> None:
+        """Wait for the batch to fill, then write it, including anything queued while writing."""
+        await asyncio.sleep(self.flush_delay)
+        while self._pending:
+            if not await asyncio.to_thread(self._write_pending):
+                break
+
+    def _write_pending(self) -> bool:
+        """Write every queued change in one transaction; False if the write failed and was requeued."""
+        with self._pending_lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return True
+        with self._db_lock:
+            started = time.perf_counter()
+            try:
+                with self._db:
+                    for (table, key), row in batch.items():
+                        if table == 'conversations':
+                            name, conversation_key = json.loads(key)
+                            if row is None:
+                                self._db.execute("DELETE FROM conversations WHERE name = ? AND key = ?", (name, json.dumps(conversation_key)))
+                            else:
+                                self._db.execute("INSERT OR REPLACE INTO conversations VALUES (?, ?, ?)", (name, json.dumps(conversation_key), row[0]))
+                        elif table == 'user_data':
+                            if row is None:
+                                self._db.execute("DELETE FROM user_data WHERE user_id = ?", (key,))
+                            else:
+                                self._db.execute("INSERT OR REPLACE INTO user_data VALUES (?, ?)", (key, row[0]))
+                        elif row is None:
+                            self._db.execute("DELETE FROM sessions WHERE key = ?", (key,))
+                        else:
+                            self._db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (key, row[0], row[1]))
+            except sqlite3.Error as e:
+                # Keep the batch, unless newer writes to the same rows arrived meanwhile
+                logger.error(f"Could not write {len(batch)} changes to {self.path}: {str(e)}")
+                with self._pending_lock:
+                    batch.update(self._pending)
+                    self._pending = batch
+                return False
+            metrics.observe("persistence.flush", time.perf_counter() - started)
+            metrics.increment("persistence.rows", len(batch))
+            return True
+
+    async def flush(self) -> None:
+        """Write everything still queued and close the database; called when the application shuts down."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await asyncio.to_thread(self._write_pending)
+        with self._db_lock:
+            self._db.close()
+        logger.info(f"SQLite persistence flushed and closed at {self.path}")
@@ -0,0 +1,111 @@
+"""
+Progress updates for long-running AI turns, sent as throttled message edits.
+"""
+
+import time
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# How extracted fields are named in progress messages
+FIELD_NAMES = {
+    "customer_name": "customer name",
+    "customer_company": "company",
+    "customer_address": "address",
+    "customer_phone": "phone",
+    "customer_email": "email",
+    "items": "items",
+    "terms": "terms",
+    "discount": "discount",
+    "issued_by": "issued by"
+}
+
+
+class ThrottledMessageEditor:
+    """Coalesces edits to a single message so a chat stays under Telegram's edit rate.
+
+    update() only records the latest text; at most one edit is sent per
+    min_interval, and intermediate texts that were superseded are skipped.
+    """
+
+    def __init__(self, message: Message, min_interval: Optional[float] = None):
+        """Initialize the editor.
+
+        Args:
+            message: The message to edit, usually the "Processing..." reply
+            min_interval: Minimum seconds between two edits (uses PROGRESS_EDIT_INTERVAL if None)
+        """
+        self.message = message
+        self.min_interval = Config.PROGRESS_EDIT_INTERVAL if min_interval is None else min_interval
+        self._pending: Optional[str] = None
+        self._sent: Optional[str] = message.text if message is not None else None
+        self._last_edit = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def update(self, text: str) -> None:
+        """Show text as soon as the rate allows, replacing any edit still waiting."""
+        if self._closed or self.message is None:
+            return
+        self._pending = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        """Send the latest pending text, waiting out the minimum interval first."""
+        while self._pending is not None and not self._closed:
+            delay = self._last_edit + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            text, self._pending = self._pending, None
+            if text == self._sent:
+                continue
+            try:
+                await self.message.edit_text(text)
+                self._sent = text
+            except RetryAfter as e:
+                # Put the text back unless something newer arrived, and wait as asked
+                if self._pending is None:
+                    self._pending = text
+                self._last_edit = time.monotonic() + float(e.retry_after)
+                continue
+            except BadRequest as e:
+                # "Message is not modified" and edits to deleted messages are harmless
+                logger.debug(f"Skipped progress edit: {str(e)}")
+            except Exception as e:
+                logger.warning(f"Could not update progress message: {str(e)}")
+            self._last_edit = time.monotonic()
+
+    async def close(self) -> None:
+        """Drop pending edits and stop; call once the final answer is sent."""
+        self._closed = True
+        self._pending = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def field_progress(editor: ThrottledMessageEditor, header: str) -> Optional[Callable[[List[str]], None]]:
+    """Return a callback that lists the fields found so far under header.
+
+    Returns None when STREAM_RESPONSES is off, so the caller makes a single non-streamed call.
+    """
+    if not Config.STREAM_RESPONSES:
+        return None
+
+    def report(fields: List[str]) -> None:
+        found = ", ".join(FIELD_NAMES.get(field, field) for field in fields)
+        editor.update(f"{header}\n\nFound so far: {found}")
+    return report
@@ -11,10 +11,12 @@ from telegram.ext import (
     MessageHandler,
     ConversationHandler,
     CallbackContext,
+    TypeHandler,
     filters,
     CallbackQueryHandler
 )
 from app.config import Config
+from app.utils.intents import classify
 from app.utils.models import QuotationData, QuotationItem
 from app.utils.test_pdf import generate_quotation_html
 from .constants import (
@@ -35,9 +37,13 @@ from .constants import (
     AI_INPUT,
     AI_CLARIFICATION,
     AI_SUMMARY,
-    quotation_data
+    ACTIVITY_HANDLER_GROUP,
+    AUTH_HANDLER_GROUP
 )
+from .auth import access_control
+from .reaper import idle_reaper
 from .handlers import (
+    end_session,
     handle_customer_name,
     handle_customer_company,
     handle_customer_address,
@@ -65,52 +71,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def is_authorized(update: Update) -> bool:
-    """Check if the user or chat is authorized to use the bot."""
-    # If public mode is enabled, all users are authorized
-    if Config.PUBLIC_MODE:
-        return True
-        
-    user_id = update.effective_user.id
-    chat_id = update.effective_chat.id
-    chat_type = update.effective_chat.type
-    
-    logger.info(f"Authorization check - User ID: {user_id}, Chat ID: {chat_id}, Chat Type: {chat_type}")
-    logger.info(f"Public Mode: {Config.PUBLIC_MODE}")
-    logger.info(f"Allowed Users: {Config.ALLOWED_USER_IDS}")
-    logger.info(f"Allowed Groups: {Config.ALLOWED_GROUP_IDS}")
-    
-    # Check if it's a private chat with an authorized user
-    if chat_type == Chat.PRIVATE:
-        is_allowed = user_id in Config.ALLOWED_USER_IDS
-        logger.info(f"Private chat authorization result: {is_allowed}")
-        return is_allowed
-    
-    # Check if it's a group chat that's authorized
-    if chat_type in [Chat.GROUP, Chat.SUPERGROUP]:
-        is_allowed = chat_id in Config.ALLOWED_GROUP_IDS
-        logger.info(f"Group chat authorization result: {is_allowed}")
-        return is_allowed
-        
-    return False
-
 async def start(update: Update, context: CallbackContext) -> None:
     """Send a message when the command /start is issued."""
-    user_id = update.effective_user.id
-    chat_id = update.effective_chat.id
-    chat_type = update.effective_chat.type
-    
-    logger.info(f"Start command received - User ID: {user_id}, Chat ID: {chat_id}, Chat Type: {chat_type}")
-    
-    if not is_authorized(update):
-        logger.warning(f"Unauthorized access attempt - User ID: {user_id}, Chat ID: {chat_id}")
-        await update.message.reply_text(
-            "Sorry, you are not authorized to use this bot. "
-            "This bot is currently in private mode and only authorized users can access it. "
-            "Please contact the bot deployer for access privileges."
-        )
-        return
-    
     chat_type = update.effective_chat.type
     
     if chat_type == Chat.PRIVATE:
@@ -135,17 +97,9 @@ async def start(update: Update, context: CallbackContext) -> None:
 
 async def help_command(update: Update, context: CallbackContext) -> None:
     """Send a message when the command /help is issued."""
-    if not is_authorized(update):
-        await update.message.reply_text(
-            "Sorry, you are not authorized to use this bot. "
-            "This bot is currently in private mode and only authorized users can access it. "
-            "Please contact the bot deployer for access privileges."
-        )
-        return
-    
     chat_type = update.effective_chat.type
     user_id = update.effective_user.id
-    is_admin = user_id in Config.ALLOWED_USER_IDS
+    is_admin = access_control.is_admin(user_id)
     
     # Base message for all users
     if chat_type == Chat.PRIVATE:
@@ -158,8 +112,12 @@ async def help_command(update: Update, context: CallbackContext) -> None:
             "   - Terms and conditions\n"
             "   - Notes\n"
             "   - Discount (if any)\n"
-            "3. The bot will generate a quotation in HTML format\n"
-            "4. Open the HTML file in a browser to save as PDF\n\n"
+            + (
+                "3. The bot will send you the quotation as a PDF\n\n"
+                if Config.OUTPUT_FORMAT == 'pdf' else
+                "3. The bot will generate a quotation in HTML format\n"
+                "4. Open the HTML file in a browser to save as PDF\n\n"
+            ) +
             "/cancel - Cancel the current operation at any time"
         )
     else:
@@ -178,7 +136,12 @@ async def help_command(update: Update, context: CallbackContext) -> None:
             "\n\n🔑 Administrator Commands:\n"
             "/setpublic - Set the bot to public mode (anyone can use it)\n"
             "/setprivate - Set the bot to private mode (only authorized users can use it)\n"
-            "/checkmode - Check the current access mode of the bot\n\n"
+            "/checkmode - Check the current access mode of the bot\n"
+            "/allowuser <id> - Let a user use the bot\n"
+            "/removeuser <id> - Stop a user from using the bot\n"
+            "/allowgroup [id] - Let a group use the bot (this group if no ID is given)\n"
+            "/removegroup [id] - Stop a group from using the bot\n"
+            "/listaccess - Show who can use the bot\n\n"
             f"Current mode: {'PUBLIC' if Config.PUBLIC_MODE else 'PRIVATE'}"
         )
         message += admin_message
@@ -187,17 +150,12 @@ async def help_command(update: Update, context: CallbackContext) -> None:
 
 async def new_quote(update: Update, context: CallbackContext) -> int:
     """Start the quotation creation process."""
-    if not is_authorized(update):
-        await update.message.reply_text(
-            "Sorry, you are not authorized to use this bot. "
-            "This bot is currently in private mode and only authorized users can access it. "
-            "Please contact the bot deployer for access privileges."
-        )
-        return ConversationHandler.END
-    
     user_id = update.effective_user.id
     chat_type = update.effective_chat.type
     
+    # Start from a clean slate, even if an earlier quotation was abandoned
+    await end_session(context, user_id)
+    
     # If in a group chat, direct the user to private chat
     if chat_type in [Chat.GROUP, Chat.SUPERGROUP]:
         # Set flag to expect responses in private chat
@@ -253,17 +211,8 @@ async def new_quote(update: Update, context: CallbackContext) -> int:
 
 async def cancel(update: Update, context: CallbackContext) -> int:
     """Cancel and end the conversation."""
-    if not is_authorized(update):
-        await update.message.reply_text(
-            "Sorry, you are not authorized to use this bot. "
-            "This bot is currently in private mode and only authorized users can access it. "
-            "Please contact the bot deployer for access privileges."
-        )
-        return ConversationHandler.END
-    
     user_id = update.effective_user.id
-    if user_id in quotation_data:
-        del quotation_data[user_id]
+    await end_session(context, user_id)
     
     await update.message.reply_text(
         "Quotation creation cancelled. All data has been cleared.\n"
@@ -274,111 +223,39 @@ async def cancel(update: Update, context: CallbackContext) -> int:
 
 async def handle_general_message(update: Update, context: CallbackContext) -> None:
     """Handle general messages and filter non-relevant queries using AI-like detection."""
-    if not is_authorized(update):
-        await update.message.reply_text(
-            "Sorry, you are not authorized to use this bot. "
-            "This bot is currently in private mode and only authorized users can access it. "
-            "Please contact the bot deployer for access privileges."
-        )
-        return
-    
-    # Get the message text
-    message_text = update.message.text.lower()
-    
-    # Define specific non-function queries that users might ask
-    non_function_queries = {
-        'weather': ['weather', 'forecast', 'temperature', 'rain', 'sunny', 'cloudy'],
-        'news': ['news', 'latest news', 'current events', 'headlines', 'what\'s happening'],
-        'general_chat': ['hello', 'hi', 'hey', 'how are you', 'who are you', 'what can you do', 'tell me a joke', 'joke'],
-        'time': ['time', 'date', 'day', 'today', 'now'],
-        'search': ['search', 'find', 'look up', 'google', 'internet'],
-        'math': ['calculate', 'solve', 'math', 'equation', 'result', 'answer'],
-        'translation': ['translate', 'language', 'mean in', 'what is', 'definition', 'define'],
-        'other_bots': ['gpt', 'ai', 'alexa', 'siri', 'chatgpt', 'bard', 'claude', 'gemini']
-    }
-    
-    # Check if the message is a common non-function query
-    non_function_category = None
-    for category, keywords in non_function_queries.items():
-        if any(keyword in message_text for keyword in keywords):
-            non_function_category = category
-            break
-    
-    # Define categories of keywords related to the bot's function for better relevancy detection
-    function_keywords = {
-        'quotation_core': [
-            'quote', 'quotation', 'invoice', 'offer', 'proposal', 'estimate', 
-            'pricing', 'generate', 'create', 'make', 'new'
-        ],
-        'client_info': [
-            'customer', 'client', 'buyer', 'company', 'business', 'contact',
-            'address', 'email', 'phone', 'name'
-        ],
-        'item_details': [
-            'item', 'product', 'service', 'goods', 'merchandise', 'quantity',
-            'price', 'cost', 'amount', 'unit', 'total', 'subtotal'
-        ],
-        'terms': [
-            'terms', 'condition', 'agreement', 'policy', 'discount', 'payment',
-            'due date', 'validity', 'expiry', 'notes', 'issued', 'authorized'
-        ],
-        'document': [
-            'pdf', 'document', 'file', 'format', 'template', 'download', 'send',
-            'share', 'print', 'export', 'html'
-        ],
-        'process': [
-            'step', 'guide', 'how to', 'instruction', 'tutorial', 'ai',
-            'step-by-step', 'all at once', 'info', 'input', 'summary'
-        ],
-        'management': [
-            'modify', 'change', 'edit', 'update', 'delete', 'remove', 'cancel',
-            'revise', 'adjust', 'correct'
-        ]
-    }
-    
-    # Check relevancy based on category matches for more accurate detection
-    matched_categories = []
-    for category, keywords in function_keywords.items():
-        if any(keyword in message_text for keyword in keywords):
-            matched_categories.append(category)
-    
-    # Determine overall relevancy score
-    relevancy_score = len(matched_categories)
-    is_relevant = relevancy_score > 0
-    
-    # Advanced pattern detection for questions
-    question_patterns = [
-        '?', 'how', 'what', 'when', 'where', 'who', 'why', 'can', 'could',
-        'would', 'should', 'do', 'does', 'is', 'are', 'will', 'explain'
-    ]
-    is_question = any(pattern in message_text for pattern in question_patterns)
+    # Classify the message against the keyword lists in app/utils/intents.py
+    intent = classify(update.message.text)
+    non_function_category = intent.non_function_category
+    matched_categories = intent.matched_categories
+    is_question = intent.is_question
+    is_relevant = len(matched_categories) > 0
     
     # Log the relevancy analysis
-    logger.info(f"Message: '{message_text}' | Relevancy score: {relevancy_score} | Categories: {matched_categories} | Is question: {is_question} | Non-function category: {non_function_category}")
+    logger.info(f"Relevancy score: {len(matched_categories)} | Categories: {matched_categories} | Is question: {is_question} | Non-function category: {non_function_category}")
     
     # Handle specific non-function queries with targeted responses
     if non_function_category:
         if non_function_category == 'general_chat':
-            if 'hello' in message_text or 'hi' in message_text or 'hey' in message_text:
+            if intent.chat_topic == 'greeting':
                 await update.message.reply_text(
                     "Hello! I'm the Quotation Bot. I can help you create professional quotations. "
                     "Type /newquote to start or /help for more information."
                 )
                 return
-            elif 'how are you' in message_text:
+            elif intent.chat_topic == 'how_are_you':
                 await update.message.reply_text(
                     "I'm just a bot focused on helping you create quotations. "
                     "I'm ready to assist with your quotation needs! Use /newquote to start."
                 )
                 return
-            elif 'who are you' in message_text or 'what can you do' in message_text:
+            elif intent.chat_topic == 'who_are_you':
                 await update.message.reply_text(
                     "I'm a specialized bot designed to help create professional quotations. "
                     "I can guide you step-by-step or use AI to extract information from your text. "
                     "Use /help to learn more about my capabilities."
                 )
                 return
-            elif 'joke' in message_text:
+            elif intent.chat_topic == 'joke':
                 await update.message.reply_text(
                     "I'm focused on creating quotations, not jokes. But I can help you create "
                     "a professional quotation that's no laughing matter! Use /newquote to begin."
@@ -477,7 +354,7 @@ async def set_public_mode(update: Update, context: CallbackContext) -> None:
     user_id = update.effective_user.id
     
     # Only users in ALLOWED_USER_IDS can change the mode (regardless of current mode)
-    if user_id not in Config.ALLOWED_USER_IDS:
+    if not access_control.is_admin(user_id):
         await update.message.reply_text(
             "Sorry, only authorized administrators can change the bot's access mode."
         )
@@ -485,6 +362,7 @@ async def set_public_mode(update: Update, context: CallbackContext) -> None:
     
     # Change the mode
     Config.PUBLIC_MODE = True
+    access_control.invalidate()
     logger.info(f"Bot mode changed to PUBLIC by user {user_id}")
     
     await update.message.reply_text(
@@ -496,7 +374,7 @@ async def set_private_mode(update: Update, context: CallbackContext) -> None:
     user_id = update.effective_user.id
     
     # Only users in ALLOWED_USER_IDS can change the mode (regardless of current mode)
-    if user_id not in Config.ALLOWED_USER_IDS:
+    if not access_control.is_admin(user_id):
         await update.message.reply_text(
             "Sorry, only authorized administrators can change the bot's access mode."
         )
@@ -504,6 +382,7 @@ async def set_private_mode(update: Update, context: CallbackContext) -> None:
     
     # Change the mode
     Config.PUBLIC_MODE = False
+    access_control.invalidate()
     logger.info(f"Bot mode changed to PRIVATE by user {user_id}")
     
     await update.message.reply_text(
@@ -515,7 +394,7 @@ async def check_mode(update: Update, context: CallbackContext) -> None:
     user_id = update.effective_user.id
     
     # Only users in ALLOWED_USER_IDS can check the mode
-    if user_id not in Config.ALLOWED_USER_IDS:
+    if not access_control.is_admin(user_id):
         await update.message.reply_text(
             "Sorry, only authorized administrators can check the bot's access mode."
         )
@@ -528,10 +407,97 @@ async def check_mode(update: Update, context: CallbackContext) -> None:
         f"PRIVATE mode: Only authorized users can use the bot"
     )
 
+async def _change_access(update: Update, context: CallbackContext, kind: str, grant: bool) -> None:
+    """Add a user or group to the allow lists, or remove one, as asked by an administrator.
+    
+    Args:
+        update: Update with the command
+        context: Callback context with the command arguments
+        kind: 'users' or 'groups'
+        grant: True to allow, False to disallow
+    """
+    user_id = update.effective_user.id
+    command = f"/{'allow' if grant else 'remove'}{kind[:-1]}"
+    
+    # Only users in ALLOWED_USER_IDS can change who has access
+    if not access_control.is_admin(user_id):
+        await update.message.reply_text(
+            "Sorry, only authorized administrators can change who can use the bot."
+        )
+        return
+    
+    if context.args:
+        try:
+            target = int(context.args[0])
+        except ValueError:
+            await update.message.reply_text(f"Please give a numeric ID, e.g. {command} 123456789")
+            return
+    elif kind == 'groups' and update.effective_chat.type in [Chat.GROUP, Chat.SUPERGROUP]:
+        # Without an ID the group the command was sent in is meant
+        target = update.effective_chat.id
+    else:
+        example = "123456789" if kind == 'users' else "-1001234567890"
+        await update.message.reply_text(f"Usage: {command} <id>, e.g. {command} {example}")
+        return
+    
+    if not grant and kind == 'users' and target == user_id:
+        await update.message.reply_text("You can't remove your own access.")
+        return
+    
+    label = "User" if kind == 'users' else "Group"
+    if grant:
+        changed = access_control.grant(kind, target)
+        reply = f"✅ {label} {target} can now use the bot." if changed else f"{label} {target} already has access."
+    else:
+        changed = access_control.revoke(kind, target)
+        reply = f"🔒 {label} {target} can no longer use the bot." if changed else f"{label} {target} didn't have access."
+    if changed:
+        logger.info(f"{label} {target} {'allowed' if grant else 'removed'} by user {user_id}")
+    
+    await update.message.reply_text(reply)
+
+async def allow_user(update: Update, context: CallbackContext) -> None:
+    """Allow a user to use the bot: /allowuser <user_id>."""
+    await _change_access(update, context, 'users', grant=True)
+
+async def remove_user(update: Update, context: CallbackContext) -> None:
+    """Stop a user from using the bot: /removeuser <user_id>."""
+    await _change_access(update, context, 'users', grant=False)
+
+async def allow_group(update: Update, context: CallbackContext) -> None:
+    """Allow a group to use the bot: /allowgroup [chat_id], the current group if no ID is given."""
+    await _change_access(update, context, 'groups', grant=True)
+
+async def remove_group(update: Update, context: CallbackContext) -> None:
+    """Stop a group from using the bot: /removegroup [chat_id], the current group if no ID is given."""
+    await _change_access(update, context, 'groups', grant=False)
+
+async def list_access(update: Update, context: CallbackContext) -> None:
+    """List the users and groups that can use the bot."""
+    user_id = update.effective_user.id
+    
+    # Only users in ALLOWED_USER_IDS can see the lists
+    if not access_control.is_admin(user_id):
+        await update.message.reply_text(
+            "Sorry, only authorized administrators can see who can use the bot."
+        )
+        return
+    
+    def describe(ids) -> str:
+        return ", ".join(str(id) for id in sorted(ids)) or "none"
+    
+    await update.message.reply_text(
+        f"Mode: {'PUBLIC' if Config.PUBLIC_MODE else 'PRIVATE'}\n\n"
+        f"Administrators: {describe(access_control.admins)}\n"
+        f"Users: {describe(access_control.allowed_users - access_control.admins)}\n"
+        f"Groups: {describe(access_control.allowed_groups)}"
+    )
+
 def main(application: Application = None) -> None:
-    """Start the bot."""
-    if application is None:
-        application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+    """Register the handlers, and start polling if no application was passed in."""
+    owns_application = application is None
+    if owns_application:
+        application = Application.builder().token(Config.BOT_TOKEN).build()
     
     # Create a single conversation handler for both flows
     conv_handler = ConversationHandler(
@@ -566,11 +532,21 @@ def main(application: Application = None) -> None:
                 MessageHandler(filters.TEXT & ~filters.COMMAND, handle_ai_additional_input)
             ]
         },
-        fallbacks=[CommandHandler('cancel', cancel)]
+        fallbacks=[CommandHandler('cancel', cancel)],
+        # States survive restarts when the application has a persistence
+        name="quotation",
+        persistent=application.persistence is not None
     )
     
     # Add handlers
     application.add_handler(conv_handler)
+    
+    # Turn away unauthorized users before any other handler sees their updates
+    application.add_handler(TypeHandler(Update, access_control.gate), group=AUTH_HANDLER_GROUP)
+    
+    # Note when each conversation was last active so idle ones can be closed
+    idle_reaper.watch(conv_handler)
+    application.add_handler(TypeHandler(Update, idle_reaper.track), group=ACTIVITY_HANDLER_GROUP)
     application.add_handler(CommandHandler('start', start))
     application.add_handler(CommandHandler('help', help_command))
     
@@ -579,11 +555,19 @@ def main(application: Application = None) -> None:
     application.add_handler(CommandHandler('setprivate', set_private_mode))
     application.add_handler(CommandHandler('checkmode', check_mode))
     
+    # Add access list commands for administrators
+    application.add_handler(CommandHandler('allowuser', allow_user))
+    application.add_handler(CommandHandler('removeuser', remove_user))
+    application.add_handler(CommandHandler('allowgroup', allow_group))
+    application.add_handler(CommandHandler('removegroup', remove_group))
+    application.add_handler(CommandHandler('listaccess', list_access))
+    
     # Add general message handler (will only trigger if no other handlers match)
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_general_message))
     
-    # Start the bot
-    application.run_polling()
+    # Start the bot, unless the caller (create_application) runs it
+    if owns_application:
+        application.run_polling()
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""
+Ends quotation conversations that have been idle for longer than their state allows.
+
+ConversationHandler's own conversation_timeout needs the JobQueue extra
+(APScheduler), which this bot doesn't install, and would schedule one job
+per conversation. Instead a single background task scans the live
+conversations every REAPER_INTERVAL seconds and ends the stale ones in one
+pass, dropping their drafts and scratch data and telling each user once.
+
+Ending a conversation from outside an update needs ConversationHandler's
+private _conversations and _update_state, so requirements.txt and
+setup.py pin python-telegram-bot to the release this was tested against
+(20.6).
+"""
+
+import time
+import asyncio
+import logging
+from typing import Dict, Hashable, Optional, Tuple
+
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import Application, ContextTypes, ConversationHandler
+
+from app.config import Config
+from app.utils.metrics import metrics
+from . import constants
+from .constants import CONVERSATION_KEYS, quotation_data
+
+logger = logging.getLogger(__name__)
+
+IDLE_MESSAGE = (
+    "Your quotation was closed because it was idle for a while. "
+    "Use /newquote to start again."
+)
+
+
+def parse_state_timeouts(spec: str) -> Dict[int, float]:
+    """Parse per-state timeouts written as 'STATE=seconds,STATE=seconds' using the state names in constants.
+
+    Args:
+        spec: The CONVERSATION_STATE_TIMEOUTS setting
+    """
+    timeouts = {}
+    for part in spec.split(','):
+        name, _, seconds = part.partition('=')
+        name = name.strip().upper()
+        if not name:
+            continue
+        state = getattr(constants, name, None)
+        if not isinstance(state, int) or not seconds.strip():
+            logger.warning(f"Ignoring conversation timeout for unknown state or value: {part.strip()}")
+            continue
+        timeouts[state] = float(seconds)
+    return timeouts
+
+
+class IdleSessionReaper:
+    """Tracks the last activity of each conversation and ends the ones that went idle."""
+
+    def __init__(
+        self,
+        default_timeout: Optional[float] = None,
+        state_timeouts: Optional[Dict[int, float]] = None,
+        interval: Optional[float] = None
+    ):
+        """Initialize the reaper.
+
+        Args:
+            default_timeout: Idle seconds allowed in any state (uses CONVERSATION_TIMEOUT if None, 0 disables reaping)
+            state_timeouts: Idle seconds for specific states (parsed from CONVERSATION_STATE_TIMEOUTS if None)
+            interval: Seconds between passes (uses REAPER_INTERVAL if None)
+        """
+        self.default_timeout = Config.CONVERSATION_TIMEOUT if default_timeout is None else default_timeout
+        self.state_timeouts = parse_state_timeouts(Config.CONVERSATION_STATE_TIMEOUTS) if state_timeouts is None else state_timeouts
+        self.interval = Config.REAPER_INTERVAL if interval is None else interval
+        self.conversation: Optional[ConversationHandler] = None
+        self._last_seen: Dict[Tuple[int, int], float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def watch(self, conversation: ConversationHandler) -> None:
+        """Reap the conversations of this handler (per chat and per user, as the quotation flow is)."""
+        self.conversation = conversation
+
+    async def track(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Record activity; registered as a TypeHandler that runs before the conversation handler."""
+        if update.effective_chat is not None and update.effective_user is not None:
+            self._last_seen[(update.effective_chat.id, update.effective_user.id)] = time.monotonic()
+
+    def timeout_for(self, state: Hashable) -> float:
+        """Idle seconds allowed in state."""
+        return self.state_timeouts.get(state, self.default_timeout)
+
+    async def reap(self, application: Application) -> int:
+        """End every conversation idle for longer than its state allows and return how many were ended."""
+        if self.conversation is None:
+            return 0
+        now = time.monotonic()
+        # The handler keeps its states privately; there is no public way to end a conversation from outside
+        conversations = self.conversation._conversations
+        stale = []
+        for key, state in list(conversations.items()):
+            if not isinstance(state, int):
+                # A non-blocking callback is still running
+                continue
+            last_seen = self._last_seen.get(key)
+            if last_seen is None:
+                # Restored from persistence; its clock starts now
+                self._last_seen[key] = now
+                continue
+            timeout = self.timeout_for(state)
+            if timeout and now - last_seen >= timeout:
+                stale.append(key)
+
+        for key in stale:
+            _, user_id = key
+            self.conversation._update_state(ConversationHandler.END, key)
+            self._last_seen.pop(key, None)
+            await quotation_data.delete(user_id)
+            user_data = application.user_data.get(user_id)
+            if user_data:
+                for name in CONVERSATION_KEYS:
+                    user_data.pop(name, None)
+                application.mark_data_for_update_persistence(user_ids=[user_id])
+            try:
+                # A private chat's id is the user's, so this also tells users who started in a group privately
+                await application.bot.send_message(chat_id=user_id, text=IDLE_MESSAGE)
+            except TelegramError as e:
+                logger.warning(f"Could not tell user {user_id} their quotation expired: {str(e)}")
+
+        # Conversations that ended normally no longer need a clock
+        for key in [key for key in self._last_seen if key not in conversations]:
+            del self._last_seen[key]
+
+        metrics.increment("conversations.reaped", len(stale))
+        metrics.set_gauge("conversations.live", len(conversations))
+        if stale:
+            logger.info(f"Ended {len(stale)} idle conversations, {len(conversations)} still live")
+        return len(stale)
+
+    def start(self, application: Application) -> None:
+        """Start reaping in the background."""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._reap_loop(application))
+
+    def stop(self) -> None:
+        """Stop the background task."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _reap_loop(self, application: Application) -> None:
+        """Reap periodically until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reap(application)
+            except Exception as e:
+                logger.error(f"Idle conversation reaper failed: {str(e)}", exc_info=True)
+
+
+# Create a singleton instance for use throughout the application
+idle_reaper = IdleSessionReaper()
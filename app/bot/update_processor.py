@@ -0,0 +1,97 @@
+"""
+Concurrent update processing that keeps each user's updates in order.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Dict, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# Limit given to the base class, which counts updates waiting for their user's turn as well as running ones
+MAX_PENDING_UPDATES = 10000
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates from different users in parallel and updates from one user one at a time.
+
+    ConversationHandler state and quotation_data are keyed by user, so they
+    only need ordering within a user. Each user gets an asyncio.Lock; locks
+    are FIFO, so a user's updates run in the order they arrived. A lock is
+    dropped as soon as nobody holds or waits for it.
+
+    The base class takes its slot before do_process_update, so it is given
+    a generous MAX_PENDING_UPDATES and the real limit is a semaphore taken
+    after the user's lock. Updates queued behind a user's slow handler then
+    wait without holding slots other users need.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        """Initialize the processor.
+
+        Args:
+            max_concurrent_updates: Updates processed at the same time across all users
+        """
+        super().__init__(max(MAX_PENDING_UPDATES, max_concurrent_updates))
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._waiting: Dict[Hashable, int] = {}
+        self._active = 0
+
+    @staticmethod
+    def ordering_key(update: object) -> Optional[Hashable]:
+        """Return the key whose updates must be serialized, or None if the update can run freely."""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return ('chat', update.effective_chat.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Run the update once every earlier update from the same user has finished and a slot is free."""
+        key = self.ordering_key(update)
+        if key is None:
+            async with self._slots:
+                await self._run(coroutine)
+            return
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        queued_at = time.monotonic()
+        try:
+            async with lock:
+                metrics.observe("updates.user_wait", time.monotonic() - queued_at)
+                async with self._slots:
+                    await self._run(coroutine)
+        finally:
+            self._waiting[key] -= 1
+            if not self._waiting[key]:
+                del self._waiting[key]
+                del self._locks[key]
+
+    async def _run(self, coroutine: Awaitable[Any]) -> None:
+        """Await the update's coroutine and keep the in-flight gauge current."""
+        self._active += 1
+        metrics.set_gauge("updates.in_flight", self._active)
+        try:
+            await coroutine
+        finally:
+            self._active -= 1
+            metrics.set_gauge("updates.in_flight", self._active)
+
+    async def initialize(self) -> None:
+        """Nothing to set up."""
+
+    async def shutdown(self) -> None:
+        """Nothing to tear down; pending updates finish on their own."""
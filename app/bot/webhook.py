@@ -0,0 +1,270 @@
+"""
+Webhook mode: a small asyncio HTTP server that feeds Telegram updates to the application.
+
+Telegram POSTs each update to WEBHOOK_PATH with the secret token in the
+X-Telegram-Bot-Api-Secret-Token header; the update is queued for the
+application and answered straight away. GET HEALTH_PATH reports the
+server state and current metrics.
+"""
+
+import hmac
+import json
+import signal
+import asyncio
+import logging
+from typing import Dict, Optional, Set, Tuple
+
+from telegram import Update
+from telegram.ext import Application
+
+from app.config import Config
+from app.utils.metrics import metrics
+from app.utils.pdf_generator import pdf_executor
+from app.utils.render_executor import render_executor
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+MAX_BODY_BYTES = 1024 * 1024
+
+_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class WebhookServer:
+    """Accepts webhook updates over HTTP/1.1 and puts them on the application's update queue."""
+
+    def __init__(
+        self,
+        application: Application,
+        path: Optional[str] = None,
+        secret_token: Optional[str] = None,
+        health_path: Optional[str] = None
+    ):
+        """Initialize the server.
+
+        Args:
+            application: Application whose update_queue receives the updates
+            path: URL path Telegram posts to (uses WEBHOOK_PATH if None)
+            secret_token: Expected secret token header (uses WEBHOOK_SECRET_TOKEN if None, empty to skip the check)
+            health_path: URL path of the health endpoint (uses HEALTH_PATH if None)
+        """
+        self.application = application
+        self.path = '/' + (path if path is not None else Config.WEBHOOK_PATH).strip('/')
+        self.secret_token = secret_token if secret_token is not None else Config.WEBHOOK_SECRET_TOKEN
+        self.health_path = '/' + (health_path if health_path is not None else Config.HEALTH_PATH).strip('/')
+        self.draining = False
+        self.port: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+        self._handlers: Set[asyncio.Task] = set()
+
+        if not self.secret_token:
+            logger.warning("WEBHOOK_SECRET_TOKEN is not set, webhook requests will not be authenticated")
+
+    async def start(self, host: Optional[str] = None, port: Optional[int] = None) -> int:
+        """Start listening and return the bound port.
+
+        Args:
+            host: Address to listen on (uses WEBHOOK_LISTEN if None)
+            port: Port to listen on (uses WEBHOOK_PORT if None, 0 for any free port)
+        """
+        host = host or Config.WEBHOOK_LISTEN
+        port = Config.WEBHOOK_PORT if port is None else port
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Webhook server listening on {host}:{self.port}{self.path}")
+        return self.port
+
+    async def stop(self) -> None:
+        """Stop accepting connections and close the idle ones."""
+        self.draining = True
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._connections):
+                writer.close()
+            if self._handlers:
+                await asyncio.wait(list(self._handlers), timeout=1.0)
+            await self._server.wait_closed()
+            self._server = None
+
+    def health(self) -> Dict:
+        """Return the health report served on the health endpoint."""
+        return {
+            'status': 'draining' if self.draining else 'ok',
+            'update_queue': self.application.update_queue.qsize(),
+            'pending_renders': render_executor.pending,
+            'metrics': metrics.snapshot()
+        }
+
+    async def handle(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Dict]:
+        """Answer one request.
+
+        Args:
+            method: HTTP method
+            path: Request path, without the query string
+            headers: Request headers with lower-case names
+            body: Request body
+
+        Returns:
+            The status code and the JSON body
+        """
+        if path == self.health_path:
+            if method != 'GET':
+                return 405, {'ok': False}
+            return (503 if self.draining else 200), self.health()
+
+        if path != self.path:
+            return 404, {'ok': False}
+        if method != 'POST':
+            return 405, {'ok': False}
+        if self.secret_token and not hmac.compare_digest(headers.get(SECRET_HEADER, ''), self.secret_token):
+            metrics.increment("webhook.rejected")
+            logger.warning("Rejected webhook request with a missing or wrong secret token")
+            return 403, {'ok': False}
+        if self.draining:
+            # Telegram retries updates that were not accepted, so another instance or the next start gets them
+            return 503, {'ok': False}
+
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Ignoring malformed webhook update: {str(e)}")
+            return 400, {'ok': False}
+        if update is None:
+            return 400, {'ok': False}
+
+        await self.application.update_queue.put(update)
+        metrics.increment("webhook.updates")
+        return 200, {'ok': True}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one keep-alive connection."""
+        self._connections.add(writer)
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', '0'))
+                if length > MAX_BODY_BYTES:
+                    await self._write(writer, 413, {'ok': False})
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, reply = await self.handle(method, target.split('?')[0].rstrip('/') or '/', headers, body)
+                await self._write(writer, status, reply)
+
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            self._handlers.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, status: int, reply: Dict) -> None:
+        """Write one JSON response."""
+        payload = json.dumps(reply).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"content-type: application/json\r\n"
+            f"content-length: {len(payload)}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + payload)
+        await writer.drain()
+
+
+async def drain_updates(application: Application, timeout: float) -> bool:
+    """Wait until the queued and in-flight updates, and the renders they started, have finished.
+
+    Args:
+        application: Running application
+        timeout: Seconds to wait
+
+    Returns:
+        True if everything finished in time
+    """
+    async def idle() -> None:
+        # The application marks an update done only after its handlers have returned
+        await application.update_queue.join()
+        while render_executor.pending or pdf_executor.pending:
+            await asyncio.sleep(0.05)
+
+    try:
+        await asyncio.wait_for(idle(), timeout=timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+async def serve_webhook(
+    application: Application,
+    stop_event: Optional[asyncio.Event] = None,
+    server: Optional[WebhookServer] = None
+) -> None:
+    """Run the application in webhook mode until stop_event is set or a stop signal arrives.
+
+    On shutdown the server stops accepting updates first, then waits up to
+    WEBHOOK_DRAIN_TIMEOUT seconds for the queued and in-flight updates (and
+    the renders they are waiting on) to finish before stopping the
+    application. Updates still queued after that are dropped; ones already
+    running are allowed to finish, since application.stop() waits for them.
+
+    Args:
+        application: Configured application, not yet initialized
+        stop_event: Event that stops the server (SIGINT/SIGTERM set it if None)
+        server: Server to run, e.g. one bound to a test port (one configured from Config if None)
+    """
+    if stop_event is None:
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                pass
+
+    server = server or WebhookServer(application)
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    if server.port is None:
+        await server.start()
+
+    if Config.WEBHOOK_URL:
+        await application.bot.set_webhook(
+            url=Config.WEBHOOK_URL.rstrip('/') + server.path,
+            secret_token=server.secret_token or None,
+            allowed_updates=Update.ALL_TYPES
+        )
+        logger.info(f"Registered webhook {Config.WEBHOOK_URL.rstrip('/')}{server.path}")
+    else:
+        logger.warning("WEBHOOK_URL is not set, assuming the webhook is registered elsewhere")
+
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info("Stopping webhook server and draining in-flight updates")
+        await server.stop()
+        if not await drain_updates(application, Config.WEBHOOK_DRAIN_TIMEOUT):
+            logger.warning(
+                f"Updates still running after {Config.WEBHOOK_DRAIN_TIMEOUT}s, "
+                f"dropping {application.update_queue.qsize()} queued and waiting for the running ones"
+            )
+        await application.stop()
+        await application.shutdown()
@@ -7,11 +7,23 @@ load_dotenv()
 class Config:
     # Bot Configuration
     BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+    MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '64'))  # Updates from different users handled in parallel, 1 for one at a time
+    
+    # Update delivery
+    RUN_MODE = os.getenv('RUN_MODE', 'polling').lower()  # 'polling' or 'webhook'
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # Public base URL registered with Telegram, empty to skip registration
+    WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+    WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')
+    HEALTH_PATH = os.getenv('HEALTH_PATH', 'healthz')
+    WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', '30'))  # Seconds to finish in-flight updates on shutdown
     
     # Authorization
     PUBLIC_MODE = os.getenv('PUBLIC_MODE', 'False').lower() in ('true', '1', 't')  # Default to private mode
     ALLOWED_USER_IDS = [int(id.strip()) for id in os.getenv('ALLOWED_USER_IDS', '').split(',') if id.strip()]
     ALLOWED_GROUP_IDS = [int(id.strip()) for id in os.getenv('ALLOWED_GROUP_IDS', '').split(',') if id.strip()]
+    ACCESS_LIST_PATH = os.getenv('ACCESS_LIST_PATH', 'access_list.json')  # Users and groups added or removed by admin commands; empty to not keep them
     
     # Company Information
     COMPANY_NAME = os.getenv('COMPANY_NAME')
@@ -30,9 +42,51 @@ class Config:
     # Storage settings
     SAVE_TO_STORAGE = os.getenv('SAVE_TO_STORAGE', 'False').lower() in ('true', '1', 't')
     STORAGE_PATH = os.getenv('STORAGE_PATH', 'quotes')
+    TEMP_PATH = os.getenv('TEMP_PATH', 'temp')
+    CLEANUP_JOURNAL_PATH = os.getenv('CLEANUP_JOURNAL_PATH', os.path.join(TEMP_PATH, '.cleanup_journal'))  # Empty to disable
+    
+    # Conversation sessions
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory').lower()  # 'memory' or 'redis'
+    SESSION_TTL = float(os.getenv('SESSION_TTL', '86400'))  # Idle seconds before an unfinished quotation is dropped
+    SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', '10000'))  # Memory backend only
+    SESSION_MAX_BYTES = int(os.getenv('SESSION_MAX_BYTES', str(50 * 1024 * 1024)))  # Memory backend only, 0 for no limit
+    SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL', 'redis://127.0.0.1:6379/0')
+    SESSION_SWEEP_INTERVAL = float(os.getenv('SESSION_SWEEP_INTERVAL', '300'))  # Seconds between expiry sweeps
+    CONVERSATION_TIMEOUT = float(os.getenv('CONVERSATION_TIMEOUT', '3600'))  # Idle seconds before a quotation is closed, 0 to never close
+    CONVERSATION_STATE_TIMEOUTS = os.getenv('CONVERSATION_STATE_TIMEOUTS', 'CHOOSE_MODE=900,AI_SUMMARY=1800')  # Per-state overrides
+    REAPER_INTERVAL = float(os.getenv('REAPER_INTERVAL', '60'))  # Seconds between idle-conversation checks
+    PERSISTENCE_PATH = os.getenv('PERSISTENCE_PATH', 'bot_state.sqlite3')  # Conversation states, user_data and drafts; empty to disable
+    PERSISTENCE_INTERVAL = float(os.getenv('PERSISTENCE_INTERVAL', '5'))  # Seconds between batched writes
+    
+    # Template rendering
+    TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR', '')  # On-disk Jinja2 bytecode cache, disabled if empty
+    RENDER_POOL_MODE = os.getenv('RENDER_POOL_MODE', 'thread').lower()  # 'thread' or 'process'
+    RENDER_POOL_WORKERS = int(os.getenv('RENDER_POOL_WORKERS', '2'))
+    RENDER_QUEUE_MAX = int(os.getenv('RENDER_QUEUE_MAX', '32'))  # Jobs allowed to wait for a free worker
+    
+    # Output format
+    OUTPUT_FORMAT = os.getenv('OUTPUT_FORMAT', 'html').lower()  # 'html' or 'pdf'
+    PDF_WORKERS = int(os.getenv('PDF_WORKERS', '2'))  # Pre-warmed WeasyPrint worker processes
     
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', '')  # e.g. the local fake server, empty for api.openai.com
+    OPENAI_RECORD_PATH = os.getenv('OPENAI_RECORD_PATH', '')  # Append every request/response pair to this JSONL file
+    OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')  # Default (cheap) model
+    OPENAI_FALLBACK_MODEL = os.getenv('OPENAI_FALLBACK_MODEL', 'gpt-4o')  # Bigger model for large or incomplete extractions, empty to disable
+    ROUTER_LONG_INPUT_CHARS = int(os.getenv('ROUTER_LONG_INPUT_CHARS', '2000'))  # Longer inputs go to the fallback model
+    ROUTER_MANY_ITEMS = int(os.getenv('ROUTER_MANY_ITEMS', '15'))  # Inputs with this many item lines go to the fallback model
+    ROUTER_MAX_FAILURE_RATE = float(os.getenv('ROUTER_MAX_FAILURE_RATE', '0.3'))  # Recent cheap-model failure rate that triggers routing
+    OPENAI_MAX_IN_FLIGHT = int(os.getenv('OPENAI_MAX_IN_FLIGHT', '4'))  # Concurrent OpenAI requests
+    OPENAI_TOKENS_PER_MINUTE = int(os.getenv('OPENAI_TOKENS_PER_MINUTE', '60000'))  # 0 disables the token budget
+    OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '4'))
+    SUMMARY_MODE = os.getenv('SUMMARY_MODE', 'local').lower()  # 'local' (template) or 'llm' (extra OpenAI call)
+    OPENAI_CACHE_SIZE = int(os.getenv('OPENAI_CACHE_SIZE', '1024'))  # Cached responses kept in memory
+    OPENAI_CACHE_TTL = int(os.getenv('OPENAI_CACHE_TTL', '3600'))  # Seconds a cached response stays valid
+    OPENAI_CACHE_PATH = os.getenv('OPENAI_CACHE_PATH', '')  # SQLite file for the on-disk tier, disabled if empty
+    STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', 'True').lower() in ('true', '1', 't')  # Stream extraction and show progress
+    PROGRESS_EDIT_INTERVAL = float(os.getenv('PROGRESS_EDIT_INTERVAL', '1.5'))  # Min seconds between progress edits per message
+    PRE_EXTRACT = os.getenv('PRE_EXTRACT', 'True').lower() in ('true', '1', 't')  # Regex fast path before GPT extraction
     
     @classmethod
     def get_company_info(cls):
@@ -2,10 +2,16 @@
 Main entry point for the Telegram Quotation Bot application.
 """
 
+import asyncio
 import logging
 from app.bot import create_application
+from app.bot.webhook import serve_webhook
 # Import file cleanup manager
 from app.utils.file_cleanup import cleanup_manager
+from app.utils.template_renderer import quotation_renderer
+from app.utils.render_executor import render_executor
+from app.utils.pdf_generator import pdf_executor
+from app.config import Config
 
 # Configure logging
 logging.basicConfig(
@@ -23,15 +29,29 @@ def main():
     # Initialize cleanup manager (will run automatically when files are added)
     logger.info("Initializing file cleanup manager (10 minute expiry)")
     
+    # Compile the quotation template once up front so the first quote doesn't pay for it
+    quotation_renderer.load()
+    
+    # Start the PDF workers and wait until each has loaded fonts and CSS, before the first quote can arrive
+    if Config.OUTPUT_FORMAT == 'pdf':
+        pdf_executor.warm_up()
+    
     # Create and configure the application
     application = create_application()
     
-    # Run the bot until the user presses Ctrl-C
-    application.run_polling()
+    # Run the bot until the user presses Ctrl-C (or the process gets SIGTERM)
+    if Config.RUN_MODE == 'webhook':
+        asyncio.run(serve_webhook(application))
+    else:
+        application.run_polling()
     
     # Stop the cleanup manager when bot stops
     cleanup_manager.stop_cleanup_task()
     
+    # Let any quotes still rendering finish before exiting
+    render_executor.shutdown(wait=True)
+    pdf_executor.shutdown(wait=True)
+    
     logger.info("Bot stopped")
 
 
@@ -0,0 +1,92 @@
+"""
+Naming and atomic staging of generated quotation files.
+"""
+
+import os
+import re
+import uuid
+import logging
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Union
+
+logger = logging.getLogger(__name__)
+
+# Prefix and suffix of in-progress writes; anything matching is an orphan if the process dies mid-write
+STAGING_PREFIX = '.'
+STAGING_SUFFIX = '.tmp'
+
+_UNSAFE_CHARS = re.compile(r'[^A-Za-z0-9._-]+')
+# Tail that unique_artifact_name adds: _HHMMSS_<12 hex chars>.<extension>
+_ARTIFACT_TAIL = re.compile(r'_\d{6}_[0-9a-f]{12}\.[A-Za-z0-9]+$')
+
+
+def safe_filename(name: str) -> str:
+    """Replace characters that are unsafe in file names (slashes, spaces, etc.) with underscores."""
+    cleaned = _UNSAFE_CHARS.sub('_', name).strip('._')
+    return cleaned or 'quotation'
+
+
+def unique_artifact_name(filename: str) -> str:
+    """Return a collision-free variant of filename for this render.
+
+    Two renders of the same customer on the same day (or one user confirming
+    twice) get different names, e.g.
+    ``Acme_Quotation_2024-05-01.html`` -> ``Acme_Quotation_2024-05-01_153012_9f1c2ab4d0e3.html``.
+
+    Args:
+        filename: The display filename, including its extension
+    """
+    stem, extension = os.path.splitext(filename)
+    timestamp = datetime.now().strftime('%H%M%S')
+    return f"{safe_filename(stem)}_{timestamp}_{uuid.uuid4().hex[:12]}{extension}"
+
+
+def write_artifact(directory: Union[str, Path], filename: str, content: bytes) -> Path:
+    """Atomically write content to directory/filename.
+
+    The data is written to a hidden temporary file in the same directory,
+    flushed to disk and then renamed into place, so readers never see a
+    partially written file and concurrent writers never interleave.
+
+    Args:
+        directory: Target directory (created if missing)
+        filename: Final file name
+        content: File contents
+
+    Returns:
+        The path of the written file
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    final_path = directory / filename
+
+    fd, staging_path = tempfile.mkstemp(dir=directory, prefix=f"{STAGING_PREFIX}{filename}.", suffix=STAGING_SUFFIX)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(staging_path, final_path)
+    except BaseException:
+        try:
+            os.remove(staging_path)
+        except OSError:
+            pass
+        raise
+
+    logger.info(f"Wrote artifact {final_path} ({len(content)} bytes)")
+    return final_path
+
+
+def is_artifact_name(name: str) -> bool:
+    """Whether a file name was produced here, by unique_artifact_name or as a staging file."""
+    if name.startswith(STAGING_PREFIX) and name.endswith(STAGING_SUFFIX):
+        return True
+    return bool(_ARTIFACT_TAIL.search(name))
+
+
+def store_artifact(directory: Union[str, Path], filename: str, content: bytes) -> Path:
+    """Write content under a unique name derived from filename and return its path."""
+    return write_artifact(directory, unique_artifact_name(filename), content)
@@ -0,0 +1,170 @@
+"""
+Function-calling contract for GPT extraction, generated from the quotation models.
+"""
+
+import re
+import copy
+import json
+from typing import Annotated, Any, Dict, List, Literal, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, ValidationError, create_model
+
+from app.utils.models import QuotationData, QuotationItem
+
+NON_NUMERIC = re.compile(r'[^0-9.]')
+
+EXTRACTION_TOOL_NAME = "record_quotation"
+
+# Field descriptions shown to the model, in prompt order
+EXTRACTION_FIELDS = {
+    "customer_name": "Customer's full name",
+    "customer_company": "Company name",
+    "customer_address": "Full address",
+    "customer_phone": "Phone number",
+    "customer_email": "Email address",
+    "items": "List of items, each with name, quantity, and unit_price",
+    "terms": "Payment terms and conditions",
+    "discount": "Discount percentage (if any)",
+    "issued_by": "Name of person issuing the quote"
+}
+
+# Extracted items use "name" where QuotationItem uses "item_name"
+ITEM_FIELDS = {"name": "item_name", "quantity": "quantity", "unit_price": "unit_price"}
+
+_NEGATIVE_ANSWERS = {"", "no", "none", "null", "n/a", "na", "not provided", "not applicable", "no discount", "no notes"}
+
+
+def parse_number(value: Any) -> Any:
+    """Turn formatted numbers such as "RM 1,000" into floats; negative answers become None."""
+    if isinstance(value, str):
+        if value.strip().lower() in _NEGATIVE_ANSWERS:
+            return None
+        numeric_part = NON_NUMERIC.sub('', value)
+        try:
+            return float(numeric_part) if numeric_part else None
+        except ValueError:
+            return None
+    return value
+
+
+Number = Annotated[Optional[float], BeforeValidator(parse_number)]
+
+
+def _extraction_type(annotation: Any) -> Any:
+    """Map a model field type to the lenient type used for extraction."""
+    return Number if annotation in (int, float) else Optional[str]
+
+
+_lenient = ConfigDict(extra='ignore', coerce_numbers_to_str=True)
+
+ExtractedItem = create_model(
+    'ExtractedItem',
+    __config__=_lenient,
+    **{
+        name: (_extraction_type(QuotationItem.model_fields[source].annotation), None)
+        for name, source in ITEM_FIELDS.items()
+    }
+)
+
+ExtractedQuotation = create_model(
+    'ExtractedQuotation',
+    __config__=_lenient,
+    **{
+        name: (
+            Optional[List[ExtractedItem]] if name == "items"
+            else _extraction_type(QuotationData.model_fields[name].annotation),
+            Field(None, description=description)
+        )
+        for name, description in EXTRACTION_FIELDS.items()
+    }
+)
+
+
+class ExtractionResult(BaseModel):
+    """Arguments of the extraction tool call."""
+    model_config = ConfigDict(extra='ignore')
+
+    data: ExtractedQuotation = Field(default_factory=ExtractedQuotation)
+    missing_fields: List[str] = Field(default_factory=list, description="Required fields that are missing or unclear")
+    items_mode: Optional[Literal["add", "replace"]] = Field(
+        None, description='"replace" if the message gives a complete new item list, otherwise "add"'
+    )
+
+
+def _compact_schema(schema: Dict) -> Dict:
+    """Inline $defs references and drop titles, defaults and null branches to keep the prompt small."""
+    defs = schema.pop('$defs', {})
+
+    def resolve(node: Any) -> Any:
+        if isinstance(node, dict):
+            if '$ref' in node:
+                return resolve(copy.deepcopy(defs[node['$ref'].rsplit('/', 1)[-1]]))
+            node = dict(node)
+            branches = [branch for branch in node.pop('anyOf', []) if branch != {'type': 'null'}]
+            if len(branches) == 1:
+                node.update(branches[0])
+            elif branches:
+                node['anyOf'] = branches
+            return {key: resolve(value) for key, value in node.items() if key not in ('title', 'default')}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+
+    return resolve(schema)
+
+
+_RESULT_SCHEMA = _compact_schema(ExtractionResult.model_json_schema())
+
+
+def extraction_tool(fields: Sequence[str], items_mode: bool = False) -> Dict:
+    """Build the tool definition, limited to the fields being asked for.
+
+    Args:
+        fields: Names from EXTRACTION_FIELDS the model should fill in
+        items_mode: Whether to include the items_mode flag used by delta extraction
+    """
+    schema = copy.deepcopy(_RESULT_SCHEMA)
+    data = schema['properties']['data']
+    data['properties'] = {name: data['properties'][name] for name in fields}
+    if not items_mode:
+        del schema['properties']['items_mode']
+    return {
+        "type": "function",
+        "function": {
+            "name": EXTRACTION_TOOL_NAME,
+            "description": "Record the quotation details found in the text",
+            "parameters": schema
+        }
+    }
+
+
+def parse_extraction(arguments: str) -> Tuple[Dict, List[str], Optional[str]]:
+    """Validate the tool call arguments in one pass.
+
+    Fields that fail validation are dropped and reported as missing, so a
+    partly malformed reply is still usable without another round trip.
+
+    Returns a tuple of (data, missing_fields, items_mode). Raises ValueError
+    if the arguments are not a JSON object.
+    """
+    try:
+        result = ExtractionResult.model_validate_json(arguments)
+    except ValidationError as e:
+        payload = json.loads(arguments)
+        if not isinstance(payload, dict):
+            raise ValueError("Extraction arguments are not a JSON object")
+
+        data = payload.get('data') if isinstance(payload.get('data'), dict) else {}
+        missing = payload.get('missing_fields') if isinstance(payload.get('missing_fields'), list) else []
+        invalid = {str(error['loc'][1]) for error in e.errors() if len(error['loc']) >= 2 and error['loc'][0] == 'data'}
+        payload = {
+            'data': {key: value for key, value in data.items() if key not in invalid},
+            'missing_fields': [str(field) for field in missing] + sorted(invalid - set(map(str, missing))),
+            'items_mode': payload.get('items_mode') if payload.get('items_mode') in ('add', 'replace') else None
+        }
+        result = ExtractionResult.model_validate(payload)
+
+    data = result.data.model_dump(exclude_none=True)
+    if "items" in data:
+        data["items"] = [item for item in data["items"] if item]
+    return data, result.missing_fields, result.items_mode
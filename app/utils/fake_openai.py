@@ -0,0 +1,317 @@
+"""
+Local OpenAI-compatible server that replays recorded chat completions.
+
+Run it with:
+    python -m app.utils.fake_openai --recordings openai_recordings.jsonl --latency 0.5 --rate-limit-rate 0.1
+
+and point the bot at it with OPENAI_BASE_URL=http://127.0.0.1:8089/v1.
+"""
+
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import itertools
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from app.utils.openai_replay import load_recordings, request_key
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+def completion_to_sse(completion: Dict, chunk_chars: int = 16) -> str:
+    """Turn a complete chat completion into the server-sent events a streamed request expects."""
+    base = {
+        'id': completion.get('id', 'chatcmpl-fake'),
+        'object': 'chat.completion.chunk',
+        'created': completion.get('created', int(time.time())),
+        'model': completion.get('model', 'fake')
+    }
+    message = (completion.get('choices') or [{}])[0].get('message') or {}
+    events = []
+
+    def event(delta: Dict, finish_reason: Optional[str] = None) -> None:
+        chunk = dict(base, choices=[{'index': 0, 'delta': delta, 'finish_reason': finish_reason}])
+        events.append(f"data: {json.dumps(chunk)}\n\n")
+
+    event({'role': 'assistant', 'content': None if message.get('tool_calls') else ''})
+    content = message.get('content') or ''
+    for i in range(0, len(content), chunk_chars):
+        event({'content': content[i:i + chunk_chars]})
+    for index, tool_call in enumerate(message.get('tool_calls') or []):
+        function = tool_call.get('function', {})
+        event({'tool_calls': [{
+            'index': index,
+            'id': tool_call.get('id', f'call_{index}'),
+            'type': 'function',
+            'function': {'name': function.get('name', ''), 'arguments': ''}
+        }]})
+        arguments = function.get('arguments', '')
+        for i in range(0, len(arguments), chunk_chars):
+            event({'tool_calls': [{'index': index, 'function': {'arguments': arguments[i:i + chunk_chars]}}]})
+    event({}, 'tool_calls' if message.get('tool_calls') else 'stop')
+    events.append("data: [DONE]\n\n")
+    return ''.join(events)
+
+
+def synthetic_completion(body: Dict) -> Dict:
+    """Build a minimal valid reply for requests with no matching recording."""
+    message: Dict = {'role': 'assistant', 'content': 'OK'}
+    tool_choice = body.get('tool_choice')
+    if body.get('tools'):
+        name = tool_choice['function']['name'] if isinstance(tool_choice, dict) else body['tools'][0]['function']['name']
+        message = {
+            'role': 'assistant',
+            'content': None,
+            'tool_calls': [{
+                'id': 'call_fake',
+                'type': 'function',
+                'function': {'name': name, 'arguments': json.dumps({'data': {}, 'missing_fields': []})}
+            }]
+        }
+    return {
+        'id': 'chatcmpl-fake',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'fake'),
+        'choices': [{'index': 0, 'message': message, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+    }
+
+
+class FakeOpenAIServer:
+    """Replays recorded chat completions with injected latency, errors and rate limits.
+
+    Requests are matched to recordings by request_key(). Unmatched requests
+    get a recorded reply of the same shape (tool call or plain text) in
+    rotation, or a synthetic reply if there is none.
+    """
+
+    def __init__(
+        self,
+        recordings_path: Optional[str] = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        seed: Optional[int] = None,
+        recordings: Optional[List[Dict]] = None
+    ):
+        """Initialize the server.
+
+        Args:
+            recordings_path: JSONL file written by RecordingTransport (synthetic replies only if None)
+            latency: Base delay in seconds before each reply
+            jitter: Extra random delay of up to this many seconds
+            error_rate: Share of requests answered with a 500 error
+            rate_limit_rate: Share of requests answered with a 429 and Retry-After
+            retry_after: Seconds advertised in the Retry-After headers of injected 429s
+            seed: Random seed, for reproducible runs
+            recordings: Recordings to serve in addition to those in recordings_path
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+        self._handlers: Set[asyncio.Task] = set()
+        self.port: Optional[int] = None
+        self.stats = {'requests': 0, 'replayed': 0, 'fallback': 0, 'synthetic': 0, 'errors': 0, 'rate_limited': 0}
+
+        self._by_key: Dict[str, Dict] = {}
+        by_shape: Dict[bool, List[Dict]] = {True: [], False: []}
+        loaded = load_recordings(recordings_path) if recordings_path else []
+        for recording in loaded + list(recordings or []):
+            if recording.get('status') != 200 or not recording.get('body'):
+                continue
+            if recording.get('key'):
+                self._by_key[recording['key']] = recording
+            by_shape[bool(recording.get('request', {}).get('tools'))].append(recording)
+        self._rotation: Dict[bool, Optional[Iterator[Dict]]] = {
+            shape: itertools.cycle(items) if items else None for shape, items in by_shape.items()
+        }
+        logger.info(f"Fake OpenAI server loaded {len(self._by_key)} recordings")
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to pass to AsyncOpenAI."""
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Start listening and return the bound port."""
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Fake OpenAI server listening on {host}:{self.port}")
+        return self.port
+
+    async def stop(self) -> None:
+        """Stop accepting connections and close the server."""
+        if self._server is not None:
+            self._server.close()
+            # Idle keep-alive connections would otherwise hold wait_closed() open
+            for writer in list(self._connections):
+                writer.close()
+            # Let the handlers see the closed connections and return before the loop goes away
+            if self._handlers:
+                await asyncio.wait(list(self._handlers), timeout=1.0)
+            await self._server.wait_closed()
+            self._server = None
+
+    def _find_reply(self, body: Dict) -> Tuple[str, str]:
+        """Return (content type, body) for a chat completion request."""
+        recording = self._by_key.get(request_key(body))
+        if recording is not None:
+            self.stats['replayed'] += 1
+        else:
+            rotation = self._rotation[bool(body.get('tools'))]
+            recording = next(rotation) if rotation else None
+            self.stats['fallback' if recording else 'synthetic'] += 1
+
+        if recording is None:
+            completion = synthetic_completion(body)
+        elif recording.get('content_type', '').startswith('text/event-stream'):
+            if body.get('stream'):
+                return 'text/event-stream', recording['body']
+            # A streamed recording answering a non-streamed request is served as a synthetic reply
+            completion = synthetic_completion(body)
+        else:
+            completion = json.loads(recording['body'])
+
+        if body.get('stream'):
+            return 'text/event-stream', completion_to_sse(completion)
+        return 'application/json', json.dumps(completion)
+
+    async def _respond(self, body: Dict) -> Tuple[int, Dict[str, str], str]:
+        """Decide the status, headers and body for one request, after the injected delay."""
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            self.stats['rate_limited'] += 1
+            headers = {
+                'content-type': 'application/json',
+                'retry-after': str(self.retry_after),
+                'retry-after-ms': str(int(self.retry_after * 1000))
+            }
+            error = {'error': {'message': 'Rate limit reached (injected)', 'type': 'requests', 'code': 'rate_limit_exceeded'}}
+            return 429, headers, json.dumps(error)
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.stats['errors'] += 1
+            error = {'error': {'message': 'Internal server error (injected)', 'type': 'server_error'}}
+            return 500, {'content-type': 'application/json'}, json.dumps(error)
+
+        content_type, reply = self._find_reply(body)
+        return 200, {'content-type': content_type}, reply
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one keep-alive connection."""
+        self._connections.add(writer)
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', '0'))
+                if length > MAX_BODY_BYTES:
+                    await self._write(writer, 400, {'content-type': 'application/json'}, '{"error": {"message": "Body too large"}}')
+                    break
+                raw_body = await reader.readexactly(length) if length else b''
+
+                self.stats['requests'] += 1
+                if method == 'POST' and path.split('?')[0].rstrip('/').endswith('/chat/completions'):
+                    try:
+                        body = json.loads(raw_body or b'{}')
+                    except json.JSONDecodeError:
+                        await self._write(writer, 400, {'content-type': 'application/json'}, '{"error": {"message": "Invalid JSON"}}')
+                        continue
+                    status, response_headers, reply = await self._respond(body)
+                else:
+                    status, response_headers, reply = 404, {'content-type': 'application/json'}, '{"error": {"message": "Not found"}}'
+                await self._write(writer, status, response_headers, reply)
+
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            self._handlers.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, status: int, headers: Dict[str, str], body: str) -> None:
+        """Write one HTTP response."""
+        payload = body.encode('utf-8')
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"content-length: {len(payload)}")
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+        await writer.drain()
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    """Run the server until interrupted."""
+    server = FakeOpenAIServer(
+        recordings_path=args.recordings,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    await server.start(args.host, args.port)
+    print(f"Serving fake OpenAI API at http://{args.host}:{server.port}/v1")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Replay recorded OpenAI chat completions locally")
+    parser.add_argument('--recordings', help="JSONL file written with OPENAI_RECORD_PATH")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.0, help="Base delay per reply in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random delay of up to this many seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Share of requests answered with a 429")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After seconds on injected 429s")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
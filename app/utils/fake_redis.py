@@ -0,0 +1,224 @@
+"""
+Local stand-in for a Redis server, covering the commands the session store uses.
+
+Run it with:
+    python -m app.utils.fake_redis --port 6379 --maxmemory 52428800
+
+and point the bot at it with SESSION_BACKEND=redis and SESSION_REDIS_URL=redis://127.0.0.1:6379/0.
+Keys expire like in Redis, and with a memory limit the least recently used
+keys are evicted first (as with maxmemory-policy allkeys-lru).
+"""
+
+import time
+import asyncio
+import logging
+import argparse
+from collections import OrderedDict
+from typing import Any, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _encode_reply(value: Any) -> bytes:
+    """Encode a reply in RESP2."""
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, Exception):
+        return f"-ERR {value}\r\n".encode('utf-8')
+    if isinstance(value, bool) or isinstance(value, int):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode('utf-8')
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode_reply(item) for item in value)
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class FakeRedisServer:
+    """Serves GET, SET, GETEX, DEL, EXISTS, PEXPIRE, PTTL, DBSIZE, FLUSHDB, PING, SELECT and AUTH."""
+
+    def __init__(self, maxmemory: int = 0):
+        """Initialize the server.
+
+        Args:
+            maxmemory: Bytes of keys and values kept before the least recently used keys are evicted (0 for no limit)
+        """
+        self.maxmemory = maxmemory
+        self.used_memory = 0
+        self.evicted = 0
+        self._data: "OrderedDict[bytes, Tuple[bytes, Optional[float]]]" = OrderedDict()  # key -> (value, expiry)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+        self._handlers: Set[asyncio.Task] = set()
+        self.port: Optional[int] = None
+
+    @property
+    def url(self) -> str:
+        """URL to pass to the session store."""
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Start listening and return the bound port."""
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Fake Redis server listening on {host}:{self.port}")
+        return self.port
+
+    async def stop(self) -> None:
+        """Stop accepting connections and close the open ones."""
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._connections):
+                writer.close()
+            if self._handlers:
+                await asyncio.wait(list(self._handlers), timeout=1.0)
+            await self._server.wait_closed()
+            self._server = None
+
+    def _lookup(self, key: bytes) -> Optional[bytes]:
+        """Return a live value, dropping it if it has expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expiry = entry
+        if expiry is not None and expiry <= time.monotonic():
+            self._delete(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def _delete(self, key: bytes) -> bool:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return False
+        self.used_memory -= len(key) + len(entry[0])
+        return True
+
+    def _store(self, key: bytes, value: bytes, expiry: Optional[float]) -> None:
+        self._delete(key)
+        self._data[key] = (value, expiry)
+        self.used_memory += len(key) + len(value)
+        while self.maxmemory and self.used_memory > self.maxmemory and len(self._data) > 1:
+            self._delete(next(iter(self._data)))
+            self.evicted += 1
+
+    @staticmethod
+    def _expiry(options: List[bytes]) -> Optional[float]:
+        """Parse EX/PX options into an absolute deadline."""
+        for index in range(0, len(options) - 1):
+            option = options[index].upper()
+            if option == b"EX":
+                return time.monotonic() + float(options[index + 1])
+            if option == b"PX":
+                return time.monotonic() + float(options[index + 1]) / 1000
+        return None
+
+    def execute(self, command: List[bytes]) -> Any:
+        """Run one command and return its reply value."""
+        name, args = command[0].upper(), command[1:]
+        if name == b"PING":
+            return "PONG"
+        if name in (b"SELECT", b"AUTH"):
+            return "OK"
+        if name == b"GET":
+            return self._lookup(args[0])
+        if name == b"SET":
+            self._store(args[0], args[1], self._expiry(args[2:]))
+            return "OK"
+        if name == b"GETEX":
+            value = self._lookup(args[0])
+            expiry = self._expiry(args[1:])
+            if value is not None and expiry is not None:
+                self._data[args[0]] = (value, expiry)
+            return value
+        if name == b"DEL":
+            return sum(self._delete(key) for key in args)
+        if name == b"EXISTS":
+            return sum(self._lookup(key) is not None for key in args)
+        if name == b"PEXPIRE":
+            value = self._lookup(args[0])
+            if value is None:
+                return 0
+            self._data[args[0]] = (value, time.monotonic() + float(args[1]) / 1000)
+            return 1
+        if name == b"PTTL":
+            if self._lookup(args[0]) is None:
+                return -2
+            expiry = self._data[args[0]][1]
+            return -1 if expiry is None else int((expiry - time.monotonic()) * 1000)
+        if name == b"DBSIZE":
+            return len(self._data)
+        if name == b"FLUSHDB":
+            self._data.clear()
+            self.used_memory = 0
+            return "OK"
+        return ValueError(f"unknown command '{command[0].decode('utf-8', 'replace')}'")
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve commands on one connection until it closes."""
+        self._connections.add(writer)
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    break
+                try:
+                    reply = self.execute(command)
+                except (IndexError, ValueError) as e:
+                    reply = ValueError(f"wrong arguments: {e}")
+                writer.write(_encode_reply(reply))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            self._handlers.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        """Read one command sent as a RESP array, or None at end of stream."""
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command, as typed into telnet
+            return line.split() or [b"PING"]
+        args = []
+        for _ in range(int(line[1:-2])):
+            header = await reader.readline()
+            length = int(header[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    """Run the server until interrupted."""
+    server = FakeRedisServer(maxmemory=args.maxmemory)
+    await server.start(args.host, args.port)
+    print(f"Serving fake Redis at {server.url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for Redis")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    parser.add_argument('--maxmemory', type=int, default=0, help="Bytes kept before LRU eviction, 0 for no limit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,98 +1,260 @@
 """
 Utility for managing temporary file cleanup after a specified duration.
+
+The bot sends quotations from memory, so it no longer schedules files of
+its own; at startup it only sweeps TEMP_PATH for stale files it wrote in
+the past (see restore). schedule_file_cleanup remains for callers that
+write documents to disk, such as PDFGenerator.generate_pdf.
 """
 
 import os
+import json
+import heapq
 import logging
 import asyncio
 import time
-from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from app.config import Config
+from app.utils.artifacts import STAGING_PREFIX, STAGING_SUFFIX, is_artifact_name, write_artifact
 
 logger = logging.getLogger(__name__)
 
 class FileCleanupManager:
-    """Manages the cleanup of temporary files after a specified time period."""
-    
-    def __init__(self, cleanup_time_seconds: int = 600):  # Default: 10 minutes
+    """Deletes temporary files when they expire, using a single timer over a min-heap of deadlines."""
+
+    # Rewrite the journal once it holds this many more lines than there are pending files
+    JOURNAL_COMPACT_THRESHOLD = 1000
+
+    def __init__(self, cleanup_time_seconds: int = 600, journal_path: Optional[str] = None):  # Default: 10 minutes
         """Initialize the cleanup manager.
-        
+
         Args:
-            cleanup_time_seconds: Time in seconds after which files will be deleted
+            cleanup_time_seconds: Default time in seconds after which files will be deleted
+            journal_path: Append-only journal of pending deletions that survives restarts (disabled if None)
         """
         self.cleanup_time_seconds = cleanup_time_seconds
-        self.files_to_cleanup: Dict[str, float] = {}  # filepath -> timestamp
+        self.journal_path = journal_path
+        self._journal = None
+        self._journal_lines = 0
+        self.files_to_cleanup: Dict[str, float] = {}  # filepath -> expiry time
+        self._heap: List[Tuple[float, str]] = []  # (expiry time, filepath), may hold stale entries
+        self._wakeup: Optional[asyncio.Event] = None
         self.cleanup_task: Optional[asyncio.Task] = None
         self.running = False
         logger.info(f"FileCleanupManager initialized with {cleanup_time_seconds} seconds cleanup time")
-    
-    def add_file(self, filepath: str) -> None:
-        """Add a file to be cleaned up later.
-        
+
+    def add_file(self, filepath: str, cleanup_time_seconds: Optional[int] = None) -> None:
+        """Add a file to be cleaned up later. Re-adding a file replaces its deadline.
+
         Args:
             filepath: Path to the file that needs cleanup
+            cleanup_time_seconds: TTL for this file (uses the manager default if None)
         """
         if not os.path.exists(filepath):
             logger.warning(f"Cannot schedule cleanup for non-existent file: {filepath}")
             return
-            
-        self.files_to_cleanup[filepath] = time.time()
-        logger.info(f"Scheduled cleanup for file: {filepath} in {self.cleanup_time_seconds} seconds")
-        
+
+        ttl = self.cleanup_time_seconds if cleanup_time_seconds is None else cleanup_time_seconds
+        expiry = time.time() + ttl
+        self._track(filepath, expiry)
+        logger.info(f"Scheduled cleanup for file: {filepath} in {ttl} seconds")
+
+        # Wake the timer if this file is now the earliest deadline
+        if self._heap[0][1] == filepath and self._wakeup is not None:
+            self._wakeup.set()
+
         # Ensure the cleanup task is running
         if not self.running:
             self.start_cleanup_task()
-    
+
+    def remove_file(self, filepath: str) -> None:
+        """Stop tracking a file without deleting it.
+
+        Args:
+            filepath: Path previously passed to add_file
+        """
+        # The heap entry is dropped lazily when it reaches the top
+        if self.files_to_cleanup.pop(filepath, None) is not None:
+            self._write_journal({'op': 'done', 'path': filepath})
+
+    def _track(self, filepath: str, expiry: float, journal: bool = True) -> None:
+        """Record a deadline in memory and, optionally, in the journal."""
+        self.files_to_cleanup[filepath] = expiry
+        heapq.heappush(self._heap, (expiry, filepath))
+        if journal:
+            self._write_journal({'op': 'add', 'path': filepath, 'expiry': expiry})
+
+    def _write_journal(self, entry: Dict) -> None:
+        """Append an entry to the journal, compacting it when it has grown too long."""
+        if not self.journal_path:
+            return
+        try:
+            if self._journal is None:
+                os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+                self._journal = open(self.journal_path, 'a', encoding='utf-8')
+            self._journal.write(json.dumps(entry) + '\n')
+            self._journal.flush()
+            self._journal_lines += 1
+
+            if self._journal_lines > self.JOURNAL_COMPACT_THRESHOLD + len(self.files_to_cleanup):
+                self._compact_journal()
+        except OSError as e:
+            logger.error(f"Could not write cleanup journal {self.journal_path}: {str(e)}")
+
+    def _compact_journal(self) -> None:
+        """Rewrite the journal so it only contains the files that are still pending."""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+        lines = [
+            json.dumps({'op': 'add', 'path': filepath, 'expiry': expiry}) + '\n'
+            for filepath, expiry in self.files_to_cleanup.items()
+        ]
+        directory, filename = os.path.split(self.journal_path)
+        write_artifact(directory or '.', filename, ''.join(lines).encode('utf-8'))
+        self._journal_lines = len(lines)
+
+    def _read_journal(self) -> Dict[str, float]:
+        """Replay the journal and return the deletions that were still pending."""
+        pending: Dict[str, float] = {}
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-write
+                        continue
+                    if entry.get('op') == 'add':
+                        pending[entry['path']] = entry['expiry']
+                    elif entry.get('op') == 'done':
+                        pending.pop(entry['path'], None)
+        except FileNotFoundError:
+            pass
+        return pending
+
+    def restore(self, temp_dir: Optional[str] = None) -> None:
+        """Reload pending deletions after a restart and sweep orphaned files.
+
+        Replays the journal, then scans temp_dir once: files the journal doesn't
+        know about are deleted if they are older than the default TTL (or are
+        leftover staging files) and scheduled for their remaining time otherwise.
+        Only files named by store_artifact or write_artifact are touched, so
+        anything else kept in temp_dir survives a restart.
+
+        Args:
+            temp_dir: Directory holding temporary files to sweep (skipped if None)
+        """
+        now = time.time()
+        restored = 0
+        if self.journal_path:
+            for filepath, expiry in self._read_journal().items():
+                if os.path.exists(filepath):
+                    self._track(filepath, expiry, journal=False)
+                    restored += 1
+
+        swept = adopted = 0
+        if temp_dir and os.path.isdir(temp_dir):
+            journal_file = os.path.abspath(self.journal_path) if self.journal_path else None
+            tracked = {os.path.abspath(path) for path in self.files_to_cleanup}
+            with os.scandir(temp_dir) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    full_path = os.path.abspath(entry.path)
+                    if full_path == journal_file or full_path in tracked or not is_artifact_name(entry.name):
+                        continue
+
+                    is_staging = entry.name.startswith(STAGING_PREFIX) and entry.name.endswith(STAGING_SUFFIX)
+                    expiry = entry.stat(follow_symlinks=False).st_mtime + self.cleanup_time_seconds
+                    if is_staging or expiry <= now:
+                        self._delete_file(entry.path)
+                        swept += 1
+                    else:
+                        self._track(entry.path, expiry, journal=False)
+                        adopted += 1
+
+        if self.journal_path:
+            try:
+                self._compact_journal()
+            except OSError as e:
+                logger.error(f"Could not compact cleanup journal {self.journal_path}: {str(e)}")
+
+        logger.info(f"Restored {restored} pending cleanups, adopted {adopted} and removed {swept} orphaned files")
+        if self.files_to_cleanup:
+            self.start_cleanup_task()
+
     def start_cleanup_task(self) -> None:
         """Start the background task for file cleanup."""
         if self.cleanup_task is None or self.cleanup_task.done():
             self.running = True
+            self._wakeup = asyncio.Event()
             self.cleanup_task = asyncio.create_task(self._cleanup_loop())
             logger.info("Started file cleanup background task")
-    
+
     def stop_cleanup_task(self) -> None:
         """Stop the cleanup task."""
         if self.cleanup_task and not self.cleanup_task.done():
             self.running = False
             self.cleanup_task.cancel()
             logger.info("Stopped file cleanup background task")
-    
+
+    def _pop_expired(self, now: float) -> List[str]:
+        """Remove and return every tracked file whose deadline has passed."""
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            expiry, filepath = heapq.heappop(self._heap)
+            # Skip entries that were removed or rescheduled since they were pushed
+            if self.files_to_cleanup.get(filepath) != expiry:
+                continue
+            del self.files_to_cleanup[filepath]
+            expired.append(filepath)
+        return expired
+
+    def _next_deadline(self) -> Optional[float]:
+        """Return the earliest live deadline, discarding stale heap entries."""
+        while self._heap:
+            expiry, filepath = self._heap[0]
+            if self.files_to_cleanup.get(filepath) == expiry:
+                return expiry
+            heapq.heappop(self._heap)
+        return None
+
+    def _delete_file(self, filepath: str) -> None:
+        """Delete an expired file."""
+        self._write_journal({'op': 'done', 'path': filepath})
+        try:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+                logger.info(f"Cleaned up temporary file: {filepath}")
+            else:
+                logger.warning(f"File already gone during cleanup: {filepath}")
+        except Exception as e:
+            logger.error(f"Error cleaning up file {filepath}: {str(e)}")
+
     async def _cleanup_loop(self) -> None:
-        """Background loop that checks for and removes expired files."""
+        """Background loop that sleeps until the next deadline and removes expired files."""
         try:
             while self.running:
-                current_time = time.time()
-                files_to_remove = []
-                
-                # Identify files that need to be cleaned up
-                for filepath, timestamp in self.files_to_cleanup.items():
-                    if current_time - timestamp >= self.cleanup_time_seconds:
-                        files_to_remove.append(filepath)
-                
-                # Remove the expired files
-                for filepath in files_to_remove:
-                    try:
-                        # Remove from tracking dict
-                        self.files_to_cleanup.pop(filepath, None)
-                        
-                        # Delete the file if it exists
-                        if os.path.exists(filepath):
-                            os.remove(filepath)
-                            logger.info(f"Cleaned up temporary file: {filepath}")
-                        else:
-                            logger.warning(f"File already gone during cleanup: {filepath}")
-                    except Exception as e:
-                        logger.error(f"Error cleaning up file {filepath}: {str(e)}")
-                
+                for filepath in self._pop_expired(time.time()):
+                    self._delete_file(filepath)
+
+                next_deadline = self._next_deadline()
+
                 # If no more files to clean up, stop the task
-                if not self.files_to_cleanup:
+                if next_deadline is None:
                     logger.info("No more files to clean up, stopping cleanup task")
                     self.running = False
                     break
-                
-                # Sleep for a while before checking again (every 30 seconds)
-                await asyncio.sleep(30)
-                
+
+                # Sleep exactly until the next deadline, or until an earlier one is added
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(next_deadline - time.time(), 0))
+                except asyncio.TimeoutError:
+                    pass
+
         except asyncio.CancelledError:
             logger.info("File cleanup task was cancelled")
         except Exception as e:
@@ -100,19 +262,13 @@ class FileCleanupManager:
             self.running = False
 
 # Create a singleton instance for use throughout the application
-cleanup_manager = FileCleanupManager()
+cleanup_manager = FileCleanupManager(journal_path=Config.CLEANUP_JOURNAL_PATH or None)
 
 def schedule_file_cleanup(filepath: str, cleanup_time_seconds: Optional[int] = None) -> None:
     """Schedule a file for cleanup after the specified time.
-    
+
     Args:
         filepath: Path to the file to clean up
         cleanup_time_seconds: Custom cleanup time in seconds (uses default if None)
     """
-    # If a custom time is specified, create a new manager instance
-    if cleanup_time_seconds is not None and cleanup_time_seconds != cleanup_manager.cleanup_time_seconds:
-        temp_manager = FileCleanupManager(cleanup_time_seconds)
-        temp_manager.add_file(filepath)
-        temp_manager.start_cleanup_task()
-    else:
-        cleanup_manager.add_file(filepath) 
\ No newline at end of file
+    cleanup_manager.add_file(filepath, cleanup_time_seconds)
@@ -2,104 +2,411 @@
 GPT-powered quotation data extraction and validation.
 """
 
+import re
 import json
+import time
 import logging
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from openai import AsyncOpenAI  # Use AsyncOpenAI instead of OpenAI
 from app.config import Config
 from app.utils.models import QuotationItem
+from app.utils.extraction_schema import (
+    EXTRACTION_FIELDS, EXTRACTION_TOOL_NAME, NON_NUMERIC, extraction_tool, parse_extraction
+)
+from app.utils.pre_extractor import REQUIRED_FIELDS, pre_extract
+from app.utils.response_cache import ResponseCache
+from app.utils.rate_limiter import openai_limiter
+from app.utils.model_router import model_router
+from app.utils.openai_replay import recording_http_client
+from app.utils.template_renderer import summary_renderer
 
 logger = logging.getLogger(__name__)
 
+# Rough prompt size estimate used for the token budget (about 4 characters per token)
+CHARS_PER_TOKEN = 4
+
+QueueCallback = Optional[Callable[[int], Awaitable[Any]]]
+ProgressCallback = Optional[Callable[[List[str]], None]]
+
+# A field key in partially streamed tool arguments, e.g. '"customer_email":'
+_STREAMED_FIELD = re.compile(r'"(' + '|'.join(EXTRACTION_FIELDS) + r')"\s*:')
+
+def _to_number(value: Any, default: float = 0.0) -> float:
+    """Best-effort conversion of a possibly formatted value (e.g. "RM 1,000") to a float."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        numeric_part = NON_NUMERIC.sub('', value)
+        try:
+            return float(numeric_part) if numeric_part else default
+        except ValueError:
+            return default
+    return default
+
+def merge_quotation_patch(current: Dict, patch: Dict, items_mode: str = "add") -> Dict:
+    """Apply a delta extraction to the stored quotation data and return the merged copy.
+    
+    Args:
+        current: Data gathered in earlier turns (not modified)
+        patch: Fields the new message added or changed; empty values are ignored
+        items_mode: "add" appends new items and updates items with the same name,
+            "replace" swaps the whole item list
+    """
+    merged = dict(current)
+    for key, value in patch.items():
+        if key == "items" or value is None or value == "":
+            continue
+        merged[key] = value
+    
+    new_items = patch.get("items") or []
+    if items_mode == "replace" and new_items:
+        merged["items"] = [dict(item) for item in new_items]
+    elif new_items:
+        items = [dict(item) for item in current.get("items") or []]
+        positions = {str(item.get("name", "")).strip().lower(): i for i, item in enumerate(items)}
+        for item in new_items:
+            name = str(item.get("name", "")).strip().lower()
+            if name and name in positions:
+                items[positions[name]].update({k: v for k, v in item.items() if k != "name" and v is not None})
+            else:
+                positions[name] = len(items)
+                items.append(dict(item))
+        merged["items"] = items
+    return merged
+
+def render_local_summary(data: Dict) -> str:
+    """Build the quotation summary locally from the extracted data, without calling the API."""
+    items = []
+    for i, item in enumerate(data.get("items") or []):
+        quantity = _to_number(item.get("quantity"), 1.0)
+        unit_price = _to_number(item.get("unit_price"))
+        items.append({
+            "name": item.get("name") or f"Item {i+1}",
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "total": round(quantity * unit_price, 2)
+        })
+    
+    subtotal = round(sum(item["total"] for item in items), 2)
+    return summary_renderer.render(
+        data=data,
+        items=items,
+        subtotal=subtotal,
+        discount=_to_number(data.get("discount"))
+    ).strip()
+
 class GPTQuotationParser:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=Config.OPENAI_API_KEY)
-        self.model = "gpt-3.5-turbo"  # Using a more widely available model
+        # Retries are handled by the shared limiter so they respect Retry-After and the token budget
+        self.client = AsyncOpenAI(
+            api_key=Config.OPENAI_API_KEY,
+            base_url=Config.OPENAI_BASE_URL or None,
+            max_retries=0,
+            http_client=recording_http_client(Config.OPENAI_RECORD_PATH) if Config.OPENAI_RECORD_PATH else None
+        )
+        self.limiter = openai_limiter
+        self.router = model_router
+        self.model = self.router.cheap_model  # Default model, also used for summaries and cache keys
+        self.cache = ResponseCache(
+            max_entries=Config.OPENAI_CACHE_SIZE,
+            ttl_seconds=Config.OPENAI_CACHE_TTL,
+            disk_path=Config.OPENAI_CACHE_PATH or None
+        )
+        
+    async def _create_completion(
+        self,
+        messages: List[Dict],
+        max_output_tokens: int,
+        on_queued: QueueCallback = None,
+        model: Optional[str] = None,
+        **kwargs
+    ):
+        """Call the chat completions API through the shared rate limiter."""
+        model = model or self.model
+        estimated_tokens = sum(len(m["content"]) for m in messages) // CHARS_PER_TOKEN + max_output_tokens
+        
+        async def call():
+            started = time.monotonic()
+            response = await self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+            usage = getattr(response, "usage", None)
+            self.router.record_call(model, time.monotonic() - started, getattr(usage, "total_tokens", None) or estimated_tokens)
+            return response
+        
+        return await self.limiter.run(call, estimated_tokens=estimated_tokens, on_queued=on_queued)
+
+    async def _stream_tool_arguments(
+        self,
+        messages: List[Dict],
+        max_output_tokens: int,
+        on_queued: QueueCallback,
+        on_progress: Callable[[List[str]], None],
+        model: Optional[str] = None,
+        **kwargs
+    ) -> Optional[str]:
+        """Stream a tool call and report fields as their keys appear in the partial arguments."""
+        model = model or self.model
+        prompt_tokens = sum(len(m["content"]) for m in messages) // CHARS_PER_TOKEN
+        
+        async def call() -> Optional[str]:
+            started = time.monotonic()
+            stream = await self.client.chat.completions.create(
+                model=model, messages=messages, stream=True, **kwargs
+            )
+            arguments = ""
+            scanned = 0
+            found: List[str] = []
+            got_tool_call = False
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                for tool_call in chunk.choices[0].delta.tool_calls or []:
+                    got_tool_call = True
+                    if tool_call.function and tool_call.function.arguments:
+                        arguments += tool_call.function.arguments
+                
+                # Only rescan the tail, with some overlap for keys split across chunks
+                new_fields = [
+                    match.group(1) for match in _STREAMED_FIELD.finditer(arguments, max(scanned - 32, 0))
+                    if match.group(1) not in found
+                ]
+                scanned = len(arguments)
+                if new_fields:
+                    found.extend(dict.fromkeys(new_fields))
+                    on_progress(list(found))
+            # Streamed replies carry no usage, so estimate it from the text
+            self.router.record_call(model, time.monotonic() - started, prompt_tokens + len(arguments) // CHARS_PER_TOKEN)
+            return arguments if got_tool_call else None
         
-    async def extract_quotation_data(self, text: str) -> Tuple[Dict, List[str]]:
+        return await self.limiter.run(call, estimated_tokens=prompt_tokens + max_output_tokens, on_queued=on_queued)
+
+    async def _call_extraction_tool(
+        self,
+        system: str,
+        prompt: str,
+        fields: List[str],
+        max_output_tokens: int,
+        on_queued: QueueCallback = None,
+        items_mode: bool = False,
+        on_progress: ProgressCallback = None,
+        model: Optional[str] = None
+    ) -> Tuple[Dict, List[str], Optional[str]]:
+        """Ask the model to fill in the extraction tool and validate its arguments.
+        With on_progress the reply is streamed and the callback gets the fields found so far.
+        Raises ValueError if the reply has no usable tool call."""
+        tool = extraction_tool(fields, items_mode=items_mode)
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ]
+        request = dict(
+            max_output_tokens=max_output_tokens + len(json.dumps(tool)) // CHARS_PER_TOKEN,
+            on_queued=on_queued,
+            model=model,
+            temperature=0.1,  # Low temperature for consistent output
+            tools=[tool],
+            tool_choice={"type": "function", "function": {"name": EXTRACTION_TOOL_NAME}}
+        )
+        
+        if on_progress is not None:
+            arguments = await self._stream_tool_arguments(messages, on_progress=on_progress, **request)
+        else:
+            response = await self._create_completion(messages, **request)
+            tool_calls = response.choices[0].message.tool_calls
+            arguments = tool_calls[0].function.arguments if tool_calls else None
+        
+        if arguments is None:
+            raise ValueError("Model did not call the extraction tool")
+        logger.info(f"GPT response: {arguments}")
+        return parse_extraction(arguments)
+
+    async def extract_quotation_data(
+        self,
+        text: str,
+        on_queued: QueueCallback = None,
+        on_progress: ProgressCallback = None
+    ) -> Tuple[Dict, List[str]]:
         """
         Extract structured quotation data from freeform text.
         Returns a tuple of (extracted_data, missing_fields).
+        If the call has to wait for the rate limiter, on_queued is called with the queue position.
+        If on_progress is given, the reply is streamed and it is called with the fields found so far.
         """
-        prompt = f"""Extract quotation data from the following text. 
-        If the text has both "Previous information" and "Additional information" sections, merge them intelligently.
+        cache_key = self.cache.make_key(self.model, "extract", text)
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Using cached extraction result")
+            return cached[0], cached[1]
         
-        Return a JSON object with these fields:
-        - customer_name: Customer's full name
-        - customer_company: Company name
-        - customer_address: Full address
-        - customer_phone: Phone number
-        - customer_email: Email address
-        - items: List of items, each with name, quantity, and unit_price
-        - terms: Payment terms and conditions
-        - discount: Discount percentage (if any)
-        - issued_by: Name of person issuing the quote
-
-        If a field value is "No" or "None" or similar negative, convert it to empty string or appropriate null value.
-        For missing/unclear fields, use null or empty values.
+        local_data: Dict = {}
+        guesses: Dict = {}
+        fields = list(EXTRACTION_FIELDS)
+        required = REQUIRED_FIELDS
+        if Config.PRE_EXTRACT:
+            local = pre_extract(text)
+            if not local.guessed_fields and (local.complete or not local.unresolved_text):
+                # Nothing left for the model to read or re-check
+                logger.info(f"Extracted locally, skipping GPT (missing: {local.missing_fields})")
+                await self.cache.set(cache_key, [local.data, local.missing_fields])
+                return local.data, local.missing_fields
+            
+            # Ask the model only about the lines and fields the exact patterns did not settle.
+            # Heuristic guesses are re-checked by the model and only used if it finds nothing.
+            local_data = {field: value for field, value in local.data.items() if field not in local.guessed_fields}
+            guesses = {field: local.data[field] for field in local.guessed_fields}
+            fields = [field for field in EXTRACTION_FIELDS if field not in local_data]
+            required = [field for field in REQUIRED_FIELDS if field not in local_data]
+            text = local.unresolved_text
+            logger.info(f"Pre-extracted {len(local_data)} fields locally, asking GPT for: {', '.join(fields)}")
+        
+        prompt = f"""Extract quotation data from the following text and record it with the {EXTRACTION_TOOL_NAME} tool.
+        If the text has both "Previous information" and "Additional information" sections, merge them intelligently.
+        If a field value is "No" or "None" or similar negative, leave it out.
 
         Text to analyze:
         {text}
 
-        If any required field is missing or unclear, include it in the missing_fields list.
-        Required fields are: customer_name, customer_company, customer_address, customer_phone, customer_email, items, terms
-
-        Format the response as:
-        {{
-            "data": {{...}},
-            "missing_fields": ["field1", "field2", ...]
-        }}
+        If any required field is missing or unclear, include it in missing_fields.
+        Required fields are: {', '.join(required) or 'none'}
         """
         
-        try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a quotation data extraction assistant. Extract structured data from freeform text. Be thorough and look for all required information, even if it's in different sections or formats."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,  # Low temperature for consistent output
-                response_format={"type": "json_object"}
-            )
-            
-            # Parse the JSON string into a Python dictionary
-            content = response.choices[0].message.content
-            logger.info(f"GPT response: {content}")
-            
-            result = json.loads(content)
-            
-            # Process the data to handle common issues
-            data = result.get("data", {})
-            
-            # Handle "no discount" or "none" values consistently
-            if "discount" in data:
-                if isinstance(data["discount"], str) and data["discount"].lower() in ["no", "none", "no discount", "0", "not provided"]:
-                    data["discount"] = 0
-            
-            # Handle "no notes" or "none" values consistently  
-            if "notes" in data:
-                if isinstance(data["notes"], str) and data["notes"].lower() in ["no", "none", "no notes", "not provided"]:
-                    data["notes"] = ""
+        system = "You are a quotation data extraction assistant. Extract structured data from freeform text. Be thorough and look for all required information, even if it's in different sections or formats."
+        best: Optional[Tuple[Dict, List[str]]] = None
+        best_model = None
+        error: Optional[Exception] = None
+        for model in self.router.models_for(text):
+            try:
+                data, missing_fields, _ = await self._call_extraction_tool(
+                    system,
+                    prompt,
+                    fields,
+                    max_output_tokens=500,
+                    on_queued=on_queued,
+                    on_progress=on_progress,
+                    model=model
+                )
+            except Exception as e:
+                logger.error(f"Error in GPT extraction with {model}: {e}")
+                self.router.record_outcome(model, False)
+                error = e
+                continue
             
-            # Make sure items is always a list
-            if "items" in data and not isinstance(data["items"], list):
-                data["items"] = []
+            # Locally extracted values came from exact patterns, so they take precedence
+            data.update(local_data)
+            for field, value in guesses.items():
+                if not data.get(field):
+                    data[field] = value
             
             # Make sure missing_fields doesn't include fields that have valid data
-            missing_fields = result.get("missing_fields", [])
             cleaned_missing_fields = []
             for field in missing_fields:
                 if field not in data or not data[field]:
                     cleaned_missing_fields.append(field)
-                    
-            return data, cleaned_missing_fields
+            if Config.PRE_EXTRACT:
+                # The model only saw part of the text, so recheck the full required list
+                cleaned_missing_fields += [
+                    field for field in REQUIRED_FIELDS
+                    if not data.get(field) and field not in cleaned_missing_fields
+                ]
             
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {e}, Content: {content if 'content' in locals() else 'No content'}")
-            return {}, ["Error: Invalid JSON response"]
-        except Exception as e:
-            logger.error(f"Error in GPT extraction: {e}")
+            if best is not None:
+                # A fallback run: the first model failed only if this one found more
+                improved = len(cleaned_missing_fields) < len(best[1])
+                self.router.record_outcome(best_model, not improved)
+                if not improved:
+                    self.router.record_outcome(model, True)
+                    break
+            best, best_model = (data, cleaned_missing_fields), model
+            if not cleaned_missing_fields or self.router.fallback(model) is None:
+                self.router.record_outcome(model, True)
+                break
+            logger.info(f"{model} left {cleaned_missing_fields} missing, retrying with {self.router.fallback(model)}")
+        
+        if best is None:
+            if isinstance(error, ValueError):
+                return {}, ["Error: Invalid JSON response"]
             return {}, ["Error processing text"]
+        
+        await self.cache.set(cache_key, [best[0], best[1]])
+        return best
+
+    async def extract_quotation_delta(
+        self,
+        text: str,
+        current_data: Dict,
+        on_queued: QueueCallback = None,
+        on_progress: ProgressCallback = None
+    ) -> Tuple[Dict, List[str]]:
+        """
+        Extract only what a follow-up message adds or changes and merge it into current_data.
+        The prompt holds the new message and a compact list of the missing fields instead of
+        the whole conversation, so its size does not grow with each clarification round.
+        Returns a tuple of (merged_data, missing_fields); current_data is not modified.
+        Raises the model call's error if the message could not be extracted.
+        """
+        missing = [field for field in REQUIRED_FIELDS if not current_data.get(field)]
+        item_names = [str(item.get("name", "")) for item in current_data.get("items") or []]
+        
+        patch: Dict = {}
+        items_mode = "add"
+        if Config.PRE_EXTRACT:
+            local = pre_extract(text)
+            patch = {field: value for field, value in local.data.items() if field not in local.guessed_fields}
+            if not local.unresolved_text:
+                logger.info(f"Delta extracted locally, skipping GPT: {list(patch)}")
+                merged = merge_quotation_patch(current_data, patch)
+                return merged, [field for field in REQUIRED_FIELDS if not merged.get(field)]
+            text = local.unresolved_text
+        
+        cache_key = self.cache.make_key(
+            self.model, "delta", json.dumps([text, missing, item_names], ensure_ascii=False)
+        )
+        result = await self.cache.get(cache_key)
+        if result is None:
+            model = self.router.choose(text)
+            prompt = f"""A user is adding details to a quotation. Record only what the new message below provides or changes.
+        
+        Fields still missing: {", ".join(missing) or "none"}
+        Existing items: {", ".join(item_names) or "none"}
+
+        New message:
+        {text}
+
+        Set items_mode to "replace" only if the message gives a complete new item list; otherwise the items are
+        added, and an item with the same name as an existing one updates it.
+        """
+            try:
+                data, _, mode = await self._call_extraction_tool(
+                    "You are a quotation data extraction assistant. Return only the fields present in the message.",
+                    prompt,
+                    list(EXTRACTION_FIELDS),
+                    max_output_tokens=300,
+                    on_queued=on_queued,
+                    items_mode=True,
+                    on_progress=on_progress,
+                    model=model
+                )
+                self.router.record_outcome(model, True)
+                result = {"data": data, "items_mode": mode}
+                await self.cache.set(cache_key, result)
+            except Exception as e:
+                # Re-raised so the handler tells the user, rather than re-asking as if nothing was sent
+                logger.error(f"Error in GPT delta extraction: {e}")
+                self.router.record_outcome(model, False)
+                raise
+        else:
+            logger.info("Using cached delta extraction result")
+        
+        gpt_patch = result.get("data") or {}
+        if result.get("items_mode") == "replace":
+            items_mode = "replace"
+        # Exact local matches win over the model; item lines are split between the two, so keep both
+        gpt_items = gpt_patch.get("items") or []
+        gpt_patch.update(patch)
+        if gpt_items and patch.get("items"):
+            gpt_patch["items"] = patch["items"] + gpt_items
+        
+        merged = merge_quotation_patch(current_data, gpt_patch, items_mode)
+        return merged, [field for field in REQUIRED_FIELDS if not merged.get(field)]
 
     async def validate_quotation_data(self, data: Dict) -> List[str]:
         """
@@ -137,8 +444,7 @@ class GPTQuotationParser:
                         modified_data["discount"] = 0
                     else:
                         # Try to extract numeric value, removing currency symbols and %
-                        import re
-                        numeric_part = re.sub(r'[^0-9.]', '', discount_str)
+                        numeric_part = NON_NUMERIC.sub('', discount_str)
                         if numeric_part:
                             modified_data["discount"] = float(numeric_part)
                         else:
@@ -171,8 +477,7 @@ class GPTQuotationParser:
                 try:
                     if isinstance(item.get("quantity"), str):
                         qty_str = item["quantity"].strip()
-                        import re
-                        numeric_part = re.sub(r'[^0-9.]', '', qty_str)
+                        numeric_part = NON_NUMERIC.sub('', qty_str)
                         if numeric_part:
                             normalized_item["quantity"] = float(numeric_part)
                         else:
@@ -190,8 +495,7 @@ class GPTQuotationParser:
                     if isinstance(item.get("unit_price"), str):
                         price_str = item["unit_price"].strip()
                         # Remove currency symbols and other non-numeric characters
-                        import re
-                        numeric_part = re.sub(r'[^0-9.]', '', price_str)
+                        numeric_part = NON_NUMERIC.sub('', price_str)
                         if numeric_part:
                             normalized_item["unit_price"] = float(numeric_part)
                         else:
@@ -216,10 +520,20 @@ class GPTQuotationParser:
         
         return issues
 
-    async def generate_summary(self, data: Dict) -> str:
+    async def generate_summary(self, data: Dict, on_queued: QueueCallback = None) -> str:
         """
-        Generate a natural language summary of the quotation data.
+        Generate a summary of the quotation data.
+        Uses the local template unless SUMMARY_MODE is "llm".
         """
+        if Config.SUMMARY_MODE != "llm":
+            return render_local_summary(data)
+        
+        cache_key = self.cache.make_key(self.model, "summary", json.dumps(data, sort_keys=True, default=str))
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Using cached summary")
+            return cached
+        
         prompt = f"""Generate a friendly, natural summary of this quotation data:
         {data}
         
@@ -235,38 +549,26 @@ class GPTQuotationParser:
             logger.info(f"Generating summary for data: {json.dumps(data)[:100]}...")
             
             # Call the OpenAI API
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            response = await self._create_completion(
+                [
                     {"role": "system", "content": "You are a quotation summary assistant. Generate clear, friendly summaries."},
                     {"role": "user", "content": prompt}
                 ],
+                max_output_tokens=400,
+                on_queued=on_queued,
                 temperature=0.7
             )
             
             summary = response.choices[0].message.content
             logger.info(f"Generated summary: {summary[:100]}...")  # Log first 100 chars
+            await self.cache.set(cache_key, summary)
             return summary
             
         except Exception as e:
             logger.error(f"Error generating summary: {e}")
             # Create a fallback summary from the data
             try:
-                items_text = ""
-                if "items" in data and data["items"]:
-                    items = data["items"]
-                    for item in items:
-                        items_text += f"- {item.get('name', 'Unknown item')}: {item.get('quantity', 0)} x ${item.get('unit_price', 0.0)}\n"
-                
-                return (
-                    f"Summary of quotation for {data.get('customer_name', 'Customer')} at {data.get('customer_company', 'Company')}:\n\n"
-                    f"Contact: {data.get('customer_email', 'No email')} / {data.get('customer_phone', 'No phone')}\n"
-                    f"Address: {data.get('customer_address', 'No address')}\n\n"
-                    f"Items:\n{items_text}\n"
-                    f"Terms & Conditions: {data.get('terms', 'None')}\n"
-                    f"Discount: {data.get('discount', 0)}%\n"
-                    f"Issued by: {data.get('issued_by', 'Not specified')}\n"
-                )
+                return render_local_summary(data)
             except Exception as inner_e:
                 logger.error(f"Error creating fallback summary: {inner_e}")
-                return "Error generating summary. Please check your data and try again." 
\ No newline at end of file
+                return "Error generating summary. Please check your data and try again."
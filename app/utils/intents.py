@@ -0,0 +1,270 @@
+"""
+Keyword intent classifier for free-text messages sent outside a quotation.
+
+All keyword lists are compiled at import into one regex that matches whole
+words only, so 'hi' no longer matches 'this' and 'ai' no longer matches
+'email'. A message is classified in a single scan. Keywords that contain
+other keywords, such as 'what is' and 'what', carry the categories of both,
+because the scan only reports the longest match at each position.
+
+Compare it with the old substring scans with:
+    python -m app.utils.intents --iterations 20000
+"""
+
+import re
+import time
+import argparse
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set
+
+# Topics the bot declines to talk about, in order of precedence
+NON_FUNCTION_QUERIES = {
+    'weather': ['weather', 'forecast', 'temperature', 'rain', 'sunny', 'cloudy'],
+    'news': ['news', 'latest news', 'current events', 'headlines', 'what\'s happening'],
+    'general_chat': ['hello', 'hi', 'hey', 'how are you', 'who are you', 'what can you do', 'tell me a joke', 'joke'],
+    'time': ['time', 'date', 'day', 'today', 'now'],
+    'search': ['search', 'find', 'look up', 'google', 'internet'],
+    'math': ['calculate', 'solve', 'math', 'equation', 'result', 'answer'],
+    'translation': ['translate', 'language', 'mean in', 'what is', 'definition', 'define'],
+    'other_bots': ['gpt', 'ai', 'alexa', 'siri', 'chatgpt', 'bard', 'claude', 'gemini']
+}
+
+# Topics related to the bot's function, in the order their answers are preferred
+FUNCTION_KEYWORDS = {
+    'quotation_core': [
+        'quote', 'quotation', 'invoice', 'offer', 'proposal', 'estimate',
+        'pricing', 'generate', 'create', 'make', 'new'
+    ],
+    'client_info': [
+        'customer', 'client', 'buyer', 'company', 'business', 'contact',
+        'address', 'email', 'phone', 'name'
+    ],
+    'item_details': [
+        'item', 'product', 'service', 'goods', 'merchandise', 'quantity',
+        'price', 'cost', 'amount', 'unit', 'total', 'subtotal'
+    ],
+    'terms': [
+        'terms', 'condition', 'agreement', 'policy', 'discount', 'payment',
+        'due date', 'validity', 'expiry', 'notes', 'issued', 'authorized'
+    ],
+    'document': [
+        'pdf', 'document', 'file', 'format', 'template', 'download', 'send',
+        'share', 'print', 'export', 'html'
+    ],
+    'process': [
+        'step', 'guide', 'how to', 'instruction', 'tutorial', 'ai',
+        'step-by-step', 'all at once', 'info', 'input', 'summary'
+    ],
+    'management': [
+        'modify', 'change', 'edit', 'update', 'delete', 'remove', 'cancel',
+        'revise', 'adjust', 'correct'
+    ]
+}
+
+QUESTION_WORDS = [
+    'how', 'what', 'when', 'where', 'who', 'why', 'can', 'could',
+    'would', 'should', 'do', 'does', 'is', 'are', 'will', 'explain'
+]
+
+# Small-talk topics within general_chat, in the order they are answered
+CHAT_TOPICS = {
+    'greeting': ['hello', 'hi', 'hey'],
+    'how_are_you': ['how are you'],
+    'who_are_you': ['who are you', 'what can you do'],
+    'joke': ['joke']
+}
+
+QUESTION = 'question'
+
+
+class Intent(NamedTuple):
+    """What a free-text message is about."""
+    non_function_category: Optional[str]
+    matched_categories: List[str]
+    is_question: bool
+    chat_topic: Optional[str]
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Regex matching any of the keywords, shaped as a character trie.
+
+    A flat alternation makes the regex engine try every keyword at every
+    position; the trie shares prefixes, so most positions fail on the first
+    character. Longer keywords win, since every optional tail is greedy.
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        branches = [
+            (r'\s+' if char == ' ' else re.escape(char)) + emit(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return emit(trie)
+
+
+class KeywordMatcher:
+    """Finds whole-word keywords from many categories in one regex scan."""
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        """Compile the keywords.
+
+        Args:
+            categories: Keywords per tag; a keyword may appear under several tags
+        """
+        tags: Dict[str, set] = {}
+        for tag, keywords in categories.items():
+            for keyword in keywords:
+                tags.setdefault(' '.join(keyword.lower().split()), set()).add(tag)
+
+        # A longer keyword hides the shorter ones inside it, so it carries their tags too
+        for keyword in tags:
+            inner = re.compile(r'\b' + re.escape(keyword) + r'\b')
+            for phrase in tags:
+                if phrase != keyword and inner.search(phrase):
+                    tags[phrase] |= tags[keyword]
+        self._tags: Dict[str, FrozenSet[str]] = {keyword: frozenset(found) for keyword, found in tags.items()}
+
+        # Plurals ('quotes', 'items') count as their keyword
+        self._pattern = re.compile(r'\b' + _trie_pattern(self._tags) + r'(?:e?s)?\b')
+
+    def _lookup(self, matched: str) -> FrozenSet[str]:
+        """Tags of a matched keyword, which may be written as a plural."""
+        tags = self._tags.get(matched)
+        if tags is None:
+            if ' ' in matched:
+                matched = ' '.join(matched.split())
+                tags = self._tags.get(matched)
+            # Only longer words take plurals, or 'hi' would match 'his'
+            for length in (len(matched) - 1, len(matched) - 2):
+                if tags is None and length > 3:
+                    tags = self._tags.get(matched[:length])
+        return tags or frozenset()
+
+    def tags(self, text: str) -> Set[str]:
+        """Return the tags of every keyword in text.
+
+        Args:
+            text: Lower-case text
+        """
+        found = set()
+        for matched in self._pattern.findall(text):
+            found.update(self._lookup(matched))
+        return found
+
+
+_matcher = KeywordMatcher({
+    **NON_FUNCTION_QUERIES,
+    **FUNCTION_KEYWORDS,
+    **CHAT_TOPICS,
+    QUESTION: QUESTION_WORDS
+})
+
+
+def classify(text: str) -> Intent:
+    """Classify a free-text message in one pass.
+
+    Args:
+        text: The message text
+    """
+    tags = _matcher.tags(text.lower())
+    non_function_category = chat_topic = None
+    if not tags.isdisjoint(NON_FUNCTION_QUERIES):
+        non_function_category = next(category for category in NON_FUNCTION_QUERIES if category in tags)
+        if non_function_category == 'general_chat':
+            chat_topic = next((topic for topic in CHAT_TOPICS if topic in tags), None)
+    matched_categories = [category for category in FUNCTION_KEYWORDS if category in tags]
+    return Intent(non_function_category, matched_categories, QUESTION in tags or '?' in text, chat_topic)
+
+
+def _classify_substrings(text: str) -> Intent:
+    """The previous classifier, kept as the benchmark baseline: substring scans over every keyword list."""
+    message_text = text.lower()
+    non_function_category = None
+    for category, keywords in NON_FUNCTION_QUERIES.items():
+        if any(keyword in message_text for keyword in keywords):
+            non_function_category = category
+            break
+    matched_categories = []
+    for category, keywords in FUNCTION_KEYWORDS.items():
+        if any(keyword in message_text for keyword in keywords):
+            matched_categories.append(category)
+    is_question = any(pattern in message_text for pattern in ['?'] + QUESTION_WORDS)
+    chat_topic = None
+    if non_function_category == 'general_chat':
+        for topic, keywords in CHAT_TOPICS.items():
+            if any(keyword in message_text for keyword in keywords):
+                chat_topic = topic
+                break
+    return Intent(non_function_category, matched_categories, is_question, chat_topic)
+
+
+# Messages of the kind users send outside a quotation
+SAMPLE_MESSAGES = [
+    "hi",
+    "Hello there!",
+    "How do I create a new quotation?",
+    "Can you add my client's email and phone number to this?",
+    "What's the weather like today?",
+    "I need a quote for 20 office chairs and 5 standing desks, delivery to Penang",
+    "can I get the document as a pdf instead of html",
+    "thanks",
+    "Please change the payment terms to 50% upfront and the balance on completion",
+    "is chatgpt better than you",
+    "Tell me a joke",
+    "What is the total price including the discount for these items?",
+    "ok sounds good, this is exactly what we discussed with the procurement team last week",
+    "where can I download the template",
+]
+
+
+def benchmark(messages: Optional[List[str]] = None, iterations: int = 10000) -> Dict[str, float]:
+    """Time both classifiers over the same messages.
+
+    Args:
+        messages: Messages to classify (uses SAMPLE_MESSAGES if None)
+        iterations: Passes over the messages
+
+    Returns:
+        Microseconds per message for each classifier, and the speedup
+    """
+    messages = messages or SAMPLE_MESSAGES
+    results = {}
+    for name, function in (('substring_us', _classify_substrings), ('compiled_us', classify)):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for message in messages:
+                function(message)
+        results[name] = (time.perf_counter() - started) / (iterations * len(messages)) * 1e6
+    results['speedup'] = results['substring_us'] / results['compiled_us']
+    return results
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Compare the compiled intent classifier with the substring scans")
+    parser.add_argument('--iterations', type=int, default=10000, help="Passes over the sample messages")
+    args = parser.parse_args()
+
+    for message in SAMPLE_MESSAGES:
+        old, new = _classify_substrings(message), classify(message)
+        marker = ' ' if old == new else '*'
+        print(f"{marker} {message[:60]!r}\n    substring: {old}\n    compiled:  {new}")
+    results = benchmark(iterations=args.iterations)
+    print(
+        f"\nsubstring scans: {results['substring_us']:.2f} us/message\n"
+        f"compiled regex:  {results['compiled_us']:.2f} us/message\n"
+        f"speedup:         {results['speedup']:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
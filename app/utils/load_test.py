@@ -0,0 +1,441 @@
+"""
+End-to-end load test: drives simulated users through the real bot with a fake Bot API backend.
+
+Run it with:
+    python -m app.utils.load_test --users 2000 --concurrency 200 --ai-share 0.5 --openai-latency 0.8
+
+Every update goes through Application.process_update, so the conversation
+handler, the handlers, rendering and the OpenAI client (pointed at the
+local fake server) all run as in production. Only the Telegram HTTP calls
+are answered in memory.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import resource
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from telegram import Update
+from telegram.request import BaseRequest, RequestData
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Quotation Bot", "username": "quotation_load_test_bot"}
+FIRST_USER_ID = 100000
+
+# (state the conversation is in before the update, kind, payload)
+Step = Tuple[str, str, str]
+
+STEP_BY_STEP_SCRIPT: List[Step] = [
+    ("ENTRY", "command", "/newquote"),
+    ("CHOOSE_MODE", "callback", "mode_step"),
+    ("CUSTOMER_NAME", "text", "Tan Ah Kow"),
+    ("CUSTOMER_COMPANY", "text", "Testing Sdn Bhd"),
+    ("CUSTOMER_ADDRESS", "text", "N33-1, Jalan SS5, Taman Pelangi"),
+    ("CUSTOMER_PHONE", "text", "01066907222"),
+    ("CUSTOMER_EMAIL", "text", "hijef@gmail.com"),
+    ("ITEM_NAME", "text", "Table 11238"),
+    ("ITEM_QUANTITY", "text", "5"),
+    ("ITEM_PRICE", "text", "1000"),
+    ("ADD_ITEMS", "text", "yes"),
+    ("ITEM_NAME", "text", "Chair 12387"),
+    ("ITEM_QUANTITY", "text", "10"),
+    ("ITEM_PRICE", "text", "250"),
+    ("ADD_ITEMS", "text", "no"),
+    ("TERMS", "text", "Payment 25% upfront, remaining payment on delivery"),
+    ("NOTES", "text", "none"),
+    ("ISSUED_BY", "text", "Jeffrey"),
+    ("DISCOUNT", "text", "0"),
+]
+
+AI_SCRIPT: List[Step] = [
+    ("ENTRY", "command", "/newquote"),
+    ("CHOOSE_MODE", "callback", "mode_ai"),
+    # Free text so the extraction really goes to the (fake) model; {user} keeps cache keys distinct
+    ("AI_INPUT", "text", "Hi, order {user} please: Tan Ah Kow from Testing Sdn Bhd wants 5 tables and 10 chairs, "
+                         "usual terms, call him on 01066907222 or hijef@gmail.com, N33-1 Jalan SS5 Taman Pelangi"),
+    ("AI_SUMMARY", "callback", "confirm_yes"),
+]
+
+# What the fake model answers to every extraction request
+CANNED_EXTRACTION = {
+    "data": {
+        "customer_name": "Tan Ah Kow",
+        "customer_company": "Testing Sdn Bhd",
+        "customer_address": "N33-1, Jalan SS5, Taman Pelangi",
+        "customer_phone": "01066907222",
+        "customer_email": "hijef@gmail.com",
+        "items": [
+            {"name": "Table 11238", "quantity": 5, "unit_price": 1000},
+            {"name": "Chair 12387", "quantity": 10, "unit_price": 250}
+        ],
+        "terms": "Payment 25% upfront, remaining payment on delivery",
+        "issued_by": "Jeffrey"
+    },
+    "missing_fields": []
+}
+
+
+class FakeBotRequest(BaseRequest):
+    """Answers Bot API calls in memory and counts them per endpoint and chat."""
+
+    def __init__(self):
+        """Initialize the backend."""
+        self.calls: Counter = Counter()
+        self.documents: Counter = Counter()  # chat_id -> documents sent
+        self.last_text: Dict[int, str] = {}
+        self._message_id = 0
+
+    async def initialize(self) -> None:
+        """Nothing to set up."""
+
+    async def shutdown(self) -> None:
+        """Nothing to tear down."""
+
+    def _message(self, chat_id: int, text: Optional[str] = None, document: bool = False) -> Dict:
+        """Build the Message the Bot API would return."""
+        self._message_id += 1
+        message = {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER
+        }
+        if text is not None:
+            message["text"] = text
+        if document:
+            message["document"] = {"file_id": f"doc{self._message_id}", "file_unique_id": f"doc{self._message_id}"}
+        return message
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout=None,
+        write_timeout=None,
+        connect_timeout=None,
+        pool_timeout=None
+    ) -> Tuple[int, bytes]:
+        """Return a successful Bot API response for the endpoint in url."""
+        endpoint = url.rsplit('/', 1)[-1]
+        self.calls[endpoint] += 1
+        params = request_data.parameters if request_data is not None else {}
+        chat_id = int(params.get("chat_id", 0) or 0)
+
+        if endpoint == "getMe":
+            result = BOT_USER
+        elif endpoint in ("sendMessage", "editMessageText"):
+            text = params.get("text", "")
+            self.last_text[chat_id] = text
+            result = self._message(chat_id, text)
+        elif endpoint == "sendDocument":
+            self.documents[chat_id] += 1
+            result = self._message(chat_id, document=True)
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode('utf-8')
+
+
+class UpdateFactory:
+    """Builds Telegram updates for simulated users."""
+
+    def __init__(self, bot):
+        """Initialize the factory.
+
+        Args:
+            bot: The application's bot, needed to deserialize updates
+        """
+        self.bot = bot
+        self._update_id = 0
+        self._message_id = 0
+
+    def build(self, user_id: int, kind: str, payload: str) -> Update:
+        """Create a command, text or callback-query update from user_id."""
+        self._update_id += 1
+        self._message_id += 1
+        user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+        chat = {"id": user_id, "type": "private"}
+
+        if kind == "callback":
+            data = {
+                "update_id": self._update_id,
+                "callback_query": {
+                    "id": str(self._update_id),
+                    "from": user,
+                    "chat_instance": str(user_id),
+                    "data": payload,
+                    "message": {"message_id": self._message_id, "date": int(time.time()), "chat": chat, "from": BOT_USER, "text": "..."}
+                }
+            }
+        else:
+            message = {"message_id": self._message_id, "date": int(time.time()), "chat": chat, "from": user, "text": payload}
+            if kind == "command":
+                message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(payload.split()[0])}]
+            data = {"update_id": self._update_id, "message": message}
+        return Update.de_json(data, self.bot)
+
+
+class WebhookSender:
+    """Posts updates to a webhook the way Telegram does, for testing webhook mode locally."""
+
+    def __init__(self, url: str, secret_token: str = "", bot=None):
+        """Initialize the sender.
+
+        Args:
+            url: Full webhook URL, e.g. http://127.0.0.1:8443/telegram
+            secret_token: Value sent in the X-Telegram-Bot-Api-Secret-Token header
+            bot: Bot used to build the updates (a bare one if None)
+        """
+        import httpx
+        self.url = url
+        self.secret_token = secret_token
+        self.factory = UpdateFactory(bot)
+        self._client = httpx.AsyncClient(timeout=10.0)
+
+    async def send(self, user_id: int, kind: str, payload: str) -> int:
+        """Post one update and return the HTTP status of the reply."""
+        update = self.factory.build(user_id, kind, payload)
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.secret_token} if self.secret_token else {}
+        response = await self._client.post(self.url, json=update.to_dict(), headers=headers)
+        return response.status_code
+
+    async def close(self) -> None:
+        """Close the HTTP client."""
+        await self._client.aclose()
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+async def run_load_test(
+    users: int = 100,
+    concurrency: int = 50,
+    ai_share: float = 0.5,
+    openai_latency: float = 0.5,
+    openai_jitter: float = 0.2,
+    openai_rate_limit_rate: float = 0.0,
+    think_time: float = 0.0,
+    final_step_retries: int = 20,
+    trace_memory: bool = False,
+    seed: int = 0
+) -> Dict:
+    """Drive simulated users through the bot and return the measurements.
+
+    Args:
+        users: Number of simulated users, each completing one quotation
+        concurrency: Users in a conversation at the same time
+        ai_share: Share of users taking the AI flow instead of the step-by-step one
+        openai_latency: Base latency of the fake OpenAI server in seconds
+        openai_jitter: Extra random latency of up to this many seconds
+        openai_rate_limit_rate: Share of OpenAI calls answered with a 429
+        think_time: Delay between a user's messages in seconds
+        final_step_retries: Times the final step is resent when the render queue is full
+        trace_memory: Also measure peak Python heap usage with tracemalloc (slower)
+        seed: Random seed for the user mix and the fake server
+    """
+    # Imported here so the environment is configured before the bot modules read it
+    from openai import AsyncOpenAI
+    from app.bot import create_application, handlers
+    from app.utils.fake_openai import FakeOpenAIServer
+    from app.utils.rate_limiter import RateLimiter
+
+    saved_config = (Config.PUBLIC_MODE, Config.SAVE_TO_STORAGE, Config.PERSISTENCE_PATH)
+    Config.PUBLIC_MODE = True
+    Config.SAVE_TO_STORAGE = False
+    Config.PERSISTENCE_PATH = ''
+
+    canned_reply = {
+        "status": 200,
+        "content_type": "application/json",
+        "request": {"tools": [{}]},
+        "body": json.dumps({
+            "id": "chatcmpl-load-test",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "fake",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": None, "tool_calls": [{
+                    "id": "call_load_test",
+                    "type": "function",
+                    "function": {"name": "record_quotation", "arguments": json.dumps(CANNED_EXTRACTION)}
+                }]}
+            }],
+            "usage": {"prompt_tokens": 300, "completion_tokens": 150, "total_tokens": 450}
+        })
+    }
+    openai_server = FakeOpenAIServer(
+        latency=openai_latency,
+        jitter=openai_jitter,
+        rate_limit_rate=openai_rate_limit_rate,
+        retry_after=0.5,
+        seed=seed,
+        recordings=[canned_reply]
+    )
+    await openai_server.start()
+    saved_parser = (handlers.gpt_parser.client, handlers.gpt_parser.limiter)
+    handlers.gpt_parser.client = AsyncOpenAI(api_key="load-test", base_url=openai_server.base_url, max_retries=0)
+    handlers.gpt_parser.limiter = RateLimiter(
+        max_in_flight=Config.OPENAI_MAX_IN_FLIGHT, tokens_per_minute=0, max_retries=Config.OPENAI_MAX_RETRIES, base_delay=0.1
+    )
+
+    bot_request = FakeBotRequest()
+    application = create_application(request=bot_request, token="123456:load-test")
+    handler_errors: Counter = Counter()
+
+    async def count_error(update, context) -> None:
+        handler_errors[type(context.error).__name__] += 1
+        logger.debug(f"Handler error: {context.error!r}")
+
+    application.add_error_handler(count_error)
+    await application.initialize()
+    factory = UpdateFactory(application.bot)
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    outcomes: Counter = Counter()
+    rng = random.Random(seed)
+    flows = ["ai" if rng.random() < ai_share else "step" for _ in range(users)]
+    slots = asyncio.Semaphore(concurrency)
+
+    async def send(user_id: int, state: str, kind: str, payload: str) -> None:
+        update = factory.build(user_id, kind, payload.format(user=user_id))
+        started = time.perf_counter()
+        # Through the update processor, as for updates fetched by polling or a webhook
+        await application.update_processor.process_update(update, application.process_update(update))
+        latencies[state].append(time.perf_counter() - started)
+
+    async def simulate(index: int) -> None:
+        user_id = FIRST_USER_ID + index
+        script = AI_SCRIPT if flows[index] == "ai" else STEP_BY_STEP_SCRIPT
+        async with slots:
+            for state, kind, payload in script:
+                if think_time:
+                    await asyncio.sleep(think_time)
+                await send(user_id, state, kind, payload)
+
+            # The final step is answered with "busy" when the render queue is full; resend it like a user would
+            state, kind, payload = script[-1]
+            for _ in range(final_step_retries):
+                if bot_request.documents[user_id]:
+                    break
+                outcomes["final_step_retries"] += 1
+                await asyncio.sleep(0.05)
+                await send(user_id, state, kind, payload)
+            outcomes[f"{flows[index]}_completed" if bot_request.documents[user_id] else f"{flows[index]}_failed"] += 1
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate(i) for i in range(users)))
+    elapsed = time.perf_counter() - started
+    traced_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    await application.shutdown()
+    await handlers.gpt_parser.client.close()
+    await openai_server.stop()
+    handlers.gpt_parser.client, handlers.gpt_parser.limiter = saved_parser
+    Config.PUBLIC_MODE, Config.SAVE_TO_STORAGE, Config.PERSISTENCE_PATH = saved_config
+
+    total_updates = sum(len(values) for values in latencies.values())
+    completed = outcomes["ai_completed"] + outcomes["step_completed"]
+    per_state = {}
+    for state, values in latencies.items():
+        values.sort()
+        per_state[state] = {
+            "count": len(values),
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": values[-1] * 1000
+        }
+    return {
+        "users": users,
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "updates": total_updates,
+        "updates_per_s": total_updates / elapsed if elapsed else 0.0,
+        "quotations_per_s": completed / elapsed if elapsed else 0.0,
+        "outcomes": dict(outcomes),
+        "handler_errors": dict(handler_errors),
+        "states": per_state,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peak_traced_mb": traced_peak / (1024 * 1024) if traced_peak is not None else None,
+        "openai_server": dict(openai_server.stats),
+        "bot_api_calls": dict(bot_request.calls)
+    }
+
+
+def format_report(report: Dict) -> str:
+    """Render a report as a plain-text table."""
+    lines = [
+        f"Users: {report['users']} (concurrency {report['concurrency']}) in {report['elapsed_s']:.1f}s",
+        f"Throughput: {report['updates_per_s']:.1f} updates/s, {report['quotations_per_s']:.1f} quotations/s",
+        f"Outcomes: {report['outcomes']}",
+        f"Handler errors: {report['handler_errors'] or 'none'}",
+        f"Peak RSS: {report['peak_rss_mb']:.1f} MB"
+        + (f", peak traced heap: {report['peak_traced_mb']:.1f} MB" if report['peak_traced_mb'] is not None else ""),
+        f"OpenAI fake server: {report['openai_server']}",
+        "",
+        f"{'State':<18}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    ]
+    for state, stats in report["states"].items():
+        lines.append(
+            f"{state:<18}{stats['count']:>8}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+            f"{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Load-test the quotation bot with simulated users")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--ai-share', type=float, default=0.5, help="Share of users taking the AI flow")
+    parser.add_argument('--openai-latency', type=float, default=0.5)
+    parser.add_argument('--openai-jitter', type=float, default=0.2)
+    parser.add_argument('--openai-rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--think-time', type=float, default=0.0, help="Seconds between a user's messages")
+    parser.add_argument('--trace-memory', action='store_true', help="Measure the peak Python heap (slower)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    os.environ.setdefault('OPENAI_API_KEY', 'load-test')
+    report = asyncio.run(run_load_test(
+        users=args.users,
+        concurrency=args.concurrency,
+        ai_share=args.ai_share,
+        openai_latency=args.openai_latency,
+        openai_jitter=args.openai_jitter,
+        openai_rate_limit_rate=args.openai_rate_limit_rate,
+        think_time=args.think_time,
+        trace_memory=args.trace_memory,
+        seed=args.seed
+    ))
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
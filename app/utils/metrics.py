@@ -0,0 +1,67 @@
+"""
+Lightweight in-process metrics (counters, gauges and timings).
+"""
+
+import threading
+from typing import Dict
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and timing summaries."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Increase a counter.
+
+        Args:
+            name: Counter name
+            value: Amount to add
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value.
+
+        Args:
+            name: Gauge name
+            value: Current value
+        """
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a duration.
+
+        Args:
+            name: Timing name
+            seconds: Observed duration in seconds
+        """
+        with self._lock:
+            timing = self._timings.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            timing['count'] += 1
+            timing['total'] += seconds
+            timing['max'] = max(timing['max'], seconds)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Return a copy of all metrics, with the average added to each timing."""
+        with self._lock:
+            timings = {
+                name: {**timing, 'avg': timing['total'] / timing['count'] if timing['count'] else 0.0}
+                for name, timing in self._timings.items()
+            }
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'timings': timings
+            }
+
+
+# Create a singleton instance for use throughout the application
+metrics = Metrics()
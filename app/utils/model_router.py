@@ -0,0 +1,121 @@
+"""
+Per-request model selection for OpenAI calls, with per-model cost and latency counters.
+"""
+
+import re
+import logging
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from app.config import Config
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# A line with at least two numbers, e.g. "Chair, 10 unit, 250/unit", is probably an item
+_ITEM_LIKE_LINE = re.compile(r'\d[^\d\n]+\d')
+
+
+def estimate_item_count(text: str) -> int:
+    """Count lines that look like item lines."""
+    return sum(1 for line in text.splitlines() if _ITEM_LIKE_LINE.search(line))
+
+
+class ModelRouter:
+    """Picks the cheap model unless the input is large or the cheap model has been failing.
+
+    Failures are tracked over a sliding window of recent outcomes per model,
+    and every call's latency and token usage is recorded as
+    openai.<model>.latency / openai.<model>.tokens so thresholds can be tuned.
+    """
+
+    def __init__(
+        self,
+        cheap_model: str = "gpt-3.5-turbo",
+        strong_model: Optional[str] = None,
+        long_input_chars: int = 2000,
+        many_items: int = 15,
+        max_failure_rate: float = 0.3,
+        window: int = 50
+    ):
+        """Initialize the router.
+
+        Args:
+            cheap_model: Default model for ordinary requests
+            strong_model: Bigger model for large inputs and fallbacks (routing disabled if None)
+            long_input_chars: Inputs longer than this go straight to the strong model
+            many_items: Inputs with at least this many item-like lines go to the strong model
+            max_failure_rate: Cheap-model failure rate above which requests go to the strong model
+            window: Number of recent outcomes per model used for the failure rate
+        """
+        self.cheap_model = cheap_model
+        self.strong_model = strong_model if strong_model and strong_model != cheap_model else None
+        self.long_input_chars = long_input_chars
+        self.many_items = many_items
+        self.max_failure_rate = max_failure_rate
+        self.window = window
+        self._outcomes: Dict[str, Deque[bool]] = {}
+        self._lock = threading.Lock()
+
+    def failure_rate(self, model: str) -> float:
+        """Share of recent calls to model that failed."""
+        with self._lock:
+            outcomes = self._outcomes.get(model)
+            if not outcomes:
+                return 0.0
+            return outcomes.count(False) / len(outcomes)
+
+    def choose(self, text: str) -> str:
+        """Pick the model for a request from its size and the cheap model's recent record."""
+        if self.strong_model is None:
+            return self.cheap_model
+
+        reason = None
+        if len(text) > self.long_input_chars:
+            reason = f"{len(text)} characters"
+        elif estimate_item_count(text) >= self.many_items:
+            reason = "many items"
+        elif self.failure_rate(self.cheap_model) > self.max_failure_rate:
+            reason = f"{self.cheap_model} failure rate {self.failure_rate(self.cheap_model):.0%}"
+
+        if reason:
+            logger.info(f"Routing to {self.strong_model} ({reason})")
+            metrics.increment(f"openai.route.{self.strong_model}")
+            return self.strong_model
+        metrics.increment(f"openai.route.{self.cheap_model}")
+        return self.cheap_model
+
+    def fallback(self, model: str) -> Optional[str]:
+        """Return the model to retry with when model's answer was incomplete, if any."""
+        return self.strong_model if model == self.cheap_model else None
+
+    def models_for(self, text: str) -> List[str]:
+        """The chosen model followed by its fallback, in the order to try them."""
+        model = self.choose(text)
+        fallback = self.fallback(model)
+        return [model, fallback] if fallback else [model]
+
+    def record_call(self, model: str, seconds: float, tokens: int) -> None:
+        """Record one API call's latency and token usage."""
+        metrics.observe(f"openai.{model}.latency", seconds)
+        metrics.increment(f"openai.{model}.tokens", tokens)
+        metrics.increment(f"openai.{model}.calls")
+
+    def record_outcome(self, model: str, success: bool) -> None:
+        """Record whether model's answer was usable."""
+        with self._lock:
+            outcomes = self._outcomes.setdefault(model, deque(maxlen=self.window))
+            outcomes.append(success)
+        if not success:
+            metrics.increment(f"openai.{model}.failures")
+
+
+# Create a singleton instance shared by every parser in the process
+model_router = ModelRouter(
+    cheap_model=Config.OPENAI_MODEL,
+    strong_model=Config.OPENAI_FALLBACK_MODEL or None,
+    long_input_chars=Config.ROUTER_LONG_INPUT_CHARS,
+    many_items=Config.ROUTER_MANY_ITEMS,
+    max_failure_rate=Config.ROUTER_MAX_FAILURE_RATE
+)
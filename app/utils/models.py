@@ -3,6 +3,7 @@ from typing import List, Optional
 from pydantic import BaseModel, Field, field_validator
 import random
 from app.config import Config
+from app.utils.artifacts import safe_filename
 
 
 class QuotationItem(BaseModel):
@@ -108,4 +109,4 @@ class QuotationData(BaseModel):
     def filename(self) -> str:
         """Generate a filename for the quotation PDF."""
         date_str = self.created_date.strftime('%Y-%m-%d')
-        return f"{self.customer_company.replace(' ', '_')}_Quotation_{date_str}"
+        return f"{safe_filename(self.customer_company)}_Quotation_{date_str}"
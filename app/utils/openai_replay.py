@@ -0,0 +1,108 @@
+"""
+Recording of OpenAI request/response pairs to JSONL, for offline replay and benchmarks.
+"""
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Request fields that decide what the model returns
+KEY_FIELDS = ("model", "messages", "tools", "tool_choice", "response_format")
+
+
+def request_key(body: Dict) -> str:
+    """Hash the parts of a chat completion request that determine its response."""
+    payload = {field: body.get(field) for field in KEY_FIELDS}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_recordings(path: str) -> List[Dict]:
+    """Read a recordings file, skipping lines that are not valid JSON."""
+    recordings = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    recordings.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        logger.warning(f"No recordings found at {path}")
+    return recordings
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """httpx transport that forwards requests and appends each request/response pair to a JSONL file.
+
+    Responses are read fully before they are returned, so streamed replies
+    arrive all at once while recording.
+    """
+
+    def __init__(self, path: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """Initialize the transport.
+
+        Args:
+            path: JSONL file the pairs are appended to
+            transport: Transport that performs the real request (a default HTTP transport if None)
+        """
+        self.path = path
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self._lock = threading.Lock()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send the request and record it together with the response."""
+        body = await request.aread()
+        started = time.monotonic()
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()
+        elapsed = time.monotonic() - started
+
+        try:
+            request_body = json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            request_body = {}
+        self._append({
+            'method': request.method,
+            'path': request.url.path,
+            'key': request_key(request_body),
+            'request': request_body,
+            'status': response.status_code,
+            'content_type': response.headers.get('content-type', ''),
+            'body': content.decode('utf-8', errors='replace'),
+            'elapsed': round(elapsed, 4)
+        })
+
+        # The original stream has been consumed, so hand back a copy of the body
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in ('content-length', 'content-encoding', 'transfer-encoding')]
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=headers,
+            content=content,
+            request=request
+        )
+
+    def _append(self, entry: Dict) -> None:
+        """Append one recording, serializing writers from different threads."""
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+            except OSError as e:
+                logger.error(f"Could not write OpenAI recording to {self.path}: {str(e)}")
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self.transport.aclose()
+
+
+def recording_http_client(path: str) -> httpx.AsyncClient:
+    """Return an httpx client for AsyncOpenAI that records every call to path."""
+    return httpx.AsyncClient(transport=RecordingTransport(path), timeout=httpx.Timeout(600.0, connect=5.0))
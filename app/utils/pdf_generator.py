@@ -1,79 +1,88 @@
+"""
+PDF generation for quotations using WeasyPrint.
+
+Rendering runs in long-lived worker processes (see pdf_executor) that load
+WeasyPrint, fonts and the template CSS once when they start.
+"""
+
 import os
+import time
+import logging
 from pathlib import Path
-from datetime import datetime
-import jinja2
-from weasyprint import HTML
+from typing import Optional
 from app.utils.models import QuotationData
+from app.utils.test_pdf import generate_quotation_html, create_sample_quotation
+from app.utils.template_renderer import TEMPLATES_DIR
+from app.utils.render_executor import RenderExecutor
+from app.utils.artifacts import store_artifact
 from app.config import Config
 
+logger = logging.getLogger(__name__)
+
 
 class PDFGenerator:
     """Class to handle PDF generation from quotation data."""
-    
+
     def __init__(self):
-        """Initialize the PDF generator with Jinja2 environment."""
-        templates_dir = Path(__file__).parent.parent / 'templates'
-        temp_dir = Path(Config.STORAGE_PATH) if Config.SAVE_TO_STORAGE else Path('temp')
-        
-        self.env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader(templates_dir),
-            autoescape=jinja2.select_autoescape(['html', 'xml'])
-        )
-        
+        """Initialize the PDF generator and load WeasyPrint."""
+        # Imported here so HTML-only deployments don't need Pango/Cairo installed
+        from weasyprint import HTML
+        from weasyprint.text.fonts import FontConfiguration
+
+        self._html_class = HTML
+        self.font_config = FontConfiguration()
+        self.temp_dir = Path(Config.STORAGE_PATH) if Config.SAVE_TO_STORAGE else Path(Config.TEMP_PATH)
+
         # Create temp directory if it doesn't exist
-        os.makedirs(temp_dir, exist_ok=True)
-        
+        os.makedirs(self.temp_dir, exist_ok=True)
+
         # Create storage directory if enabled
         if Config.SAVE_TO_STORAGE:
             os.makedirs(Config.STORAGE_PATH, exist_ok=True)
-    
-    def _get_template_context(self, quotation_data: QuotationData) -> dict:
-        """Prepare the context data for the template."""
-        return {
-            # Company details
-            'company_name': Config.COMPANY_NAME,
-            'company_address': Config.COMPANY_ADDRESS,
-            'company_phone': Config.COMPANY_PHONE,
-            'company_email': Config.COMPANY_EMAIL,
-            'company_website': Config.COMPANY_WEBSITE,
-            'company_logo': Config.COMPANY_LOGO_URL if hasattr(Config, 'COMPANY_LOGO_URL') else None,
-            
-            # Quotation details
-            'quotation_number': quotation_data.quotation_number,
-            'quotation_date': quotation_data.created_date,
-            'customer_name': quotation_data.customer_name,
-            'items': quotation_data.items,
-            'notes': quotation_data.notes,
-            
-            # Calculations
-            'subtotal': quotation_data.subtotal,
-            'currency': "$",
-            
-            # Utility for template
-            'format_currency': lambda value: f"${value:,.2f}"
-        }
-    
+
+    def render_pdf(self, quotation_data: QuotationData) -> bytes:
+        """Render the quotation to PDF and return the document bytes."""
+        html_content = generate_quotation_html(quotation_data)
+        document = self._html_class(string=html_content, base_url=str(TEMPLATES_DIR))
+        return document.write_pdf(font_config=self.font_config)
+
     def generate_pdf(self, quotation_data: QuotationData) -> Path:
         """Generate a PDF from the quotation data and return the file path."""
-        # Get the template
-        template = self.env.get_template("quotation_template.html")
-        
-        # Render the template with context data
-        context = self._get_template_context(quotation_data)
-        html_content = template.render(**context)
-        
-        # Define the output path
-        pdf_filename = quotation_data.filename
-        pdf_path = temp_dir / pdf_filename
-        
-        # Generate PDF from HTML
-        HTML(string=html_content).write_pdf(pdf_path)
-        
-        # Optionally save to storage
-        if Config.SAVE_TO_STORAGE:
-            storage_file_path = Path(Config.STORAGE_PATH) / pdf_filename
-            with open(pdf_path, 'rb') as src_file:
-                with open(storage_file_path, 'wb') as dest_file:
-                    dest_file.write(src_file.read())
-        
-        return pdf_path
+        # Unique, atomically written path so concurrent renders never overwrite each other
+        return store_artifact(self.temp_dir, f"{quotation_data.filename}.pdf", self.render_pdf(quotation_data))
+
+
+# Per-process generator, created by init_pdf_worker when a pool worker starts
+_worker_generator: Optional[PDFGenerator] = None
+
+
+def init_pdf_worker() -> None:
+    """Load WeasyPrint in a pool worker and render a sample quote to warm fonts and CSS."""
+    global _worker_generator
+    try:
+        started = time.time()
+        _worker_generator = PDFGenerator()
+        _worker_generator.render_pdf(create_sample_quotation())
+        logger.info(f"PDF worker {os.getpid()} warmed up in {time.time() - started:.2f}s")
+    except Exception as e:
+        # Don't break the pool; the error is raised again when a quote is rendered
+        _worker_generator = None
+        logger.error(f"Could not warm up PDF worker {os.getpid()}: {e}")
+
+
+def render_quotation_pdf(quotation: QuotationData) -> bytes:
+    """Render a quotation to PDF bytes using this worker's warm generator."""
+    global _worker_generator
+    if _worker_generator is None:
+        _worker_generator = PDFGenerator()
+    return _worker_generator.render_pdf(quotation)
+
+
+# Create a singleton instance for use throughout the application
+pdf_executor = RenderExecutor(
+    name="pdf",
+    mode="process",
+    max_workers=Config.PDF_WORKERS,
+    max_queue=Config.RENDER_QUEUE_MAX,
+    initializer=init_pdf_worker
+)
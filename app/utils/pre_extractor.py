@@ -0,0 +1,224 @@
+"""
+Regex/heuristic fast path that extracts quotation fields locally before asking GPT.
+"""
+
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+REQUIRED_FIELDS = [
+    "customer_name", "customer_company", "customer_address",
+    "customer_phone", "customer_email", "items", "terms"
+]
+
+# Fields the pre-extractor understands when they are written as "label: value"
+FIELD_LABELS = {
+    "customer_name": ["customer_name", "customer name", "customer", "name", "contact", "contact person", "attn"],
+    "customer_company": ["customer_company", "company", "company name"],
+    "customer_address": ["customer_address", "address"],
+    "customer_phone": ["customer_phone", "phone", "tel", "mobile", "contact no", "phone number"],
+    "customer_email": ["customer_email", "email", "e-mail"],
+    "terms": ["terms", "terms and conditions", "terms & conditions", "payment terms"],
+    "discount": ["discount"],
+    "issued_by": ["issued_by", "issued by", "prepared by"],
+    "notes": ["notes", "note", "remarks"]
+}
+
+_LABEL_TO_FIELD = {label: field for field, labels in FIELD_LABELS.items() for label in labels}
+_LABELED_LINE = re.compile(
+    r'^(?P<label>' + '|'.join(sorted((re.escape(label) for label in _LABEL_TO_FIELD), key=len, reverse=True)) + r')\s*[:=\-]\s*(?P<value>.+)$',
+    re.IGNORECASE
+)
+_BULLET = re.compile(r'^\s*(?:[-*•·]|\d+[.)])\s*')
+_HEADER = re.compile(r'^[^:]{0,40}:$')
+
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+_PHONE_LINE = re.compile(r'^\+?[\d\s\-().]{7,20}$')
+
+# "Table 11238, 5 unit, 1000/unit" or "Chair - 10 pcs - RM250 each"
+_ITEM_LINE = re.compile(
+    r'^(?P<name>[^,;]+?)\s*[,;\-]\s*(?P<quantity>\d+(?:\.\d+)?)\s*(?:units?|pcs?|pieces?|sets?|nos?|qty|x)?\s*'
+    r'[,;\-@]\s*(?:rm|usd|\$)?\s*(?P<unit_price>\d[\d,]*(?:\.\d+)?)\s*(?:/\s*|per\s+|each)?(?:units?|pcs?|piece|set|each)?$',
+    re.IGNORECASE
+)
+# "5 x Table @ 1000"
+_ITEM_QTY_FIRST = re.compile(
+    r'^(?P<quantity>\d+(?:\.\d+)?)\s*(?:x|×|units?\s+of|pcs?\s+of)\s*(?P<name>.+?)\s*(?:@|at)\s*(?:rm|usd|\$)?\s*(?P<unit_price>\d[\d,]*(?:\.\d+)?)\s*(?:each|/\s*unit|per\s+unit)?$',
+    re.IGNORECASE
+)
+
+_COMPANY_SUFFIX = re.compile(
+    r'\b(?:sdn\.?\s*bhd|bhd|pte\.?\s*ltd|ltd|llc|llp|inc|corp(?:oration)?|plc|gmbh|co\.|company|enterprise|trading|holdings|group)\b\.?',
+    re.IGNORECASE
+)
+_ADDRESS_HINT = re.compile(
+    r'\b(?:jalan|jln|lorong|persiaran|taman|tmn|street|st\.|road|rd\.?|avenue|ave|lane|boulevard|blvd|lot|block|blk|'
+    r'level|floor|unit|suite|building|plaza|kampung|kg|bandar|\d{5})\b',
+    re.IGNORECASE
+)
+_TERMS_HINT = re.compile(
+    r'\b(?:payment|deposit|upfront|balance|installment|instalment|delivery|warranty|validity|valid|due|'
+    r'cod|net\s*\d+|days?|advance|upon|completion|terms?)\b',
+    re.IGNORECASE
+)
+# "Discount: 10%", "discount of RM50" or "10% discount"
+_DISCOUNT_LINE = re.compile(
+    r'(?:(?P<before>\d+(?:\.\d+)?)\s*(?:%|percent)?\s*(?:off\s+|of\s+)?discount\b|\bdiscount\b\D*(?P<after>\d+(?:\.\d+)?)\s*(?:%|percent\b)?)',
+    re.IGNORECASE
+)
+_PERSON_NAME = re.compile(
+    r"^(?:(?:mr|mrs|ms|miss|dr|encik|en|puan|pn|cik|tuan|datuk|dato'?|madam)\.?\s+)?[A-Za-z][A-Za-z.'\-]*(?:\s+[A-Za-z][A-Za-z.'\-]*){1,4}$",
+    re.IGNORECASE
+)
+# Words that make a short line a request or remark rather than a name ("Urgent quote please")
+_NOT_NAME_WORDS = frozenset({
+    'a', 'an', 'the', 'and', 'or', 'for', 'to', 'of', 'in', 'on', 'at', 'by', 'with', 'from', 'is', 'are',
+    'i', 'we', 'you', 'my', 'our', 'your', 'me', 'us', 'it', 'this', 'that', 'please', 'pls', 'thanks', 'thank',
+    'need', 'want', 'like', 'can', 'could', 'would', 'send', 'make', 'get', 'give', 'add', 'asap', 'urgent',
+    'quote', 'quotation', 'invoice', 'order', 'price', 'prices', 'item', 'items', 'delivery', 'payment',
+    'hi', 'hello', 'hey', 'dear', 'regards', 'ok', 'okay', 'yes', 'no', 'none'
+})
+
+
+class PreExtraction(NamedTuple):
+    """Result of the local fast-path extraction."""
+    data: Dict
+    missing_fields: List[str]  # Required fields that are still empty
+    unresolved_text: str  # Lines not matched by a reliable pattern, for the model
+    unmatched_lines: int  # Lines no pattern recognized at all
+    guessed_fields: List[str]  # Fields filled only by the weaker heuristics
+
+    @property
+    def complete(self) -> bool:
+        """True when every required field was found and no line was left unexplained."""
+        return not self.missing_fields and not self.unmatched_lines
+
+
+def _number(value: str) -> float:
+    """Parse a number written with thousands separators."""
+    number = float(value.replace(',', ''))
+    return int(number) if number.is_integer() else number
+
+
+def _parse_item(line: str) -> Optional[Dict]:
+    """Return an item dict if the line looks like "name, qty unit, price/unit"."""
+    match = _ITEM_LINE.match(line) or _ITEM_QTY_FIRST.match(line)
+    if not match:
+        return None
+    return {
+        "name": match.group("name").strip(),
+        "quantity": _number(match.group("quantity")),
+        "unit_price": _number(match.group("unit_price"))
+    }
+
+
+def _is_phone(line: str) -> bool:
+    """Check whether the whole line is a phone number."""
+    if not _PHONE_LINE.match(line):
+        return False
+    digits = sum(c.isdigit() for c in line)
+    return 7 <= digits <= 15
+
+
+def _discount(line: str) -> Optional[float]:
+    """Return the discount written on the line, before or after the word "discount"."""
+    match = _DISCOUNT_LINE.search(line)
+    if not match:
+        return None
+    return _number(match.group("before") or match.group("after"))
+
+
+def _is_person_name(line: str) -> bool:
+    """Check whether the line is a short run of words that could be a name."""
+    if not _PERSON_NAME.match(line):
+        return False
+    return not any(word.strip(".'-").lower() in _NOT_NAME_WORDS for word in line.split())
+
+
+def pre_extract(text: str) -> PreExtraction:
+    """Extract what can be found reliably without a language model.
+
+    Labeled lines ("Email: ...") always win, and later labeled lines
+    override earlier ones so corrections in a follow-up message apply.
+    Unlabeled lines are matched by pattern (email, phone, item, company
+    suffix, address, terms, person name) and only fill empty fields.
+
+    Lines matched only by the weaker heuristics are also returned in
+    unresolved_text so the model can double-check them if it is called.
+    """
+    data: Dict = {"items": []}
+    terms: List[str] = []
+    unresolved: List[str] = []
+    guessed: List[str] = []
+    unmatched = 0
+
+    for raw_line in text.splitlines():
+        line = _BULLET.sub('', raw_line).strip()
+        if not line or _HEADER.match(line):
+            continue
+
+        labeled = _LABELED_LINE.match(line)
+        if labeled:
+            field = _LABEL_TO_FIELD[labeled.group("label").lower()]
+            value = labeled.group("value").strip()
+            if field == "terms":
+                terms.append(value)
+            elif field == "discount":
+                discount = _discount(line)
+                if discount is not None:
+                    data["discount"] = discount
+            elif field == "customer_email":
+                email = EMAIL_PATTERN.search(value)
+                data[field] = email.group(0) if email else value
+            else:
+                data[field] = value
+            continue
+
+        item = _parse_item(line)
+        if item:
+            data["items"].append(item)
+            continue
+
+        email = EMAIL_PATTERN.search(line)
+        if email and EMAIL_PATTERN.fullmatch(line):
+            data.setdefault("customer_email", email.group(0))
+            continue
+
+        if _is_phone(line):
+            data.setdefault("customer_phone", line)
+            continue
+
+        discount = _discount(line)
+        if discount is not None:
+            data.setdefault("discount", discount)
+            # Only a line that is just the discount is fully explained by it
+            if _DISCOUNT_LINE.fullmatch(line.strip()):
+                continue
+
+        # The remaining heuristics are weaker, so the line is also kept for the model
+        unresolved.append(raw_line.strip())
+
+        if _COMPANY_SUFFIX.search(line) and "customer_company" not in data:
+            field = "customer_company"
+            data[field] = line
+        elif _TERMS_HINT.search(line) and not _ADDRESS_HINT.search(line):
+            field = "terms"
+            terms.append(line)
+        elif _ADDRESS_HINT.search(line) and any(c.isdigit() for c in line) and "customer_address" not in data:
+            field = "customer_address"
+            data[field] = line
+        elif _is_person_name(line) and "customer_name" not in data:
+            field = "customer_name"
+            data[field] = line
+        else:
+            unmatched += 1
+            continue
+        if field not in guessed:
+            guessed.append(field)
+
+    if terms:
+        data["terms"] = ", ".join(terms)
+    if not data["items"]:
+        del data["items"]
+
+    missing = [field for field in REQUIRED_FIELDS if not data.get(field)]
+    return PreExtraction(data, missing, "\n".join(unresolved), unmatched, guessed)
@@ -0,0 +1,241 @@
+"""
+Shared concurrency and token-budget limiter for OpenAI calls.
+"""
+
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Optional, Set
+
+import openai
+
+from app.config import Config
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and 5xx responses
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError
+)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Return the delay requested by the server's Retry-After headers, if any."""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    if headers.get('retry-after-ms'):
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """FIFO limiter with a max in-flight count, a tokens-per-minute budget and retries.
+
+    Concurrency adapts to the server: a 429 halves the in-flight limit and
+    pauses new calls until Retry-After, and successful calls grow it back
+    one step at a time up to max_in_flight.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 4,
+        tokens_per_minute: int = 60000,
+        max_retries: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0
+    ):
+        """Initialize the limiter.
+
+        Args:
+            max_in_flight: Maximum number of concurrent API calls
+            tokens_per_minute: Token budget per minute (0 disables the budget)
+            max_retries: Retries after a retryable error before giving up
+            base_delay: Base delay in seconds for exponential backoff
+            max_delay: Upper bound for a single backoff delay
+        """
+        self.max_in_flight = max_in_flight
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._limit = max_in_flight
+        self._successes = 0
+        self._in_flight = 0
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._queue: Deque[object] = deque()
+        self._cond: Optional[asyncio.Condition] = None
+        self._background: Set[asyncio.Task] = set()
+
+    @property
+    def queue_length(self) -> int:
+        """Number of calls waiting for a slot."""
+        return len(self._queue)
+
+    def _condition(self) -> asyncio.Condition:
+        """Create the condition lazily so it binds to the running event loop."""
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _take_tokens(self, tokens: int) -> float:
+        """Reserve tokens from the budget. Returns 0 on success or the seconds until enough have refilled."""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if not self.tokens_per_minute:
+            return 0.0
+
+        rate = self.tokens_per_minute / 60
+        self._tokens = min(self.tokens_per_minute, self._tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+
+        # A single request larger than the whole budget only has to wait for a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return 0.0
+        return (tokens - self._tokens) / rate
+
+    def _notify_queued(self, on_queued: Callable[[int], Awaitable[Any]], position: int) -> None:
+        """Tell a caller its queue position without holding up the queue."""
+        task = asyncio.create_task(on_queued(position))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _acquire(self, tokens: int, on_queued: Optional[Callable[[int], Awaitable[Any]]]) -> None:
+        """Wait in FIFO order for a free slot and enough token budget."""
+        cond = self._condition()
+        ticket = object()
+        async with cond:
+            self._queue.append(ticket)
+            announced = False
+            try:
+                while True:
+                    delay = None
+                    if self._queue[0] is ticket and self._in_flight < self._limit:
+                        delay = self._take_tokens(tokens)
+                        if delay == 0:
+                            break
+
+                    if on_queued is not None and not announced:
+                        announced = True
+                        position = self._queue.index(ticket) + 1
+                        metrics.increment("openai.queued")
+                        self._notify_queued(on_queued, position)
+
+                    metrics.set_gauge("openai.queue_length", len(self._queue))
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._queue.remove(ticket)
+                cond.notify_all()
+
+            self._in_flight += 1
+            metrics.set_gauge("openai.in_flight", self._in_flight)
+            metrics.set_gauge("openai.queue_length", len(self._queue))
+
+    async def _release(self, rate_limited: bool = False, pause: float = 0.0) -> None:
+        """Free a slot and adapt the concurrency limit."""
+        cond = self._condition()
+        async with cond:
+            self._in_flight -= 1
+            if rate_limited:
+                self._limit = max(1, self._limit // 2)
+                self._successes = 0
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+                logger.warning(f"OpenAI rate limit hit, in-flight limit lowered to {self._limit}")
+            else:
+                self._successes += 1
+                if self._limit < self.max_in_flight and self._successes >= self._limit:
+                    self._limit += 1
+                    self._successes = 0
+            metrics.set_gauge("openai.in_flight", self._in_flight)
+            cond.notify_all()
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        estimated_tokens: int = 1000,
+        on_queued: Optional[Callable[[int], Awaitable[Any]]] = None
+    ) -> Any:
+        """Run an API call under the limiter, retrying retryable errors.
+
+        Args:
+            call: Zero-argument coroutine function that performs the request
+            estimated_tokens: Expected prompt + completion tokens, charged against the budget
+            on_queued: Coroutine called with the caller's 1-based queue position if it has to wait
+        """
+        attempt = 0
+        while True:
+            await self._acquire(estimated_tokens, on_queued)
+            on_queued = None  # Only announce the position once per call
+
+            try:
+                result = await call()
+            except RETRYABLE_ERRORS as e:
+                rate_limited = isinstance(e, openai.RateLimitError)
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                await self._release(rate_limited=rate_limited, pause=delay if rate_limited else 0.0)
+
+                if attempt >= self.max_retries:
+                    metrics.increment("openai.failed")
+                    raise
+                attempt += 1
+                metrics.increment("openai.retries")
+                logger.warning(f"OpenAI call failed ({type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                await self._release()
+                raise
+
+            await self._release()
+
+            # Charge the budget for what the call actually used
+            usage = getattr(result, 'usage', None)
+            if self.tokens_per_minute and usage is not None and getattr(usage, 'total_tokens', None):
+                self._tokens -= usage.total_tokens - min(estimated_tokens, self.tokens_per_minute)
+            return result
+
+
+# Create a singleton instance shared by every OpenAI call in the process
+openai_limiter = RateLimiter(
+    max_in_flight=Config.OPENAI_MAX_IN_FLIGHT,
+    tokens_per_minute=Config.OPENAI_TOKENS_PER_MINUTE,
+    max_retries=Config.OPENAI_MAX_RETRIES
+)
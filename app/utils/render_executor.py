@@ -0,0 +1,162 @@
+"""
+Worker pool that keeps quotation rendering off the asyncio event loop.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional, Tuple
+
+from app.config import Config
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RenderQueueFullError(Exception):
+    """Raised when too many render jobs are already waiting for a worker."""
+
+
+def _timed_call(func: Callable, args: tuple, kwargs: dict) -> Tuple[Any, float, float]:
+    """Run func in the worker and report when it actually started and finished."""
+    started = time.time()
+    result = func(*args, **kwargs)
+    return result, started, time.time()
+
+
+def _warm_up_job(hold: float) -> Tuple[int, int]:
+    """Keep the worker busy briefly, so each warm-up job needs a worker of its own, and identify it."""
+    time.sleep(hold)
+    return os.getpid(), threading.get_ident()
+
+
+class RenderExecutor:
+    """Runs blocking render jobs in a thread or process pool with a bounded queue."""
+
+    def __init__(
+        self,
+        name: str = "render",
+        mode: str = "thread",
+        max_workers: int = 2,
+        max_queue: int = 32,
+        initializer: Optional[Callable] = None,
+        initargs: tuple = ()
+    ):
+        """Initialize the executor. The pool itself is created on first use.
+
+        Args:
+            name: Prefix for the metrics reported by this executor
+            mode: "thread" or "process"
+            max_workers: Number of pool workers
+            max_queue: Maximum number of jobs allowed to wait for a free worker
+            initializer: Optional callable run once in every worker when it starts
+            initargs: Arguments for the initializer
+        """
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown render pool mode: {mode}")
+
+        self.name = name
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.initializer = initializer
+        self.initargs = initargs
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        logger.info(f"RenderExecutor '{name}' configured: {mode} pool, {max_workers} workers, queue depth {max_queue}")
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs currently running or waiting."""
+        return self._pending
+
+    def start(self) -> None:
+        """Create the worker pool if it isn't running yet."""
+        if self._executor is not None:
+            return
+
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=self.initializer,
+                initargs=self.initargs
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=self.name,
+                initializer=self.initializer,
+                initargs=self.initargs
+            )
+        logger.info(f"Started {self.mode} pool for '{self.name}'")
+
+    def warm_up(self, timeout: Optional[float] = None, hold: float = 0.1) -> int:
+        """Start every worker now and wait until each has run its initializer.
+
+        Pools spawn workers lazily, one per job that finds no idle worker, so
+        one job per worker is submitted and each holds its worker for a moment.
+
+        Args:
+            timeout: Seconds to wait for the workers (no limit if None)
+            hold: Seconds each warm-up job keeps its worker busy
+
+        Returns:
+            The number of distinct workers that answered
+        """
+        self.start()
+        started = time.time()
+        futures = [self._executor.submit(_warm_up_job, hold) for _ in range(self.max_workers)]
+        done, not_done = wait(futures, timeout=timeout)
+        workers = {future.result() for future in done if future.exception() is None}
+        if not_done or len(workers) < self.max_workers:
+            logger.warning(f"Only {len(workers)} of {self.max_workers} workers for '{self.name}' are warm")
+        else:
+            logger.info(f"Warmed up {len(workers)} workers for '{self.name}' in {time.time() - started:.2f}s")
+        return len(workers)
+
+    async def submit(self, func: Callable, *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) in the pool and wait for the result.
+
+        Raises:
+            RenderQueueFullError: If the queue is already at its maximum depth
+        """
+        if self._pending >= self.max_workers + self.max_queue:
+            metrics.increment(f"{self.name}.rejected")
+            raise RenderQueueFullError(f"Render queue '{self.name}' is full ({self._pending} jobs pending)")
+
+        self.start()
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+        self._pending += 1
+        metrics.set_gauge(f"{self.name}.pending", self._pending)
+        try:
+            result, started, finished = await loop.run_in_executor(self._executor, _timed_call, func, args, kwargs)
+        finally:
+            self._pending -= 1
+            metrics.set_gauge(f"{self.name}.pending", self._pending)
+
+        queue_wait = max(started - submitted, 0.0)
+        render_time = finished - started
+        metrics.observe(f"{self.name}.queue_wait", queue_wait)
+        metrics.observe(f"{self.name}.render_time", render_time)
+        logger.info(f"{self.name}: {func.__name__} waited {queue_wait * 1000:.1f} ms, rendered in {render_time * 1000:.1f} ms")
+        return result
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the pool, optionally waiting for queued jobs to finish."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+            logger.info(f"Stopped {self.mode} pool for '{self.name}'")
+
+
+# Create a singleton instance for use throughout the application
+render_executor = RenderExecutor(
+    name="render",
+    mode=Config.RENDER_POOL_MODE,
+    max_workers=Config.RENDER_POOL_WORKERS,
+    max_queue=Config.RENDER_QUEUE_MAX
+)
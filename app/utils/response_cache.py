@@ -0,0 +1,137 @@
+"""
+LRU + TTL cache for OpenAI responses, with an optional SQLite tier on disk.
+
+The memory tier is read on the event loop; the disk tier is only touched
+on a memory miss or a write, and always from a worker thread so no chat
+waits on the disk.
+"""
+
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Content-hash keyed cache of JSON-serializable responses."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, disk_path: Optional[str] = None):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory (least recently used are evicted)
+            ttl_seconds: How long an entry stays valid
+            disk_path: SQLite file for the second-level cache (disabled if None)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # key -> (expiry, JSON value)
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()  # Held in worker threads only, never on the event loop
+        self._db: Optional[sqlite3.Connection] = None
+
+        if disk_path:
+            try:
+                self._db = sqlite3.connect(disk_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expiry REAL, value TEXT)"
+                )
+                self._db.execute("DELETE FROM responses WHERE expiry <= ?", (time.time(),))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Could not open response cache at {disk_path}, using memory only: {e}")
+                self._db = None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapse whitespace so resends that only differ in spacing share an entry."""
+        return " ".join(text.split())
+
+    @classmethod
+    def make_key(cls, model: str, kind: str, text: str) -> str:
+        """Build a cache key from the model, the kind of call and the normalized prompt input."""
+        payload = f"{model}\x00{kind}\x00{cls.normalize(text)}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return a fresh copy of the cached value, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._read_disk, key, now)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                metrics.increment("openai_cache.miss")
+                return None
+            self._store_in_memory(key, entry)
+            self.hits += 1
+        metrics.increment("openai_cache.hit")
+        # Callers mutate what they get back, so hand out a fresh copy
+        return json.loads(entry[1])
+
+    async def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable value."""
+        entry = (time.time() + self.ttl_seconds, json.dumps(value))
+        with self._lock:
+            self._store_in_memory(key, entry)
+        if self._db is not None:
+            await asyncio.to_thread(self._write_disk, key, entry)
+
+    def _read_disk(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        """Look a key up in the disk tier; runs in a worker thread."""
+        with self._db_lock:
+            try:
+                row = self._db.execute(
+                    "SELECT expiry, value FROM responses WHERE key = ? AND expiry > ?", (key, now)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Response cache read failed: {e}")
+                return None
+        return None if row is None else (row[0], row[1])
+
+    def _write_disk(self, key: str, entry: Tuple[float, str]) -> None:
+        """Write an entry to the disk tier; runs in a worker thread."""
+        with self._db_lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, expiry, value) VALUES (?, ?, ?)",
+                    (key, entry[0], entry[1])
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Response cache write failed: {e}")
+
+    def _store_in_memory(self, key: str, entry: Tuple[float, str]) -> None:
+        """Insert into the in-memory LRU, evicting the oldest entries past max_entries."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self._entries)
+        }
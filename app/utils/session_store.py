@@ -0,0 +1,398 @@
+"""
+Session storage for in-progress quotations, with idle expiry and bounded memory.
+
+Sessions are stored as JSON, so get() returns a copy: change it and set()
+it back. Two backends share the same async interface:
+
+- MemorySessionStore keeps sessions in process, evicting the least recently
+  used ones once max_entries or max_bytes is exceeded.
+- RedisSessionStore keeps them in Redis (or anything speaking RESP, such as
+  app.utils.fake_redis) with a per-key expiry, so several bot processes can
+  share them. Its memory cap is Redis' own maxmemory setting.
+
+An in-process store can be attached to durable storage (the bot's SQLite
+persistence) so drafts survive restarts.
+"""
+
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Protocol, Tuple
+from urllib.parse import urlparse
+
+from app.config import Config
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+EvictCallback = Optional[Callable[[Hashable], None]]
+
+
+class SessionBacking(Protocol):
+    """Durable storage an in-process store can write its sessions through to."""
+
+    def load_sessions(self) -> Dict[Hashable, Tuple[float, str]]:
+        """Return the saved sessions as key -> (wall-clock expiry, JSON value)."""
+
+    def save_session(self, key: Hashable, value: Optional[str], expiry: float) -> None:
+        """Save a session (None removes it); must not block."""
+
+
+class SessionStore:
+    """Interface shared by the session backends."""
+
+    def __init__(self, ttl_seconds: float, on_evict: EvictCallback = None):
+        """Initialize the store.
+
+        Args:
+            ttl_seconds: Idle time after which a session expires; reads and writes reset it
+            on_evict: Called with the key of every session that expired or was evicted
+        """
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def get(self, key: Hashable) -> Optional[Dict]:
+        """Return a copy of the session, or None if there is none."""
+        raise NotImplementedError
+
+    async def set(self, key: Hashable, value: Dict) -> None:
+        """Store the session and restart its expiry."""
+        raise NotImplementedError
+
+    async def delete(self, key: Hashable) -> None:
+        """Remove the session if it exists."""
+        raise NotImplementedError
+
+    async def sweep(self) -> List[Hashable]:
+        """Drop expired sessions and return their keys."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """Release the backend's resources."""
+        self.stop_sweeper()
+
+    def attach(self, backing: SessionBacking) -> None:
+        """Keep sessions in backing so they survive restarts (a no-op for stores that already do)."""
+
+    def _evicted(self, key: Hashable, reason: str) -> None:
+        """Count an eviction and tell the owner about it."""
+        metrics.increment(f"sessions.evicted.{reason}")
+        if self.on_evict is not None:
+            try:
+                self.on_evict(key)
+            except Exception as e:
+                logger.error(f"Session eviction callback failed for {key}: {str(e)}")
+
+    def start_sweeper(self, interval: Optional[float] = None) -> None:
+        """Start a background task that sweeps expired sessions every interval seconds."""
+        if self._sweeper is not None and not self._sweeper.done():
+            return
+        interval = Config.SESSION_SWEEP_INTERVAL if interval is None else interval
+        self._sweeper = asyncio.create_task(self._sweep_loop(interval))
+
+    def stop_sweeper(self) -> None:
+        """Stop the background sweep task."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    async def _sweep_loop(self, interval: float) -> None:
+        """Sweep periodically until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                expired = await self.sweep()
+                if expired:
+                    logger.info(f"Expired {len(expired)} idle sessions")
+            except Exception as e:
+                logger.error(f"Session sweep failed: {str(e)}")
+
+
+class MemorySessionStore(SessionStore):
+    """In-process sessions with idle expiry and LRU eviction by count and size."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = 86400,
+        max_entries: int = 10000,
+        max_bytes: int = 50 * 1024 * 1024,
+        on_evict: EvictCallback = None
+    ):
+        """Initialize the store.
+
+        Args:
+            ttl_seconds: Idle time after which a session expires
+            max_entries: Maximum number of sessions kept (least recently used are evicted)
+            max_bytes: Maximum total size of the stored JSON (0 for no limit)
+            on_evict: Called with the key of every session that expired or was evicted
+        """
+        super().__init__(ttl_seconds, on_evict)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, str]]" = OrderedDict()  # key -> (expiry, JSON value)
+        self._backing: Optional[SessionBacking] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def attach(self, backing: SessionBacking) -> None:
+        """Load the sessions saved in backing and write every later change through to it."""
+        offset = time.monotonic() - time.time()
+        for key, (expiry, value) in backing.load_sessions().items():
+            self._entries[key] = (expiry + offset, value)
+            self.size_bytes += len(value)
+        self._backing = backing
+        metrics.set_gauge("sessions.live", len(self._entries))
+        logger.info(f"Restored {len(self._entries)} sessions")
+
+    async def get(self, key: Hashable) -> Optional[Dict]:
+        """Return a copy of the session, or None if there is none."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expiry, value = entry
+        if expiry <= time.monotonic():
+            self._remove(key)
+            self._evicted(key, 'expired')
+            return None
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        return json.loads(value)
+
+    async def set(self, key: Hashable, value: Dict) -> None:
+        """Store the session and restart its expiry."""
+        encoded = json.dumps(value, default=str)
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, encoded)
+        self.size_bytes += len(encoded)
+        if self._backing is not None:
+            self._backing.save_session(key, encoded, time.time() + self.ttl_seconds)
+
+        while len(self._entries) > self.max_entries or (self.max_bytes and self.size_bytes > self.max_bytes and len(self._entries) > 1):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evicted(oldest, 'lru')
+        metrics.set_gauge("sessions.live", len(self._entries))
+        metrics.set_gauge("sessions.bytes", self.size_bytes)
+
+    async def delete(self, key: Hashable) -> None:
+        """Remove the session if it exists."""
+        self._remove(key)
+        metrics.set_gauge("sessions.live", len(self._entries))
+
+    async def sweep(self) -> List[Hashable]:
+        """Drop expired sessions and return their keys."""
+        now = time.monotonic()
+        # Expiry is not ordered by position (reads refresh it), so check every entry
+        expired = [key for key, (expiry, _) in self._entries.items() if expiry <= now]
+        for key in expired:
+            self._remove(key)
+            self._evicted(key, 'expired')
+        metrics.set_gauge("sessions.live", len(self._entries))
+        metrics.set_gauge("sessions.bytes", self.size_bytes)
+        return expired
+
+    def _remove(self, key: Hashable) -> None:
+        """Forget a session and its size."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= len(entry[1])
+            if self._backing is not None:
+                self._backing.save_session(key, None, 0)
+
+
+class RedisError(Exception):
+    """Error reply from the Redis server."""
+
+
+class RedisClient:
+    """Minimal asyncio client for the Redis protocol (RESP2) over one connection."""
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", timeout: float = 5.0):
+        """Initialize the client; it connects on first use.
+
+        Args:
+            url: redis://[:password@]host[:port][/db]
+            timeout: Seconds to wait for connecting and for each reply
+        """
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def execute(self, *args: Any) -> Any:
+        """Send one command and return its decoded reply.
+
+        A broken connection is reopened once before the error is raised.
+        """
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._writer is None:
+                        await self._connect()
+                    return await asyncio.wait_for(self._roundtrip(args), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                    await self._disconnect()
+                    if attempt:
+                        raise ConnectionError(f"Redis at {self.host}:{self.port} is unavailable: {e!r}") from e
+
+    async def _connect(self) -> None:
+        """Open the connection, authenticate and select the database."""
+        self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        if self.password:
+            await self._roundtrip(("AUTH", self.password))
+        if self.db:
+            await self._roundtrip(("SELECT", self.db))
+
+    async def _disconnect(self) -> None:
+        """Close the connection, ignoring errors."""
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self._reader = self._writer = None
+
+    async def _roundtrip(self, args: Tuple) -> Any:
+        """Write a command and read its reply."""
+        self._writer.write(encode_command(*args))
+        await self._writer.drain()
+        return await read_reply(self._reader)
+
+    async def close(self) -> None:
+        """Close the connection."""
+        async with self._lock:
+            await self._disconnect()
+
+
+def encode_command(*args: Any) -> bytes:
+    """Encode a command as a RESP array of bulk strings."""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """Read one RESP reply; error replies raise RedisError."""
+    line = await reader.readuntil(b"\r\n")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode('utf-8')
+    if kind == b"-":
+        raise RedisError(payload.decode('utf-8'))
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Unexpected Redis reply: {line!r}")
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions stored in Redis with a per-key expiry.
+
+    Redis expires keys on its own, so the store remembers when the sessions
+    it wrote are due and reports them from sweep() once they are gone, which
+    lets the bot drop its local per-user state too.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://127.0.0.1:6379/0",
+        ttl_seconds: float = 86400,
+        prefix: str = "quotation:session:",
+        on_evict: EvictCallback = None,
+        client: Optional[RedisClient] = None
+    ):
+        """Initialize the store.
+
+        Args:
+            url: Redis server URL
+            ttl_seconds: Idle time after which a session expires
+            prefix: Prefix of the Redis keys
+            on_evict: Called with the key of every session that expired or was evicted
+            client: Client to use (one connected to url if None)
+        """
+        super().__init__(ttl_seconds, on_evict)
+        self.prefix = prefix
+        self.client = client or RedisClient(url)
+        self._deadlines: Dict[Hashable, float] = {}  # key -> when this process expects it to expire
+
+    def _redis_key(self, key: Hashable) -> str:
+        return f"{self.prefix}{key}"
+
+    @property
+    def _ttl_ms(self) -> int:
+        return max(1, int(self.ttl_seconds * 1000))
+
+    async def get(self, key: Hashable) -> Optional[Dict]:
+        """Return a copy of the session, or None if there is none."""
+        value = await self.client.execute("GETEX", self._redis_key(key), "PX", self._ttl_ms)
+        if value is None:
+            return None
+        self._deadlines[key] = time.monotonic() + self.ttl_seconds
+        return json.loads(value)
+
+    async def set(self, key: Hashable, value: Dict) -> None:
+        """Store the session and restart its expiry."""
+        await self.client.execute("SET", self._redis_key(key), json.dumps(value, default=str), "PX", self._ttl_ms)
+        self._deadlines[key] = time.monotonic() + self.ttl_seconds
+        metrics.set_gauge("sessions.live", len(self._deadlines))
+
+    async def delete(self, key: Hashable) -> None:
+        """Remove the session if it exists."""
+        await self.client.execute("DEL", self._redis_key(key))
+        self._deadlines.pop(key, None)
+        metrics.set_gauge("sessions.live", len(self._deadlines))
+
+    async def sweep(self) -> List[Hashable]:
+        """Report sessions that Redis has expired (or evicted) since they were last used here."""
+        now = time.monotonic()
+        due = [key for key, deadline in self._deadlines.items() if deadline <= now]
+        expired = []
+        for key in due:
+            if await self.client.execute("EXISTS", self._redis_key(key)):
+                # Another process kept it alive
+                self._deadlines[key] = now + self.ttl_seconds
+                continue
+            del self._deadlines[key]
+            expired.append(key)
+            self._evicted(key, 'expired')
+        metrics.set_gauge("sessions.live", len(self._deadlines))
+        return expired
+
+    async def close(self) -> None:
+        """Stop sweeping and close the connection."""
+        await super().close()
+        await self.client.close()
+
+
+def create_session_store(on_evict: EvictCallback = None) -> SessionStore:
+    """Build the session store selected by SESSION_BACKEND."""
+    if Config.SESSION_BACKEND == 'redis':
+        return RedisSessionStore(Config.SESSION_REDIS_URL, ttl_seconds=Config.SESSION_TTL, on_evict=on_evict)
+    return MemorySessionStore(
+        ttl_seconds=Config.SESSION_TTL,
+        max_entries=Config.SESSION_MAX_ENTRIES,
+        max_bytes=Config.SESSION_MAX_BYTES,
+        on_evict=on_evict
+    )
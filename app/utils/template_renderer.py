@@ -0,0 +1,116 @@
+"""
+Process-wide cache of compiled Jinja2 templates.
+"""
+
+import os
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import jinja2
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = Path(__file__).parent.parent / 'templates'
+
+
+class TemplateRenderer:
+    """Keeps a single template compiled in memory and reloads it only when the file changes."""
+
+    def __init__(
+        self,
+        template_name: str,
+        templates_dir: Path = TEMPLATES_DIR,
+        filters: Optional[Dict[str, Callable]] = None,
+        bytecode_cache_dir: Optional[str] = None,
+        autoescape: bool = True
+    ):
+        """Initialize the renderer.
+
+        Args:
+            template_name: Name of the template file inside templates_dir
+            templates_dir: Directory containing the template
+            filters: Extra Jinja2 filters to register on the environment
+            bytecode_cache_dir: Directory for the on-disk Jinja2 bytecode cache (disabled if None)
+            autoescape: Whether to autoescape HTML/XML output
+        """
+        self.template_name = template_name
+        self.template_path = Path(templates_dir) / template_name
+        self._lock = threading.Lock()
+        self._template: Optional[jinja2.Template] = None
+        self._mtime: Optional[float] = None
+
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_cache_dir)
+
+        self.env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(str(templates_dir)),
+            autoescape=jinja2.select_autoescape(['html', 'xml']) if autoescape else False,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            bytecode_cache=bytecode_cache,
+            # Staleness is tracked here via the file mtime, so skip Jinja's own per-lookup check
+            auto_reload=False
+        )
+        if filters:
+            self.env.filters.update(filters)
+
+    def load(self) -> jinja2.Template:
+        """Compile the template now if it is missing or the file has changed on disk."""
+        mtime = os.stat(self.template_path).st_mtime
+        template = self._template
+        if template is not None and mtime == self._mtime:
+            return template
+
+        with self._lock:
+            # Another thread may have reloaded it while we were waiting
+            if self._template is not None and mtime == self._mtime:
+                return self._template
+
+            if self._template is not None:
+                logger.info(f"Template {self.template_name} changed on disk, recompiling")
+                self.env.cache.clear()
+            self._template = self.env.get_template(self.template_name)
+            self._mtime = mtime
+            logger.info(f"Compiled template {self.template_name}")
+            return self._template
+
+    def render(self, **context) -> str:
+        """Render the template with the given context."""
+        return self.load().render(**context)
+
+
+def format_currency(amount: float) -> str:
+    """Format currency values with 2 decimal places."""
+    if isinstance(amount, str):
+        try:
+            amount = float(amount)
+        except (ValueError, TypeError):
+            amount = 0.0
+    return f"${amount:.2f}"
+
+
+def format_quantity(quantity: float) -> str:
+    """Show whole quantities without a trailing .0."""
+    if isinstance(quantity, float) and quantity.is_integer():
+        return str(int(quantity))
+    return str(quantity)
+
+
+# Create singleton instances for use throughout the application
+quotation_renderer = TemplateRenderer(
+    'quotation_template.html',
+    filters={'format_currency': format_currency},
+    bytecode_cache_dir=Config.TEMPLATE_CACHE_DIR or None
+)
+summary_renderer = TemplateRenderer(
+    'quotation_summary.txt',
+    filters={'format_currency': format_currency, 'quantity': format_quantity},
+    bytecode_cache_dir=Config.TEMPLATE_CACHE_DIR or None,
+    autoescape=False
+)
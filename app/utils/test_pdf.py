@@ -11,8 +11,8 @@ import os
 import sys
 from pathlib import Path
 from datetime import datetime
-import jinja2
 from app.utils.models import QuotationData, QuotationItem
+from app.utils.template_renderer import quotation_renderer, format_currency
 from app.config import Config
 
 # Add the project root to the Python path if running this script directly
@@ -25,15 +25,6 @@ if __name__ == "__main__":
 TEMP_DIR = Path(Config.STORAGE_PATH)
 TEMPLATES_DIR = Path(__file__).parent.parent / 'templates'
 
-def format_currency(amount: float) -> str:
-    """Format currency values with 2 decimal places."""
-    if isinstance(amount, str):
-        try:
-            amount = float(amount)
-        except (ValueError, TypeError):
-            amount = 0.0
-    return f"${amount:.2f}"
-
 def create_sample_quotation() -> QuotationData:
     """Create a sample quotation for testing."""
     items = [
@@ -84,21 +75,8 @@ def generate_quotation_html(quotation: QuotationData) -> str:
     discount = float(quotation.discount)
     grand_total = float(quotation.grand_total)
     
-    # Set up Jinja2 environment with autoescape enabled for security
-    template_dir = Path(__file__).parent.parent / 'templates'
-    env = jinja2.Environment(
-        loader=jinja2.FileSystemLoader(str(template_dir)),
-        autoescape=jinja2.select_autoescape(['html', 'xml']),
-        trim_blocks=True,
-        lstrip_blocks=True
-    )
-    env.filters['format_currency'] = format_currency
-
-    # Get the template
-    template = env.get_template('quotation_template.html')
-
-    # Render the template with escaped variables
-    html = template.render(
+    # Render with the shared compiled template (autoescape is enabled for security)
+    html = quotation_renderer.render(
         env=Config.get_company_info(),
         quotation_number=quotation.quotation_number,
         quotation_date=quotation.formatted_created_date,
@@ -5,7 +5,7 @@ setup(
     version="1.0.0",
     packages=find_packages(),
     install_requires=[
-        "python-telegram-bot>=20.6",
+        "python-telegram-bot==20.6",
         "python-dotenv>=1.0.0",
         "jinja2>=3.1.2",
         "weasyprint>=60.1;platform_system!='Windows'",
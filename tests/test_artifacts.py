@@ -0,0 +1,47 @@
+"""
+Tests for collision-free quotation artifact paths.
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.artifacts import safe_filename, store_artifact, unique_artifact_name, write_artifact
+
+
+def test_unique_names_keep_display_name_and_extension():
+    first = unique_artifact_name("Testing_Sdn_Bhd_Quotation_2024-05-01.html")
+    second = unique_artifact_name("Testing_Sdn_Bhd_Quotation_2024-05-01.html")
+
+    assert first != second
+    assert first.startswith("Testing_Sdn_Bhd_Quotation_2024-05-01_")
+    assert first.endswith(".html")
+
+
+def test_safe_filename_strips_path_separators():
+    assert safe_filename("Acme / Sons Sdn Bhd") == "Acme_Sons_Sdn_Bhd"
+    assert "/" not in safe_filename("../../etc/passwd")
+
+
+def test_concurrent_renders_never_clobber(tmp_path):
+    def render(i):
+        return store_artifact(tmp_path, "Testing_Sdn_Bhd_Quotation_2024-05-01.html", f"quote {i}".encode())
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        paths = list(pool.map(render, range(50)))
+
+    assert len(set(paths)) == 50
+    assert sorted(p.read_text() for p in paths) == sorted(f"quote {i}" for i in range(50))
+    # No staging files are left behind
+    assert len(list(tmp_path.iterdir())) == 50
+
+
+def test_write_artifact_replaces_atomically(tmp_path):
+    write_artifact(tmp_path, "quote.html", b"old")
+    path = write_artifact(tmp_path, "quote.html", b"new")
+
+    assert path.read_bytes() == b"new"
+    assert [p.name for p in tmp_path.iterdir()] == ["quote.html"]
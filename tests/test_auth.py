@@ -0,0 +1,146 @@
+"""
+Tests for the access check that runs before every handler.
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from telegram import Chat
+
+from app.bot import create_application
+from app.bot.auth import DENIED_MESSAGE, AccessControl, access_control
+from app.config import Config
+from app.utils.load_test import FakeBotRequest, UpdateFactory
+
+ADMIN, STRANGER, GROUP = 1001, 2002, -3003
+
+
+def test_decisions_follow_allow_lists_and_are_cached(monkeypatch):
+    monkeypatch.setattr(Config, "PUBLIC_MODE", False)
+    monkeypatch.setattr(Config, "ALLOWED_USER_IDS", [ADMIN])
+    monkeypatch.setattr(Config, "ALLOWED_GROUP_IDS", [GROUP])
+    access_control.invalidate()
+
+    assert access_control.is_allowed(ADMIN, ADMIN, Chat.PRIVATE)
+    assert not access_control.is_allowed(STRANGER, STRANGER, Chat.PRIVATE)
+    assert access_control.is_allowed(STRANGER, GROUP, Chat.SUPERGROUP)
+    assert not access_control.is_allowed(ADMIN, -1, Chat.GROUP)
+
+    # Cached until invalidated
+    monkeypatch.setattr(Config, "ALLOWED_USER_IDS", [ADMIN, STRANGER])
+    assert not access_control.is_allowed(STRANGER, STRANGER, Chat.PRIVATE)
+    access_control.invalidate()
+    assert access_control.is_allowed(STRANGER, STRANGER, Chat.PRIVATE)
+
+    # A mode change made directly on Config is noticed as well
+    monkeypatch.setattr(Config, "PUBLIC_MODE", True)
+    assert access_control.is_allowed(STRANGER, -1, Chat.GROUP)
+
+
+def test_unauthorized_updates_stop_before_the_handlers(monkeypatch):
+    monkeypatch.setattr(Config, "PUBLIC_MODE", False)
+    monkeypatch.setattr(Config, "PERSISTENCE_PATH", "")
+    monkeypatch.setattr(Config, "ALLOWED_USER_IDS", [ADMIN])
+    monkeypatch.setattr(Config, "ALLOWED_GROUP_IDS", [])
+    access_control.invalidate()
+
+    async def scenario():
+        bot_request = FakeBotRequest()
+        application = create_application(request=bot_request, token="123456:auth-test")
+        await application.initialize()
+        factory = UpdateFactory(application.bot)
+        replies = []
+        for user_id, kind, payload in [
+            (STRANGER, "command", "/newquote"),
+            (ADMIN, "command", "/newquote"),
+            (STRANGER, "command", "/setpublic"),
+            (ADMIN, "command", "/setpublic"),
+            (STRANGER, "command", "/start"),
+        ]:
+            await application.process_update(factory.build(user_id, kind, payload))
+            replies.append(bot_request.last_text.get(user_id))
+        await application.shutdown()
+        return replies
+
+    try:
+        replies = asyncio.run(scenario())
+    finally:
+        access_control.invalidate()
+
+    assert replies[0] == DENIED_MESSAGE
+    assert replies[1] != DENIED_MESSAGE
+    assert replies[2] == DENIED_MESSAGE
+    assert "PUBLIC" in replies[3]
+    assert replies[4] != DENIED_MESSAGE
+
+
+def test_runtime_changes_are_saved_and_applied_at_startup(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "PUBLIC_MODE", False)
+    monkeypatch.setattr(Config, "ALLOWED_USER_IDS", [ADMIN, 4004])
+    monkeypatch.setattr(Config, "ALLOWED_GROUP_IDS", [])
+    path = str(tmp_path / "access_list.json")
+    control = AccessControl(path)
+
+    assert control.grant("users", STRANGER)
+    assert not control.grant("users", STRANGER)
+    assert control.grant("groups", GROUP)
+    assert control.revoke("users", 4004)
+
+    restarted = AccessControl(path)
+    assert restarted.allowed_users == {ADMIN, STRANGER}
+    assert restarted.allowed_groups == {GROUP}
+    # Users added at runtime can use the bot but not administer it
+    assert restarted.admins == {ADMIN}
+    assert restarted.is_allowed(STRANGER, STRANGER, Chat.PRIVATE)
+    assert not restarted.is_allowed(4004, 4004, Chat.PRIVATE)
+
+    assert restarted.grant("users", 4004)
+    assert AccessControl(path).admins == {ADMIN, 4004}
+
+
+def test_admins_manage_access_with_commands(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "PUBLIC_MODE", False)
+    monkeypatch.setattr(Config, "PERSISTENCE_PATH", "")
+    monkeypatch.setattr(Config, "ALLOWED_USER_IDS", [ADMIN])
+    monkeypatch.setattr(Config, "ALLOWED_GROUP_IDS", [])
+    monkeypatch.setattr(access_control, "path", str(tmp_path / "access_list.json"))
+    access_control.load()
+
+    async def scenario():
+        bot_request = FakeBotRequest()
+        application = create_application(request=bot_request, token="123456:acl-test")
+        await application.initialize()
+        factory = UpdateFactory(application.bot)
+        replies = []
+        for user_id, payload in [
+            (STRANGER, "/newquote"),
+            (ADMIN, f"/allowuser {STRANGER}"),
+            (STRANGER, "/newquote"),
+            (STRANGER, "/allowuser 5005"),
+            (ADMIN, f"/removeuser {STRANGER}"),
+            (STRANGER, "/start"),
+        ]:
+            await application.process_update(factory.build(user_id, "command", payload))
+            replies.append(bot_request.last_text.get(user_id))
+        await application.shutdown()
+        return replies
+
+    try:
+        replies = asyncio.run(scenario())
+    finally:
+        monkeypatch.undo()
+        access_control.load()
+
+    assert replies[0] == DENIED_MESSAGE
+    assert str(STRANGER) in replies[1]
+    assert replies[2] != DENIED_MESSAGE
+    assert "only authorized administrators" in replies[3]
+    assert str(STRANGER) in replies[4]
+    assert replies[5] == DENIED_MESSAGE
+    assert (tmp_path / "access_list.json").exists()
@@ -0,0 +1,88 @@
+"""
+Tests for delta extraction and the deterministic patch merge.
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.config import Config
+from app.utils.gpt_quotation import GPTQuotationParser, merge_quotation_patch
+
+CURRENT = {
+    "customer_name": "Tan Ah Kow",
+    "customer_company": "Testing Sdn Bhd",
+    "items": [{"name": "Table", "quantity": 5, "unit_price": 1000}],
+}
+
+
+def test_patch_overrides_fields_and_ignores_empty_values():
+    merged = merge_quotation_patch(CURRENT, {"customer_name": "Ah Kow", "customer_company": "", "terms": None})
+
+    assert merged["customer_name"] == "Ah Kow"
+    assert merged["customer_company"] == "Testing Sdn Bhd"
+    assert "terms" not in merged
+    assert CURRENT["customer_name"] == "Tan Ah Kow"
+
+
+def test_items_are_added_or_updated_by_name():
+    merged = merge_quotation_patch(CURRENT, {"items": [
+        {"name": "table", "quantity": 8, "unit_price": 1000},
+        {"name": "Chair", "quantity": 10, "unit_price": 250},
+    ]})
+
+    assert merged["items"] == [
+        {"name": "Table", "quantity": 8, "unit_price": 1000},
+        {"name": "Chair", "quantity": 10, "unit_price": 250},
+    ]
+    assert CURRENT["items"][0]["quantity"] == 5
+
+
+def test_items_replace_mode():
+    merged = merge_quotation_patch(
+        CURRENT, {"items": [{"name": "Desk", "quantity": 1, "unit_price": 300}]}, items_mode="replace"
+    )
+
+    assert merged["items"] == [{"name": "Desk", "quantity": 1, "unit_price": 300}]
+
+
+def test_fully_matched_message_skips_the_model():
+    parser = GPTQuotationParser()
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("the model should not be called")
+
+    parser._create_completion = fail
+    merged, missing = asyncio.run(parser.extract_quotation_delta(
+        "0123456789\nhijef@gmail.com\nTerms: 30 days", CURRENT
+    ))
+
+    assert merged["customer_phone"] == "0123456789"
+    assert merged["customer_email"] == "hijef@gmail.com"
+    assert merged["terms"] == "30 days"
+    assert missing == ["customer_address"]
+
+
+def test_failed_extraction_is_raised_not_returned_as_unchanged(monkeypatch):
+    monkeypatch.setattr(Config, "PRE_EXTRACT", True)
+    parser = GPTQuotationParser()
+    calls = []
+
+    async def failing_tool(*args, **kwargs):
+        calls.append(args)
+        raise ValueError("tool call failed validation")
+
+    monkeypatch.setattr(parser, "_call_extraction_tool", failing_tool)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            asyncio.run(parser.extract_quotation_delta("Please deliver to the Penang branch instead", CURRENT))
+
+    # The failure was not cached, so the retry called the model again
+    assert len(calls) == 2
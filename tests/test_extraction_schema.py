@@ -0,0 +1,85 @@
+"""
+Tests for the extraction tool schema and one-pass reply validation.
+"""
+
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import pytest
+
+from app.utils.extraction_schema import extraction_tool, parse_extraction
+from app.utils.gpt_quotation import GPTQuotationParser
+from app.utils.model_router import ModelRouter
+
+
+def test_tool_schema_is_limited_to_requested_fields():
+    tool = extraction_tool(["customer_phone", "items"])
+    parameters = tool["function"]["parameters"]
+
+    assert set(parameters["properties"]["data"]["properties"]) == {"customer_phone", "items"}
+    assert "items_mode" not in parameters["properties"]
+    assert "$defs" not in json.dumps(parameters)
+    item = parameters["properties"]["data"]["properties"]["items"]["items"]
+    assert item["properties"]["unit_price"] == {"type": "number"}
+
+
+def test_reply_values_are_coerced():
+    data, missing, items_mode = parse_extraction(json.dumps({
+        "data": {
+            "customer_phone": 1066907222,
+            "items": [{"name": "Table", "quantity": "5 units", "unit_price": "RM 1,000"}],
+            "discount": "none"
+        },
+        "missing_fields": ["terms"]
+    }))
+
+    assert data == {
+        "customer_phone": "1066907222",
+        "items": [{"name": "Table", "quantity": 5.0, "unit_price": 1000.0}]
+    }
+    assert missing == ["terms"]
+    assert items_mode is None
+
+
+def test_invalid_fields_are_dropped_and_reported():
+    data, missing, items_mode = parse_extraction(json.dumps({
+        "data": {"customer_name": "Tan Ah Kow", "items": "a table", "customer_email": ["a@b.com"]},
+        "items_mode": "sometimes"
+    }))
+
+    assert data == {"customer_name": "Tan Ah Kow"}
+    assert missing == ["customer_email", "items"]
+    assert items_mode is None
+
+
+def test_non_json_reply_raises():
+    with pytest.raises(ValueError):
+        parse_extraction("not json")
+
+
+def test_extraction_uses_the_tool_call(monkeypatch):
+    parser = GPTQuotationParser()
+    parser.router = ModelRouter(strong_model=None)
+    calls = []
+
+    async def fake_completion(messages, max_output_tokens, on_queued=None, **kwargs):
+        calls.append(kwargs)
+        arguments = json.dumps({"data": {"customer_name": "Tan Ah Kow", "terms": "COD"}, "missing_fields": []})
+        tool_call = SimpleNamespace(function=SimpleNamespace(arguments=arguments))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=[tool_call]))])
+
+    monkeypatch.setattr(parser, "_create_completion", fake_completion)
+    data, missing = asyncio.run(parser.extract_quotation_data("Please quote Tan Ah Kow, cash on delivery"))
+
+    assert calls[0]["tool_choice"]["function"]["name"] == "record_quotation"
+    assert data["customer_name"] == "Tan Ah Kow"
+    assert data["terms"] == "COD"
+    assert "customer_phone" in missing
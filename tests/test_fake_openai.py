@@ -0,0 +1,85 @@
+"""
+Tests for OpenAI call recording and the local replay server.
+"""
+
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.utils.fake_openai import FakeOpenAIServer
+from app.utils.gpt_quotation import GPTQuotationParser
+from app.utils.model_router import ModelRouter
+from app.utils.openai_replay import RecordingTransport
+from app.utils.rate_limiter import RateLimiter
+
+TEXT = "Please quote Tan Ah Kow of Testing Sdn Bhd, cash on delivery"
+
+
+def make_parser(base_url, record_path=None):
+    parser = GPTQuotationParser()
+    http_client = httpx.AsyncClient(transport=RecordingTransport(record_path)) if record_path else None
+    parser.client = AsyncOpenAI(api_key="test", base_url=base_url, max_retries=0, http_client=http_client)
+    parser.router = ModelRouter(strong_model=None)
+    parser.limiter = RateLimiter(max_in_flight=4, tokens_per_minute=0, max_retries=8, base_delay=0.01)
+    return parser
+
+
+def test_record_then_replay(tmp_path):
+    record_path = str(tmp_path / "recordings.jsonl")
+
+    async def scenario():
+        # Record against a server that only has synthetic replies
+        source = FakeOpenAIServer()
+        await source.start()
+        await make_parser(source.base_url, record_path).extract_quotation_data(TEXT)
+        await source.stop()
+
+        # Edit the recording so the replay is distinguishable from a synthetic reply
+        entry = json.loads(open(record_path).readline())
+        completion = json.loads(entry["body"])
+        arguments = {"data": {"customer_name": "Tan Ah Kow", "terms": "COD"}, "missing_fields": []}
+        completion["choices"][0]["message"]["tool_calls"][0]["function"]["arguments"] = json.dumps(arguments)
+        entry["body"] = json.dumps(completion)
+        with open(record_path, "w") as f:
+            f.write(json.dumps(entry) + "\n")
+
+        replay = FakeOpenAIServer(recordings_path=record_path)
+        await replay.start()
+        plain = await make_parser(replay.base_url).extract_quotation_data(TEXT)
+        streamed = await make_parser(replay.base_url).extract_quotation_data(TEXT, on_progress=lambda fields: None)
+        await replay.stop()
+        return entry, plain, streamed, replay.stats
+
+    entry, plain, streamed, stats = asyncio.run(scenario())
+
+    assert entry["status"] == 200
+    assert entry["request"]["tool_choice"]["function"]["name"] == "record_quotation"
+    assert plain[0]["terms"] == "COD"
+    assert streamed[0]["terms"] == "COD"
+    assert stats["replayed"] == 2
+
+
+def test_injected_rate_limits_are_retried():
+    async def scenario():
+        server = FakeOpenAIServer(rate_limit_rate=0.3, retry_after=0.01, seed=1)
+        await server.start()
+        parser = make_parser(server.base_url)
+        results = await asyncio.gather(*(
+            parser.extract_quotation_data(f"{TEXT} #{i}") for i in range(8)
+        ))
+        await server.stop()
+        return results, server.stats
+
+    results, stats = asyncio.run(scenario())
+
+    assert stats["rate_limited"] > 0
+    assert all(not any(field.startswith("Error") for field in missing) for _, missing in results)
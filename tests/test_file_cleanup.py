@@ -0,0 +1,138 @@
+"""
+Tests for the heap-based file cleanup scheduler.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.file_cleanup import FileCleanupManager
+
+
+def _touch(tmp_path, name):
+    path = tmp_path / name
+    path.write_text("quote")
+    return str(path)
+
+
+def test_files_removed_in_deadline_order(tmp_path):
+    manager = FileCleanupManager(cleanup_time_seconds=60)
+    slow = _touch(tmp_path, "slow.html")
+    fast = _touch(tmp_path, "fast.html")
+
+    async def run():
+        manager.add_file(slow, 0.3)
+        manager.add_file(fast, 0.05)
+        await asyncio.sleep(0.15)
+        assert not Path(fast).exists()
+        assert Path(slow).exists()
+        await asyncio.sleep(0.3)
+        assert not Path(slow).exists()
+        assert not manager.running
+
+    asyncio.run(run())
+
+
+def test_earlier_deadline_wakes_sleeping_timer(tmp_path):
+    manager = FileCleanupManager(cleanup_time_seconds=60)
+    long_lived = _touch(tmp_path, "long.html")
+    short_lived = _touch(tmp_path, "short.html")
+
+    async def run():
+        manager.add_file(long_lived)
+        await asyncio.sleep(0.01)
+        manager.add_file(short_lived, 0.05)
+        await asyncio.sleep(0.2)
+        assert not Path(short_lived).exists()
+        assert Path(long_lived).exists()
+        manager.stop_cleanup_task()
+
+    asyncio.run(run())
+
+
+def test_rescheduled_and_removed_files(tmp_path):
+    manager = FileCleanupManager(cleanup_time_seconds=60)
+    rescheduled = _touch(tmp_path, "rescheduled.html")
+    removed = _touch(tmp_path, "removed.html")
+
+    async def run():
+        manager.add_file(rescheduled, 0.05)
+        manager.add_file(removed, 0.05)
+        manager.add_file(rescheduled, 60)
+        manager.remove_file(removed)
+        await asyncio.sleep(0.15)
+        assert Path(rescheduled).exists()
+        assert Path(removed).exists()
+        assert list(manager.files_to_cleanup) == [rescheduled]
+        manager.stop_cleanup_task()
+
+    asyncio.run(run())
+
+
+def test_many_pending_files(tmp_path):
+    manager = FileCleanupManager(cleanup_time_seconds=60)
+    paths = [_touch(tmp_path, f"quote_{i}.html") for i in range(2000)]
+
+    async def run():
+        for i, path in enumerate(paths):
+            manager.add_file(path, 0.05 if i % 2 else 60)
+        await asyncio.sleep(0.2)
+        assert len(manager.files_to_cleanup) == 1000
+        manager.stop_cleanup_task()
+
+    asyncio.run(run())
+    assert sum(Path(p).exists() for p in paths) == 1000
+
+
+def test_journal_replayed_after_restart(tmp_path):
+    journal = str(tmp_path / ".cleanup_journal")
+    pending = _touch(tmp_path, "pending.html")
+    finished = _touch(tmp_path, "finished.html")
+
+    async def first_run():
+        manager = FileCleanupManager(cleanup_time_seconds=60, journal_path=journal)
+        manager.add_file(pending, 0.1)
+        manager.add_file(finished, 60)
+        manager.remove_file(finished)
+        # Simulate a crash: the task dies with the process
+        manager.stop_cleanup_task()
+
+    async def second_run():
+        manager = FileCleanupManager(cleanup_time_seconds=60, journal_path=journal)
+        manager.restore()
+        assert list(manager.files_to_cleanup) == [pending]
+        await asyncio.sleep(0.25)
+        assert not Path(pending).exists()
+
+    asyncio.run(first_run())
+    asyncio.run(second_run())
+    assert Path(finished).exists()
+
+
+def test_restore_sweeps_orphaned_files(tmp_path):
+    import os
+    import time
+
+    stale = _touch(tmp_path, "Acme_Quotation_2024-05-01_153012_9f1c2ab4d0e3.html")
+    old = time.time() - 3600
+    os.utime(stale, (old, old))
+    fresh = _touch(tmp_path, "Acme_Quotation_2024-05-02_101500_0123456789ab.pdf")
+    staging = _touch(tmp_path, ".fresh.html.abc123.tmp")
+    # Not written by the bot, so left alone however old it is
+    foreign = _touch(tmp_path, "notes.txt")
+    os.utime(foreign, (old, old))
+
+    async def run():
+        manager = FileCleanupManager(cleanup_time_seconds=600, journal_path=str(tmp_path / ".cleanup_journal"))
+        manager.restore(str(tmp_path))
+        assert list(manager.files_to_cleanup) == [fresh]
+        manager.stop_cleanup_task()
+
+    asyncio.run(run())
+    assert not Path(stale).exists()
+    assert not Path(staging).exists()
+    assert Path(fresh).exists()
+    assert Path(foreign).exists()
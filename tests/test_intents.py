@@ -0,0 +1,50 @@
+"""
+Tests for the compiled intent classifier.
+"""
+
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.intents import SAMPLE_MESSAGES, _classify_substrings, benchmark, classify
+
+
+def test_keywords_match_whole_words_only():
+    intent = classify("Can you put this on the email to the buyer")
+    assert intent.non_function_category is None
+    assert intent.matched_categories == ["client_info"]
+    assert intent.is_question
+
+    assert classify("his quote").matched_categories == ["quotation_core"]
+    assert classify("his quote").non_function_category is None
+
+
+def test_phrases_plurals_and_overlapping_keywords():
+    assert classify("Hi!").chat_topic == "greeting"
+    assert classify("hello, how are you").chat_topic == "greeting"
+    assert classify("who  are you").chat_topic == "who_are_you"
+    assert classify("tell me a joke").chat_topic == "joke"
+    assert classify("What's happening").non_function_category == "news"
+
+    # 'what is' is a translation query and a question at once
+    intent = classify("what is a proforma")
+    assert intent.non_function_category == "translation"
+    assert intent.is_question
+
+    intent = classify("Step-by-step for the QUOTES and items please")
+    assert intent.matched_categories == ["quotation_core", "item_details", "process"]
+    assert not intent.is_question
+
+
+def test_agrees_with_substring_scans_where_they_did_not_misfire():
+    for message in ["How do I create a new quotation?", "What's the weather like today?", "Tell me a joke",
+                    "where can I download the template", "is chatgpt better than you"]:
+        assert classify(message) == _classify_substrings(message), message
+
+
+def test_benchmark_reports_both_classifiers():
+    results = benchmark(SAMPLE_MESSAGES[:3], iterations=5)
+    assert set(results) == {"substring_us", "compiled_us", "speedup"}
+    assert results["compiled_us"] > 0
@@ -0,0 +1,24 @@
+"""
+Smoke test for the end-to-end load-test harness.
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.utils.load_test import run_load_test
+
+
+def test_simulated_users_complete_their_quotations():
+    report = asyncio.run(run_load_test(users=6, concurrency=3, ai_share=0.5, openai_latency=0.01, openai_jitter=0.0, seed=1))
+
+    completed = report["outcomes"].get("ai_completed", 0) + report["outcomes"].get("step_completed", 0)
+    assert completed == 6
+    assert report["handler_errors"] == {}
+    assert report["states"]["ENTRY"]["count"] == 6
+    assert report["bot_api_calls"]["sendDocument"] >= 6
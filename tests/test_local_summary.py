@@ -0,0 +1,42 @@
+"""
+Tests for the local (template-driven) quotation summary.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.gpt_quotation import render_local_summary
+
+TESTS_DIR = Path(__file__).resolve().parent
+
+
+def test_summary_from_recorded_extraction():
+    with open(TESTS_DIR / "test1_extraction_results.json") as f:
+        data = json.load(f)["data"]
+
+    summary = render_local_summary(data)
+
+    assert "Tan Ah Kow" in summary
+    assert "Testing Sdn Bhd" in summary
+    assert "1. Table: 5 × $1000.00 = $5000.00" in summary
+    assert "2. Chair: 10 × $250.00 = $2500.00" in summary
+    assert "Total: $7500.00" in summary
+
+
+def test_summary_handles_unnormalized_values():
+    summary = render_local_summary({
+        "customer_name": "Tan Ah Kow",
+        "items": [{"name": "Table", "quantity": "5 units", "unit_price": "RM 1,000"}],
+        "discount": "500",
+        "notes": "Deliver before noon"
+    })
+
+    assert "1. Table: 5 × $1000.00 = $5000.00" in summary
+    assert "Discount: $500.00" in summary
+    assert "Total: $4500.00" in summary
+    assert "Deliver before noon" in summary
+    assert "Company: Not provided" in summary
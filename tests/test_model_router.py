@@ -0,0 +1,64 @@
+"""
+Tests for per-request model routing and fallback.
+"""
+
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.utils.gpt_quotation import GPTQuotationParser
+from app.utils.model_router import ModelRouter
+
+
+def make_router():
+    return ModelRouter(cheap_model="cheap", strong_model="strong", long_input_chars=200, many_items=3, window=10)
+
+
+def test_routes_by_size_and_item_count():
+    router = make_router()
+
+    assert router.choose("Tan Ah Kow, 2 chairs at 100") == "cheap"
+    assert router.choose("x" * 201) == "strong"
+    assert router.choose("Table, 5 unit, 1000\nChair, 10 unit, 250\nLamp, 2 unit, 40") == "strong"
+    assert router.models_for("short") == ["cheap", "strong"]
+    assert router.models_for("x" * 201) == ["strong"]
+
+
+def test_routes_away_from_a_failing_model():
+    router = make_router()
+    for success in (True, False, False, True):
+        router.record_outcome("cheap", success)
+
+    assert router.failure_rate("cheap") == 0.5
+    assert router.choose("short") == "strong"
+
+
+def test_falls_back_only_when_fields_are_missing():
+    parser = GPTQuotationParser()
+    parser.router = make_router()
+    used = []
+
+    async def fake_completion(messages, max_output_tokens, on_queued=None, model=None, **kwargs):
+        used.append(model)
+        data = {"customer_name": "Tan Ah Kow"}
+        if model == "strong":
+            data.update(customer_company="Testing Sdn Bhd", terms="COD")
+        arguments = json.dumps({"data": data, "missing_fields": []})
+        tool_call = SimpleNamespace(function=SimpleNamespace(arguments=arguments))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=[tool_call]))])
+
+    parser._create_completion = fake_completion
+    data, missing = asyncio.run(parser.extract_quotation_data("Quote for Tan Ah Kow of Testing, cash on delivery"))
+
+    assert used == ["cheap", "strong"]
+    assert data["customer_company"] == "Testing Sdn Bhd"
+    assert "customer_company" not in missing
+    # The cheap model missed fields the strong one found, so it counts as a failure
+    assert parser.router.failure_rate("cheap") == 1.0
@@ -0,0 +1,61 @@
+"""
+Tests for PDF delivery: worker warm-up and the fallback to HTML.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.bot import handlers
+from app.config import Config
+from app.utils.pdf_generator import init_pdf_worker
+from app.utils.render_executor import RenderExecutor
+from app.utils.test_pdf import create_sample_quotation
+
+
+def weasyprint_available():
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+def test_warm_up_waits_for_every_worker():
+    initialized = []
+
+    def initializer():
+        initialized.append(threading.get_ident())
+
+    executor = RenderExecutor(name="test_warm", mode="thread", max_workers=3, initializer=initializer)
+    try:
+        assert executor.warm_up(timeout=5) == 3
+        assert len(set(initialized)) == 3
+    finally:
+        executor.shutdown()
+
+
+def test_pdf_falls_back_to_html_when_weasyprint_cannot_load(monkeypatch):
+    if weasyprint_available():
+        pytest.skip("WeasyPrint is installed here, so there is nothing to fall back from")
+
+    executor = RenderExecutor(name="test_pdf", mode="process", max_workers=1, initializer=init_pdf_worker)
+    monkeypatch.setattr(handlers, "pdf_executor", executor)
+    monkeypatch.setattr(Config, "OUTPUT_FORMAT", "pdf")
+    quotation = create_sample_quotation()
+    try:
+        assert executor.warm_up(timeout=60) == 1
+        filename, content = asyncio.run(handlers.build_quotation_document(quotation))
+    finally:
+        executor.shutdown()
+
+    assert filename == f"{quotation.filename}.html"
+    assert content.startswith(b"<!DOCTYPE html") or b"<html" in content[:500]
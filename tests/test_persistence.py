@@ -0,0 +1,80 @@
+"""
+Tests for SQLite persistence of conversations, user_data and drafts across restarts.
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import app.bot
+from app.bot import create_application, handlers
+from app.bot.persistence import SQLitePersistence
+from app.config import Config
+from app.utils.file_cleanup import cleanup_manager
+from app.utils.load_test import STEP_BY_STEP_SCRIPT, FakeBotRequest, UpdateFactory
+from app.utils.session_store import MemorySessionStore
+
+USER_ID = 4242
+
+
+def run_process(monkeypatch, steps):
+    """Start a fresh application on the same database, send steps, then shut down."""
+    store = MemorySessionStore()
+    monkeypatch.setattr(app.bot, "quotation_data", store)
+    monkeypatch.setattr(handlers, "quotation_data", store)
+
+    async def scenario():
+        bot_request = FakeBotRequest()
+        application = create_application(request=bot_request, token="123456:persistence-test")
+        await application.initialize()
+        factory = UpdateFactory(application.bot)
+        for _, kind, payload in steps:
+            await application.process_update(factory.build(USER_ID, kind, payload))
+        await application.update_persistence()
+        await application.shutdown()
+        return bot_request
+
+    return asyncio.run(scenario())
+
+
+def test_conversation_resumes_after_restart(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "PUBLIC_MODE", True)
+    monkeypatch.setattr(Config, "SAVE_TO_STORAGE", False)
+    monkeypatch.setattr(Config, "PERSISTENCE_PATH", str(tmp_path / "state.sqlite3"))
+    monkeypatch.setattr(cleanup_manager, "journal_path", None)
+
+    # Stop halfway through the first item, with the item name only in user_data
+    first = run_process(monkeypatch, STEP_BY_STEP_SCRIPT[:9])
+    second = run_process(monkeypatch, STEP_BY_STEP_SCRIPT[9:])
+
+    assert first.documents[USER_ID] == 0
+    assert second.documents[USER_ID] == 1
+    assert "generated successfully" in second.last_text[USER_ID]
+
+
+def test_writes_are_batched_until_flushed(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+
+    async def scenario():
+        persistence = SQLitePersistence(path, update_interval=60)
+        await persistence.update_conversation("quotation", (1, 1), 5)
+        await persistence.update_user_data(1, {"current_item": {"name": "Table"}})
+        persistence.save_session(1, '{"items": []}', 4102444800)
+        await persistence.update_user_data(2, {})
+        before = SQLitePersistence(path)._query("SELECT COUNT(*) FROM conversations", ())
+        await persistence.flush()
+
+        reopened = SQLitePersistence(path)
+        return before, await reopened.get_conversations("quotation"), await reopened.get_user_data(), reopened.load_sessions()
+
+    before, conversations, user_data, sessions = asyncio.run(scenario())
+
+    assert before == [(0,)]
+    assert conversations == {(1, 1): 5}
+    assert user_data == {1: {"current_item": {"name": "Table"}}}
+    assert sessions == {1: (4102444800, '{"items": []}')}
@@ -0,0 +1,147 @@
+"""
+Tests for the regex/heuristic pre-extractor.
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.config import Config
+from app.utils.gpt_quotation import GPTQuotationParser
+from app.utils.pre_extractor import pre_extract
+
+FULL_INPUT = """
+- Testing Sdn Bhd
+- Tan Ah Kow
+- 01066907222
+- hijef@gmail.com
+- N33-1, Jalan SS5, Taman Pelangi
+- Table 11238, 5 unit, 1000/unit
+- Chair 12387, 10 unit, 250/unit
+- Payment 25% upfront
+- Remainding payment on delivery
+"""
+
+
+def test_structured_input_is_complete():
+    result = pre_extract(FULL_INPUT)
+
+    assert result.complete
+    assert result.data["customer_company"] == "Testing Sdn Bhd"
+    assert result.data["customer_name"] == "Tan Ah Kow"
+    assert result.data["customer_phone"] == "01066907222"
+    assert result.data["customer_email"] == "hijef@gmail.com"
+    assert result.data["customer_address"] == "N33-1, Jalan SS5, Taman Pelangi"
+    assert result.data["items"] == [
+        {"name": "Table 11238", "quantity": 5, "unit_price": 1000},
+        {"name": "Chair 12387", "quantity": 10, "unit_price": 250},
+    ]
+    assert result.data["terms"] == "Payment 25% upfront, Remainding payment on delivery"
+
+
+def test_missing_field_is_reported():
+    result = pre_extract(FULL_INPUT.replace("- 01066907222\n", ""))
+
+    assert not result.complete
+    assert result.missing_fields == ["customer_phone"]
+    # Reliable matches are not sent to the model again
+    assert "hijef@gmail.com" not in result.unresolved_text
+    assert "Table 11238" not in result.unresolved_text
+    assert "Tan Ah Kow" in result.unresolved_text
+
+
+def test_labeled_lines_override_earlier_values():
+    text = """Previous information:
+- customer_name: Tan Ah Kow
+- customer_email: old@example.com
+
+Additional information:
+Email: new@example.com
+Discount: 10%
+"""
+    result = pre_extract(text)
+
+    assert result.data["customer_name"] == "Tan Ah Kow"
+    assert result.data["customer_email"] == "new@example.com"
+    assert result.data["discount"] == 10
+    assert result.unresolved_text == ""
+    assert "customer_name" not in result.guessed_fields
+
+
+def test_unrecognized_lines_block_the_fast_path():
+    result = pre_extract(FULL_INPUT + "- Please call before coming over!!\n")
+
+    assert result.unmatched_lines == 1
+    assert not result.complete
+
+    prose = pre_extract("Hi, I'd like to order some tables for our new office please")
+    assert not prose.complete
+    assert prose.unmatched_lines == 1
+
+
+def test_discount_is_read_on_either_side_of_the_word():
+    for line in ["10% discount", "Discount: 10%", "discount of 10 percent"]:
+        result = pre_extract(line)
+        assert result.data.get("discount") == 10, line
+        assert "terms" not in result.data, line
+        assert result.unresolved_text == "", line
+
+
+def test_discount_with_more_details_is_kept_for_the_model():
+    result = pre_extract("10% discount for bulk order, deliver to 12 Main St by Friday")
+
+    assert result.data.get("discount") == 10
+    assert "deliver to 12 Main St" in result.unresolved_text
+
+
+def test_requests_are_not_taken_for_names():
+    result = pre_extract("Urgent quote please")
+
+    assert "customer_name" not in result.data
+    assert result.unmatched_lines == 1
+
+
+def test_guessed_fields_are_rechecked_by_the_model(monkeypatch):
+    monkeypatch.setattr(Config, "PRE_EXTRACT", True)
+    parser = GPTQuotationParser()
+    prompts = []
+
+    async def fake_tool(system, prompt, fields, **kwargs):
+        prompts.append((prompt, fields))
+        return {"customer_name": "Ah Kow Tan"}, [], None
+
+    monkeypatch.setattr(parser, "_call_extraction_tool", fake_tool)
+    # Every required field is found, but company, name, address and terms only by heuristics
+    data, missing = asyncio.run(parser.extract_quotation_data(FULL_INPUT))
+
+    assert len(prompts) == 1
+    prompt, fields = prompts[0]
+    assert "Tan Ah Kow" in prompt and "hijef@gmail.com" not in prompt
+    assert "customer_name" in fields and "customer_email" not in fields
+    assert data["customer_name"] == "Ah Kow Tan"
+    assert data["customer_company"] == "Testing Sdn Bhd"
+    assert missing == []
+
+
+def test_discount_with_more_details_goes_to_the_model_in_delta_mode(monkeypatch):
+    monkeypatch.setattr(Config, "PRE_EXTRACT", True)
+    parser = GPTQuotationParser()
+    prompts = []
+
+    async def fake_tool(system, prompt, fields, **kwargs):
+        prompts.append(prompt)
+        return {"customer_address": "12 Main St"}, [], "add"
+
+    monkeypatch.setattr(parser, "_call_extraction_tool", fake_tool)
+    merged, _ = asyncio.run(parser.extract_quotation_delta(
+        "10% discount for bulk order, deliver to 12 Main St by Friday", {"items": []}
+    ))
+
+    assert len(prompts) == 1 and "12 Main St" in prompts[0]
+    assert merged["discount"] == 10
+    assert merged["customer_address"] == "12 Main St"
@@ -0,0 +1,78 @@
+"""
+Tests for streamed extraction progress and throttled message edits.
+"""
+
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.bot.progress import ThrottledMessageEditor
+from app.utils.gpt_quotation import GPTQuotationParser
+from app.utils.model_router import ModelRouter
+
+
+class FakeMessage:
+    def __init__(self):
+        self.text = "Processing..."
+        self.edits = []
+
+    async def edit_text(self, text):
+        self.edits.append(text)
+        self.text = text
+
+
+def test_edits_are_coalesced():
+    async def scenario():
+        message = FakeMessage()
+        editor = ThrottledMessageEditor(message, min_interval=0.05)
+        for i in range(10):
+            editor.update(f"step {i}")
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.15)
+        editor.update("after close")
+        await editor.close()
+        editor.update("ignored")
+        return message.edits
+
+    edits = asyncio.run(scenario())
+
+    assert edits[0] == "step 0"
+    assert edits[-1] == "step 9"
+    assert len(edits) <= 3
+
+
+def test_streamed_extraction_reports_fields():
+    arguments = json.dumps({
+        "data": {"customer_name": "Tan Ah Kow", "customer_email": "hijef@gmail.com", "terms": "COD"},
+        "missing_fields": []
+    })
+    chunks = [arguments[i:i + 7] for i in range(0, len(arguments), 7)]
+
+    async def stream():
+        for part in chunks:
+            call = SimpleNamespace(function=SimpleNamespace(arguments=part))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(tool_calls=[call]))])
+
+    async def create(**kwargs):
+        assert kwargs["stream"] is True
+        return stream()
+
+    parser = GPTQuotationParser()
+    parser.router = ModelRouter(strong_model=None)
+    parser.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    progress = []
+
+    data, missing = asyncio.run(parser.extract_quotation_data(
+        "Please quote Tan Ah Kow, cash on delivery", on_progress=progress.append
+    ))
+
+    assert progress[-1] == ["customer_name", "customer_email", "terms"]
+    assert [len(fields) for fields in progress] == [1, 2, 3]
+    assert data["customer_email"] == "hijef@gmail.com"
@@ -0,0 +1,100 @@
+"""
+Tests for the shared OpenAI rate limiter.
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import openai
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.rate_limiter import RateLimiter
+
+
+def _rate_limit_error(retry_after: str) -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def test_in_flight_bounded_and_queue_positions_reported():
+    limiter = RateLimiter(max_in_flight=2, tokens_per_minute=0)
+    active = 0
+    peak = 0
+    positions = []
+
+    async def call():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        return "ok"
+
+    async def on_queued(position):
+        positions.append(position)
+
+    async def run():
+        results = await asyncio.gather(*(limiter.run(call, on_queued=on_queued) for _ in range(5)))
+        await asyncio.sleep(0)
+        return results
+
+    assert asyncio.run(run()) == ["ok"] * 5
+    assert peak == 2
+    assert sorted(positions) == [1, 2, 3]
+
+
+def test_rate_limit_retried_after_retry_after():
+    limiter = RateLimiter(max_in_flight=4, tokens_per_minute=0, max_retries=2)
+    attempts = []
+
+    async def call():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise _rate_limit_error("0.1")
+        return "ok"
+
+    assert asyncio.run(limiter.run(call)) == "ok"
+    assert attempts[1] - attempts[0] >= 0.1
+    # The 429 halved the allowed concurrency
+    assert limiter._limit == 2
+
+
+def test_gives_up_after_max_retries():
+    limiter = RateLimiter(max_in_flight=1, tokens_per_minute=0, max_retries=1, base_delay=0.01)
+    attempts = 0
+
+    async def call():
+        nonlocal attempts
+        attempts += 1
+        raise _rate_limit_error("0")
+
+    async def run():
+        try:
+            await limiter.run(call)
+        except openai.RateLimitError:
+            return "raised"
+
+    assert asyncio.run(run()) == "raised"
+    assert attempts == 2
+
+
+def test_token_budget_delays_calls():
+    # 600 tokens per minute refills 10 tokens per second
+    limiter = RateLimiter(max_in_flight=4, tokens_per_minute=600)
+
+    async def call():
+        return time.monotonic()
+
+    async def run():
+        start = time.monotonic()
+        await limiter.run(call, estimated_tokens=600)
+        second = await limiter.run(call, estimated_tokens=2)
+        return second - start
+
+    assert asyncio.run(run()) >= 0.15
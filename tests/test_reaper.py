@@ -0,0 +1,71 @@
+"""
+Tests for closing idle conversations.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.bot import create_application, handlers
+from app.bot.constants import AI_SUMMARY, CHOOSE_MODE, CUSTOMER_NAME
+from app.bot.reaper import IDLE_MESSAGE, idle_reaper, parse_state_timeouts
+from app.config import Config
+from app.utils.load_test import FakeBotRequest, UpdateFactory
+from app.utils.metrics import metrics
+from app.utils.session_store import MemorySessionStore
+
+GROUP = -3003
+
+
+def test_state_timeouts_are_parsed_by_state_name():
+    assert parse_state_timeouts("choose_mode=900, AI_SUMMARY=60,NOPE=5,") == {CHOOSE_MODE: 900.0, AI_SUMMARY: 60.0}
+
+
+def test_idle_conversations_are_closed_once_per_state_timeout(monkeypatch):
+    monkeypatch.setattr(Config, "PUBLIC_MODE", True)
+    monkeypatch.setattr(Config, "PERSISTENCE_PATH", "")
+    monkeypatch.setattr(idle_reaper, "default_timeout", 60)
+    monkeypatch.setattr(idle_reaper, "state_timeouts", {CHOOSE_MODE: 0.05})
+    store = MemorySessionStore()
+    monkeypatch.setattr(handlers, "quotation_data", store)
+    monkeypatch.setattr("app.bot.reaper.quotation_data", store)
+
+    async def scenario():
+        bot_request = FakeBotRequest()
+        application = create_application(request=bot_request, token="123456:reaper-test")
+        await application.initialize()
+        factory = UpdateFactory(application.bot)
+        for user_id, kind, payload in [
+            (1, "command", "/newquote"),
+            (2, "command", "/newquote"),
+            (2, "callback", "mode_step"),
+        ]:
+            await application.process_update(factory.build(user_id, kind, payload))
+        await store.set(1, {"items": []})
+        # A conversation user 3 started in a group chat
+        idle_reaper.conversation._conversations[(GROUP, 3)] = CHOOSE_MODE
+        idle_reaper._last_seen[(GROUP, 3)] = time.monotonic()
+
+        await asyncio.sleep(0.1)
+        first = await idle_reaper.reap(application)
+        second = await idle_reaper.reap(application)
+        await application.shutdown()
+        return bot_request, first, second
+
+    bot_request, first, second = asyncio.run(scenario())
+
+    assert (first, second) == (2, 0)
+    assert bot_request.last_text[1] == IDLE_MESSAGE
+    # The group's conversation is reported to the user privately, not to the group
+    assert bot_request.last_text[3] == IDLE_MESSAGE
+    assert GROUP not in bot_request.last_text
+    assert bot_request.last_text[2] != IDLE_MESSAGE
+    assert len(store) == 1
+    assert idle_reaper.conversation._conversations == {(2, 2): CUSTOMER_NAME}
+    assert metrics.snapshot()["gauges"]["conversations.live"] == 1
@@ -0,0 +1,50 @@
+"""
+Tests for the off-event-loop render pool.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.metrics import metrics
+from app.utils.render_executor import RenderExecutor, RenderQueueFullError
+
+
+def test_render_runs_off_event_loop():
+    executor = RenderExecutor(name="test_render", max_workers=1, max_queue=1)
+    loop_thread = threading.get_ident()
+
+    async def run():
+        return await executor.submit(threading.get_ident)
+
+    try:
+        assert asyncio.run(run()) != loop_thread
+    finally:
+        executor.shutdown()
+
+    timings = metrics.snapshot()['timings']
+    assert timings['test_render.queue_wait']['count'] == 1
+    assert timings['test_render.render_time']['count'] == 1
+
+
+def test_queue_depth_is_bounded():
+    executor = RenderExecutor(name="test_bounded", max_workers=1, max_queue=1)
+
+    async def run():
+        running = [asyncio.create_task(executor.submit(time.sleep, 0.2)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(RenderQueueFullError):
+            await executor.submit(time.sleep, 0)
+        await asyncio.gather(*running)
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
@@ -0,0 +1,85 @@
+"""
+Tests for the OpenAI response cache.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.response_cache import ResponseCache
+
+
+def test_whitespace_variants_share_a_key():
+    first = ResponseCache.make_key("gpt-3.5-turbo", "extract", "- Testing Sdn Bhd \n - Tan Ah Kow ")
+    second = ResponseCache.make_key("gpt-3.5-turbo", "extract", "- Testing Sdn Bhd\n- Tan Ah Kow")
+    other_model = ResponseCache.make_key("gpt-4o", "extract", "- Testing Sdn Bhd\n- Tan Ah Kow")
+
+    assert first == second
+    assert first != other_model
+
+
+def test_hits_return_independent_copies():
+    cache = ResponseCache()
+    asyncio.run(cache.set("key", [{"customer_name": "Tan Ah Kow"}, []]))
+
+    cached = asyncio.run(cache.get("key"))
+    cached[0]["customer_name"] = "changed"
+
+    assert asyncio.run(cache.get("key"))[0]["customer_name"] == "Tan Ah Kow"
+    assert asyncio.run(cache.get("missing")) is None
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_eviction_and_ttl():
+    cache = ResponseCache(max_entries=2, ttl_seconds=0.05)
+
+    async def scenario():
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.get("a")
+        await cache.set("c", 3)
+
+        assert await cache.get("b") is None
+        assert await cache.get("a") == 1
+
+        await asyncio.sleep(0.1)
+        assert await cache.get("a") is None
+
+    asyncio.run(scenario())
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    asyncio.run(ResponseCache(disk_path=path).set("key", "summary text"))
+
+    assert asyncio.run(ResponseCache(disk_path=path).get("key")) == "summary text"
+
+
+def test_disk_tier_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = ResponseCache(disk_path=str(tmp_path / "responses.sqlite"))
+    threads = []
+    read_disk, write_disk = cache._read_disk, cache._write_disk
+
+    def record(function):
+        def wrapper(*args):
+            threads.append(threading.get_ident())
+            return function(*args)
+        return wrapper
+
+    monkeypatch.setattr(cache, "_read_disk", record(read_disk))
+    monkeypatch.setattr(cache, "_write_disk", record(write_disk))
+
+    async def scenario():
+        await cache.set("key", "value")
+        cache._entries.clear()
+        return await cache.get("key")
+
+    assert asyncio.run(scenario()) == "value"
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
@@ -0,0 +1,103 @@
+"""
+Tests for the session store backends and the local Redis stand-in.
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.fake_redis import FakeRedisServer
+from app.utils.session_store import MemorySessionStore, RedisSessionStore
+
+
+def test_sessions_are_copies():
+    async def scenario():
+        store = MemorySessionStore()
+        await store.set(1, {"items": []})
+        session = await store.get(1)
+        session["items"].append({"item_name": "Table"})
+        unchanged = await store.get(1)
+        await store.set(1, session)
+        return unchanged, await store.get(1)
+
+    unchanged, saved = asyncio.run(scenario())
+
+    assert unchanged == {"items": []}
+    assert saved == {"items": [{"item_name": "Table"}]}
+
+
+def test_memory_store_evicts_by_count_size_and_idle_time():
+    evicted = []
+
+    async def scenario():
+        store = MemorySessionStore(ttl_seconds=0.05, max_entries=2, max_bytes=60, on_evict=evicted.append)
+        await store.set(1, {"name": "a"})
+        await store.set(2, {"name": "b"})
+        await store.get(1)  # 2 is now the least recently used
+        await store.set(3, {"name": "c"})
+        lru = list(evicted)
+
+        await store.set(4, {"name": "x" * 40})  # over max_bytes, so the oldest go
+        by_size = list(evicted)
+
+        await asyncio.sleep(0.06)
+        expired = await store.sweep()
+        return lru, by_size, expired, len(store), store.size_bytes
+
+    lru, by_size, expired, remaining, size = asyncio.run(scenario())
+
+    assert lru == [2]
+    assert by_size == [2, 1, 3]
+    assert expired == [4]
+    assert remaining == 0
+    assert size == 0
+
+
+def test_redis_store_against_the_stand_in():
+    evicted = []
+
+    async def scenario():
+        server = FakeRedisServer()
+        await server.start()
+        store = RedisSessionStore(server.url, ttl_seconds=0.2, on_evict=evicted.append)
+        try:
+            await store.set(1, {"customer_name": "Tan Ah Kow", "items": []})
+            await store.set(2, {"items": []})
+            first = await store.get(1)
+            await store.delete(2)
+            missing = await store.get(2)
+
+            # Reads keep a session alive; the unread one expires in Redis and is reported by sweep()
+            await store.set(3, {"items": []})
+            for _ in range(3):
+                await asyncio.sleep(0.1)
+                await store.get(1)
+            expired = await store.sweep()
+            return first, missing, expired, server.execute([b"DBSIZE"])
+        finally:
+            await store.close()
+            await server.stop()
+
+    first, missing, expired, size = asyncio.run(scenario())
+
+    assert first == {"customer_name": "Tan Ah Kow", "items": []}
+    assert missing is None
+    assert expired == [3]
+    assert evicted == [3]
+    assert size == 1
+
+
+def test_stand_in_evicts_least_recently_used_keys_under_maxmemory():
+    server = FakeRedisServer(maxmemory=30)
+    server.execute([b"SET", b"a", b"x" * 10])
+    server.execute([b"SET", b"b", b"x" * 10])
+    server.execute([b"GET", b"a"])
+    server.execute([b"SET", b"c", b"x" * 10])
+
+    assert server.execute([b"EXISTS", b"a", b"b", b"c"]) == 2
+    assert server.execute([b"GET", b"b"]) is None
+    assert server.evicted == 1
@@ -0,0 +1,47 @@
+"""
+Tests for the compiled template cache.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.template_renderer import TemplateRenderer
+
+
+def test_template_compiled_once(tmp_path):
+    (tmp_path / 'page.html').write_text("Hello {{ name }}", encoding='utf-8')
+    renderer = TemplateRenderer('page.html', templates_dir=tmp_path)
+
+    first = renderer.load()
+    assert renderer.render(name="Ahmad") == "Hello Ahmad"
+    assert renderer.load() is first
+
+
+def test_template_reloaded_when_mtime_changes(tmp_path):
+    template_file = tmp_path / 'page.html'
+    template_file.write_text("Hello {{ name }}", encoding='utf-8')
+    renderer = TemplateRenderer('page.html', templates_dir=tmp_path)
+    assert renderer.render(name="Ahmad") == "Hello Ahmad"
+
+    template_file.write_text("Goodbye {{ name }}", encoding='utf-8')
+    stat = template_file.stat()
+    os.utime(template_file, (stat.st_atime, stat.st_mtime + 10))
+
+    assert renderer.render(name="Ahmad") == "Goodbye Ahmad"
+
+
+def test_bytecode_cache_written_to_disk(tmp_path):
+    templates_dir = tmp_path / 'templates'
+    templates_dir.mkdir()
+    (templates_dir / 'page.html').write_text("Hello {{ name }}", encoding='utf-8')
+    cache_dir = tmp_path / 'cache'
+
+    TemplateRenderer('page.html', templates_dir=templates_dir, bytecode_cache_dir=str(cache_dir)).load()
+
+    assert any(cache_dir.iterdir())
+    # A fresh renderer (e.g. after a worker restart) loads from the cache
+    assert TemplateRenderer('page.html', templates_dir=templates_dir, bytecode_cache_dir=str(cache_dir)).render(name="Tan") == "Hello Tan"
@@ -0,0 +1,103 @@
+"""
+Tests for concurrent update processing with per-user ordering.
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from telegram import Update
+
+from app.bot.update_processor import PerUserUpdateProcessor
+
+
+def make_update(update_id, user_id):
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+            "text": "hi"
+        }
+    }, None)
+
+
+def test_users_run_in_parallel_and_each_user_stays_in_order():
+    processor = PerUserUpdateProcessor(max_concurrent_updates=8)
+    events = []
+
+    async def handle(label, delay):
+        events.append(("start", label))
+        await asyncio.sleep(delay)
+        events.append(("end", label))
+
+    async def scenario():
+        updates = [
+            (make_update(1, 10), handle("a1", 0.05)),
+            (make_update(2, 10), handle("a2", 0.0)),
+            (make_update(3, 20), handle("b1", 0.0)),
+        ]
+        await asyncio.gather(*(processor.process_update(update, coroutine) for update, coroutine in updates))
+
+    asyncio.run(scenario())
+
+    # b1 does not wait for the slow a1, but a2 does
+    assert events.index(("end", "b1")) < events.index(("end", "a1"))
+    assert events.index(("end", "a1")) < events.index(("start", "a2"))
+    assert processor._locks == {}
+
+
+def test_updates_without_a_user_are_not_serialized():
+    assert PerUserUpdateProcessor.ordering_key(object()) is None
+    assert PerUserUpdateProcessor.ordering_key(make_update(1, 42)) == 42
+
+
+def test_one_users_backlog_does_not_hold_slots_other_users_need():
+    processor = PerUserUpdateProcessor(max_concurrent_updates=4)
+    finished = {}
+
+    async def handle(label, delay):
+        await asyncio.sleep(delay)
+        finished[label] = asyncio.get_running_loop().time()
+
+    async def scenario():
+        started = asyncio.get_running_loop().time()
+        updates = [(make_update(index, 10), handle(f"a{index}", 0.3)) for index in range(1, 6)]
+        updates.append((make_update(6, 20), handle("b", 0.0)))
+        tasks = []
+        for update, coroutine in updates:
+            tasks.append(asyncio.create_task(processor.process_update(update, coroutine)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return started
+
+    started = asyncio.run(scenario())
+
+    # User 20 runs straight away although user 10 queued more updates than there are slots
+    assert finished["b"] - started < 0.1
+    assert finished["a5"] - started >= 1.5
+
+
+def test_running_updates_stay_within_the_limit():
+    processor = PerUserUpdateProcessor(max_concurrent_updates=2)
+    running, peak = [0], [0]
+
+    async def handle():
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.02)
+        running[0] -= 1
+
+    async def scenario():
+        await asyncio.gather(*(processor.process_update(make_update(index, index), handle()) for index in range(1, 7)))
+
+    asyncio.run(scenario())
+
+    assert peak[0] == 2
@@ -0,0 +1,96 @@
+"""
+Tests for webhook mode against a fake Telegram sender and Bot API backend.
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import httpx
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from app.bot import create_application
+from app.bot.webhook import WebhookServer, serve_webhook
+from app.config import Config
+from app.utils.file_cleanup import cleanup_manager
+from app.utils.load_test import FakeBotRequest, WebhookSender
+
+
+def test_webhook_accepts_authenticated_updates_and_drains_on_stop(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "PUBLIC_MODE", True)
+    monkeypatch.setattr(Config, "TEMP_PATH", str(tmp_path))
+    monkeypatch.setattr(cleanup_manager, "journal_path", None)
+    monkeypatch.setattr(Config, "WEBHOOK_URL", "")
+    monkeypatch.setattr(Config, "PERSISTENCE_PATH", "")
+
+    async def scenario():
+        bot_request = FakeBotRequest()
+        application = create_application(request=bot_request, token="123456:webhook-test")
+        server = WebhookServer(application, path="telegram", secret_token="s3cret", health_path="healthz")
+        await server.start(host="127.0.0.1", port=0)
+        stop = asyncio.Event()
+        running = asyncio.create_task(serve_webhook(application, stop_event=stop, server=server))
+
+        url = f"http://127.0.0.1:{server.port}"
+        sender = WebhookSender(f"{url}/telegram", secret_token="s3cret")
+        intruder = WebhookSender(f"{url}/telegram", secret_token="wrong")
+        statuses = [await sender.send(100, "command", "/newquote"), await intruder.send(101, "command", "/newquote")]
+
+        async with httpx.AsyncClient() as client:
+            health = await client.get(f"{url}/healthz")
+
+        stop.set()
+        await running
+        await sender.close()
+        await intruder.close()
+        return statuses, health, bot_request
+
+    statuses, health, bot_request = asyncio.run(scenario())
+
+    assert statuses == [200, 403]
+    assert health.status_code == 200
+    assert health.json()["status"] == "ok"
+    assert "counters" in health.json()["metrics"]
+    # The accepted update was processed before shutdown finished; the rejected one never was
+    assert 100 in bot_request.last_text
+    assert 101 not in bot_request.last_text
+
+
+def test_running_updates_finish_when_the_drain_times_out(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "PUBLIC_MODE", True)
+    monkeypatch.setattr(Config, "TEMP_PATH", str(tmp_path))
+    monkeypatch.setattr(cleanup_manager, "journal_path", None)
+    monkeypatch.setattr(Config, "WEBHOOK_URL", "")
+    monkeypatch.setattr(Config, "PERSISTENCE_PATH", "")
+    monkeypatch.setattr(Config, "WEBHOOK_DRAIN_TIMEOUT", 0.05)
+    finished = []
+
+    async def slow_handler(update, context):
+        await asyncio.sleep(0.3)
+        finished.append(update.effective_user.id)
+
+    async def scenario():
+        application = create_application(request=FakeBotRequest(), token="123456:drain-test")
+        application.add_handler(TypeHandler(Update, slow_handler), group=-100)
+        server = WebhookServer(application, path="telegram", secret_token="s3cret")
+        await server.start(host="127.0.0.1", port=0)
+        stop = asyncio.Event()
+        running = asyncio.create_task(serve_webhook(application, stop_event=stop, server=server))
+
+        sender = WebhookSender(f"http://127.0.0.1:{server.port}/telegram", secret_token="s3cret")
+        assert await sender.send(100, "command", "/start") == 200
+        await asyncio.sleep(0.05)
+        stop.set()
+        await running
+        await sender.close()
+
+    asyncio.run(scenario())
+
+    # The update outlived the drain timeout but was not cancelled by the shutdown
+    assert finished == [100]